@@ -1,50 +1,147 @@
+from datetime import timedelta
+
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Q, Value, When
+from django.utils import timezone
+from django.utils.functional import cached_property
+from .ledger import ledger_balances
+from .search import search_transactions
 from .models import (
     FinanceAccount, Transaction, ExpenseCategory, IncomeCategory,
-    Budget, CropFinance, FinancialGoal
+    Budget, CropFinance, FinancialGoal, TransactionTag
 )
 
+MONEY = DecimalField(max_digits=17, decimal_places=2)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that uses the planner's row estimate for unfiltered changelists.
+
+    An exact ``COUNT(*)`` over a large table reads every row. On PostgreSQL
+    the unfiltered count comes from ``pg_class.reltuples`` once the table is
+    big enough for the difference to matter; filtered lists count exactly.
+    """
+    ESTIMATE_THRESHOLD = 100000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            connection = connections[self.object_list.db]
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)',
+                        [self.object_list.model._meta.db_table]
+                    )
+                    row = cursor.fetchone()
+                if row and row[0] and row[0] > self.ESTIMATE_THRESHOLD:
+                    return row[0]
+        return super().count
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """Changelist defaults for tables that grow with the number of farmers"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    raw_id_fields = ['farmer']
+    list_select_related = ['farmer']
+
+
+class RecentDateFilter(admin.SimpleListFilter):
+    """Bounded date ranges over an indexed date column, used instead of a date hierarchy"""
+    title = 'date'
+    parameter_name = 'period'
+    field_name = None
+
+    def lookups(self, request, model_admin):
+        return [
+            ('today', 'Today'),
+            ('7d', 'Past 7 days'),
+            ('30d', 'Past 30 days'),
+            ('month', 'This month'),
+            ('year', 'This year'),
+        ]
+
+    def queryset(self, request, queryset):
+        today = timezone.localdate()
+        starts = {
+            'today': today,
+            '7d': today - timedelta(days=6),
+            '30d': today - timedelta(days=29),
+            'month': today.replace(day=1),
+            'year': today.replace(month=1, day=1),
+        }
+        start = starts.get(self.value())
+        if start is None:
+            return queryset
+        return queryset.filter(**{
+            f'{self.field_name}__gte': start,
+            f'{self.field_name}__lte': today,
+        })
+
+
+class TransactionDayFilter(RecentDateFilter):
+    title = 'transaction date'
+    field_name = 'transaction_day'
+
 
 @admin.register(ExpenseCategory)
 class ExpenseCategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'description', 'is_active', 'created_at']
+    list_display = ['name', 'parent', 'description', 'is_active', 'created_at']
     list_filter = ['is_active', 'created_at']
+    list_select_related = ['parent']
     search_fields = ['name', 'description']
     ordering = ['name']
+    autocomplete_fields = ['parent']
 
 
 @admin.register(IncomeCategory)
 class IncomeCategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'description', 'is_active', 'created_at']
+    list_display = ['name', 'parent', 'description', 'is_active', 'created_at']
     list_filter = ['is_active', 'created_at']
+    list_select_related = ['parent']
     search_fields = ['name', 'description']
     ordering = ['name']
+    autocomplete_fields = ['parent']
 
 
 @admin.register(FinanceAccount)
-class FinanceAccountAdmin(admin.ModelAdmin):
-    list_display = ['farmer', 'account_name', 'account_type', 'current_balance', 'is_active', 'created_at']
+class FinanceAccountAdmin(ScalableAdmin):
+    list_display = ['farmer', 'account_name', 'account_type', 'balance', 'is_active', 'created_at']
     list_filter = ['account_type', 'is_active', 'created_at']
     search_fields = ['farmer__username', 'account_name', 'account_number', 'bank_name']
     ordering = ['-created_at']
-    readonly_fields = ['current_balance', 'created_at', 'updated_at']
+    readonly_fields = ['balance', 'created_at', 'updated_at']
+    exclude = ['current_balance']
+
+    def get_queryset(self, request):
+        return ledger_balances(super().get_queryset(request))
+
+    def balance(self, obj):
+        return obj.ledger_balance
+    balance.short_description = 'Current Balance'
 
 
 @admin.register(Transaction)
-class TransactionAdmin(admin.ModelAdmin):
+class TransactionAdmin(ScalableAdmin):
     list_display = ['farmer', 'transaction_type', 'amount', 'account', 'transaction_date', 'created_at']
-    list_filter = ['transaction_type', 'transaction_date', 'created_at', 'expense_category', 'income_category']
+    list_filter = ['transaction_type', TransactionDayFilter, 'expense_category', 'income_category']
+    list_select_related = ['farmer', 'account__farmer']
     search_fields = ['farmer__username', 'description', 'reference_number']
     ordering = ['-transaction_date']
     readonly_fields = ['created_at', 'updated_at']
-    date_hierarchy = 'transaction_date'
+    autocomplete_fields = ['account', 'to_account', 'expense_category', 'income_category', 'crop_finance']
 
     fieldsets = (
         ('Basic Information', {
             'fields': ('farmer', 'account', 'transaction_type', 'amount', 'description')
         }),
         ('Category Information', {
-            'fields': ('expense_category', 'income_category', 'to_account')
+            'fields': ('expense_category', 'income_category', 'to_account', 'crop_finance')
         }),
         ('Date Information', {
             'fields': ('transaction_date', 'created_at', 'updated_at')
@@ -55,24 +152,47 @@ class TransactionAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_search_results(self, request, queryset, search_term):
+        # Use the indexed transaction search instead of an ILIKE scan per search field
+        queryset = search_transactions(
+            queryset, search_term, rank=False, also=Q(farmer__username=search_term.strip())
+        )
+        return queryset, False
+
+
+@admin.register(TransactionTag)
+class TransactionTagAdmin(ScalableAdmin):
+    list_display = ['farmer', 'name', 'created_at']
+    search_fields = ['farmer__username', 'name']
+    ordering = ['farmer', 'name']
+    readonly_fields = ['created_at', 'updated_at']
+
 
 @admin.register(Budget)
-class BudgetAdmin(admin.ModelAdmin):
+class BudgetAdmin(ScalableAdmin):
     list_display = ['farmer', 'name', 'category', 'budgeted_amount', 'spent_amount', 'remaining_amount', 'start_date', 'end_date']
     list_filter = ['category', 'start_date', 'end_date', 'is_active']
+    list_select_related = ['farmer', 'category']
     search_fields = ['farmer__username', 'name']
     ordering = ['-created_at']
     readonly_fields = ['spent_amount', 'created_at', 'updated_at']
+    autocomplete_fields = ['category']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            remaining=ExpressionWrapper(F('budgeted_amount') - F('spent_amount'), output_field=MONEY)
+        )
 
     def remaining_amount(self, obj):
-        return obj.remaining_amount
+        return obj.remaining
     remaining_amount.short_description = 'Remaining Amount'
+    remaining_amount.admin_order_field = 'remaining'
 
 
 @admin.register(CropFinance)
-class CropFinanceAdmin(admin.ModelAdmin):
+class CropFinanceAdmin(ScalableAdmin):
     list_display = ['farmer', 'crop_name', 'season', 'year', 'area_acres', 'total_investment', 'total_revenue', 'profit_loss']
-    list_filter = ['season', 'year', 'crop_name']
+    list_filter = ['season', 'year']
     search_fields = ['farmer__username', 'crop_name']
     ordering = ['-year', '-created_at']
     readonly_fields = ['total_investment', 'profit_loss', 'roi_percentage', 'created_at', 'updated_at']
@@ -97,27 +217,51 @@ class CropFinanceAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_queryset(self, request):
+        investment = ExpressionWrapper(
+            F('seed_cost') + F('fertilizer_cost') + F('pesticide_cost') + F('labor_cost')
+            + F('irrigation_cost') + F('equipment_cost') + F('other_costs'),
+            output_field=MONEY
+        )
+        return super().get_queryset(request).annotate(investment=investment).annotate(
+            profit=ExpressionWrapper(F('total_revenue') - F('investment'), output_field=MONEY)
+        )
+
     def total_investment(self, obj):
-        return obj.total_investment
+        return obj.investment
     total_investment.short_description = 'Total Investment'
+    total_investment.admin_order_field = 'investment'
 
     def profit_loss(self, obj):
-        return obj.profit_loss
+        return obj.profit
     profit_loss.short_description = 'Profit/Loss'
+    profit_loss.admin_order_field = 'profit'
 
 
 @admin.register(FinancialGoal)
-class FinancialGoalAdmin(admin.ModelAdmin):
+class FinancialGoalAdmin(ScalableAdmin):
     list_display = ['farmer', 'goal_name', 'goal_type', 'target_amount', 'current_amount', 'percentage_achieved', 'target_date', 'is_achieved']
     list_filter = ['goal_type', 'is_achieved', 'target_date']
     search_fields = ['farmer__username', 'goal_name']
     ordering = ['-created_at']
     readonly_fields = ['percentage_achieved', 'remaining_amount', 'created_at', 'updated_at']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            progress=Case(
+                When(target_amount=0, then=Value(0)),
+                default=ExpressionWrapper(F('current_amount') * 100 / F('target_amount'), output_field=MONEY),
+                output_field=MONEY
+            ),
+            remaining=ExpressionWrapper(F('target_amount') - F('current_amount'), output_field=MONEY)
+        )
+
     def percentage_achieved(self, obj):
-        return f"{obj.percentage_achieved:.2f}%"
+        return f"{obj.progress:.2f}%"
     percentage_achieved.short_description = 'Progress'
+    percentage_achieved.admin_order_field = 'progress'
 
     def remaining_amount(self, obj):
-        return obj.remaining_amount
+        return obj.remaining
     remaining_amount.short_description = 'Remaining'
+    remaining_amount.admin_order_field = 'remaining'
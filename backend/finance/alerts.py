@@ -0,0 +1,146 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Budget, FinanceAlert, FinancialGoal, Transaction
+
+GOAL_DEADLINE_WINDOW = timedelta(days=getattr(settings, 'FINANCE_GOAL_ALERT_DAYS', 30))
+ALERT_BATCH_SIZE = 2000
+ALERT_UPDATE_FIELDS = ['priority', 'title', 'message', 'amount', 'evaluated_on', 'updated_at']
+
+
+def refresh_budget_spent_amounts(today, farmer=None):
+    """Recompute spent_amount of every current budget, or one farmer's, in one UPDATE"""
+    spent = Transaction.objects.filter(
+        farmer=OuterRef('farmer'),
+        transaction_type='EXPENSE',
+        # Spending anywhere in the budget category's subtree, through its closure rows
+        expense_category__ancestor_links__ancestor=OuterRef('category'),
+        transaction_day__gte=OuterRef('start_date'),
+        transaction_day__lte=OuterRef('end_date')
+    ).order_by().values('farmer').annotate(total=Sum('amount')).values('total')
+
+    budgets = Budget.objects.filter(is_active=True, start_date__lte=today, end_date__gte=today)
+    if farmer is not None:
+        budgets = budgets.filter(farmer=farmer)
+
+    return budgets.alias(
+        actual=Coalesce(Subquery(spent), Value(Decimal('0.00')), output_field=DecimalField())
+    ).exclude(
+        spent_amount=F('actual')
+    ).update(spent_amount=F('actual'), updated_at=timezone.now())
+
+
+def _upsert_alerts(alerts):
+    FinanceAlert.objects.bulk_create(
+        alerts,
+        update_conflicts=True,
+        unique_fields=['alert_type', 'source_id'],
+        update_fields=ALERT_UPDATE_FIELDS
+    )
+
+
+def _stream_alerts(queryset, fields, build):
+    """Build alerts from streamed rows and upsert them in batches"""
+    created = 0
+    batch = []
+
+    for row in queryset.values(*fields).iterator(chunk_size=ALERT_BATCH_SIZE):
+        alert = build(row)
+        if alert is None:
+            continue
+        batch.append(alert)
+        if len(batch) >= ALERT_BATCH_SIZE:
+            _upsert_alerts(batch)
+            created += len(batch)
+            batch = []
+
+    if batch:
+        _upsert_alerts(batch)
+        created += len(batch)
+
+    return created
+
+
+def evaluate_alerts(today=None):
+    """Evaluate every current budget and open goal for all farmers.
+
+    Spent amounts are refreshed with one set-based UPDATE; alert candidates
+    are selected in SQL and upserted in batches, one row per budget or goal.
+    Returns a dict with the number of alerts of each type.
+    """
+    today = today or timezone.localdate()
+    now = timezone.now()
+    budget_fields = ['id', 'farmer_id', 'name', 'budgeted_amount', 'spent_amount', 'start_date', 'end_date']
+
+    def overspent(row):
+        over = row['spent_amount'] - row['budgeted_amount']
+        return FinanceAlert(
+            farmer_id=row['farmer_id'], alert_type='BUDGET_OVERSPENT', source_id=row['id'],
+            priority='high', title=f"{row['name']} budget exceeded",
+            message=f"Spent ₹{row['spent_amount']} of ₹{row['budgeted_amount']}, ₹{over} over budget.",
+            amount=over, evaluated_on=today, updated_at=now
+        )
+
+    def burn_rate(row):
+        elapsed_days = (today - row['start_date']).days + 1
+        total_days = (row['end_date'] - row['start_date']).days + 1
+        projected = (row['spent_amount'] / elapsed_days * total_days).quantize(Decimal('0.01'))
+        if projected <= row['budgeted_amount']:
+            return None
+        return FinanceAlert(
+            farmer_id=row['farmer_id'], alert_type='BUDGET_BURN_RATE', source_id=row['id'],
+            priority='medium', title=f"{row['name']} budget on track to overspend",
+            message=f"At the current pace spending will reach ₹{projected} of ₹{row['budgeted_amount']} "
+                    f"by {row['end_date']:%d %b %Y}.",
+            amount=projected, evaluated_on=today, updated_at=now
+        )
+
+    def goal_deadline(row):
+        days_left = (row['target_date'] - today).days
+        remaining = row['target_amount'] - row['current_amount']
+        return FinanceAlert(
+            farmer_id=row['farmer_id'], alert_type='GOAL_DEADLINE', source_id=row['id'],
+            priority='high' if days_left <= 7 else 'medium',
+            title=f"{row['goal_name']} due in {days_left} days",
+            message=f"₹{remaining} still needed to reach ₹{row['target_amount']} by {row['target_date']:%d %b %Y}.",
+            amount=remaining, evaluated_on=today, updated_at=now
+        )
+
+    with transaction.atomic():
+        refresh_budget_spent_amounts(today)
+
+        current_budgets = Budget.objects.filter(
+            is_active=True, start_date__lte=today, end_date__gte=today
+        )
+        counts = {
+            'BUDGET_OVERSPENT': _stream_alerts(
+                current_budgets.filter(spent_amount__gt=F('budgeted_amount')),
+                budget_fields, overspent
+            ),
+            'BUDGET_BURN_RATE': _stream_alerts(
+                current_budgets.filter(spent_amount__gt=0, spent_amount__lte=F('budgeted_amount')),
+                budget_fields, burn_rate
+            ),
+            'GOAL_DEADLINE': _stream_alerts(
+                FinancialGoal.objects.filter(
+                    is_achieved=False,
+                    target_date__gte=today,
+                    target_date__lte=today + GOAL_DEADLINE_WINDOW,
+                    current_amount__lt=F('target_amount')
+                ),
+                ['id', 'farmer_id', 'goal_name', 'target_amount', 'current_amount', 'target_date'],
+                goal_deadline
+            ),
+        }
+
+        # Conditions that no longer hold drop their alerts; dismissed ones are kept a while
+        FinanceAlert.objects.filter(evaluated_on__lt=today, is_dismissed=False).delete()
+        FinanceAlert.objects.filter(evaluated_on__lt=today - timedelta(days=30)).delete()
+
+    return counts
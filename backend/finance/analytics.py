@@ -0,0 +1,206 @@
+import hashlib
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import (
+    Coalesce, ExtractYear, TruncMonth, TruncQuarter, TruncWeek
+)
+from django.utils import timezone
+
+from .cache import data_version
+from .models import Transaction
+
+ANALYTICS_CACHE_TIMEOUT = getattr(settings, 'FINANCE_ANALYTICS_CACHE_SECONDS', 60 * 60 * 24)
+ANALYTICS_CACHE_KEY = 'finance:analytics:{farmer_id}:{version}:{digest}'
+
+# Longest date range one analytics query may cover
+ANALYTICS_MAX_DAYS = 3661
+
+# Kharif is sown with the monsoon, Rabi over the winter and Zaid in the short summer between;
+# a Rabi season belongs to the year it starts in
+SEASON_MONTHS = {
+    'Kharif': (6, 7, 8, 9, 10),
+    'Rabi': (11, 12, 1, 2, 3),
+    'Zaid': (4, 5),
+}
+SEASON_START_MONTH = {'Kharif': 6, 'Rabi': 11, 'Zaid': 4}
+
+# Columns each dimension groups by
+DIMENSIONS = {
+    'category': {
+        'expense_category_id': 'expense_category_id',
+        'income_category_id': 'income_category_id',
+        'category_name': Coalesce('expense_category__name', 'income_category__name'),
+    },
+    'account': {
+        'account_id': 'account_id',
+        'account_name': 'account__account_name',
+    },
+    'type': {
+        'transaction_type': 'transaction_type',
+    },
+}
+
+GRANULARITIES = ('day', 'week', 'month', 'quarter', 'season')
+
+
+class AnalyticsError(ValueError):
+    pass
+
+
+def _parse_date(value, name):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise AnalyticsError(f'{name} must be a date in YYYY-MM-DD format')
+
+
+def parse_analytics_query(query_params):
+    """Normalize the analytics parameters of a request; the result also keys the cache"""
+    dimensions = []
+    for name in query_params.get('dimensions', '').split(','):
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name not in DIMENSIONS:
+            raise AnalyticsError(f'Unknown dimension {name!r}; choose from {", ".join(DIMENSIONS)}')
+        if name not in dimensions:
+            dimensions.append(name)
+
+    granularity = query_params.get('granularity', '').strip().lower() or None
+    if granularity and granularity not in GRANULARITIES:
+        raise AnalyticsError(f'Unknown granularity {granularity!r}; choose from {", ".join(GRANULARITIES)}')
+
+    today = timezone.localdate()
+    end = _parse_date(query_params['end_date'], 'end_date') if query_params.get('end_date') else today
+    start = (
+        _parse_date(query_params['start_date'], 'start_date') if query_params.get('start_date')
+        else end - timedelta(days=364)
+    )
+    if start > end:
+        raise AnalyticsError('start_date must be on or before end_date')
+    if (end - start).days >= ANALYTICS_MAX_DAYS:
+        raise AnalyticsError(f'The date range may cover at most {ANALYTICS_MAX_DAYS} days')
+
+    query = {
+        'dimensions': dimensions,
+        'granularity': granularity,
+        'start_date': start.isoformat(),
+        'end_date': end.isoformat(),
+    }
+
+    transaction_type = query_params.get('transaction_type', '').strip().upper()
+    if transaction_type:
+        if transaction_type not in dict(Transaction.TRANSACTION_TYPES):
+            raise AnalyticsError('transaction_type must be INCOME, EXPENSE or TRANSFER')
+        query['transaction_type'] = transaction_type
+    if query_params.get('account'):
+        try:
+            query['account'] = int(query_params['account'])
+        except ValueError:
+            raise AnalyticsError('account must be an account id')
+
+    return query
+
+
+def _season_columns():
+    return {
+        'season': Case(
+            *[When(transaction_day__month__in=months, then=Value(name)) for name, months in SEASON_MONTHS.items()],
+            output_field=CharField()
+        ),
+        # Rabi months after New Year still count towards the season that started in November
+        'season_year': ExtractYear('transaction_day') - Case(
+            When(transaction_day__month__lte=3, then=Value(1)), default=Value(0), output_field=IntegerField()
+        ),
+    }
+
+
+def _period_columns(granularity):
+    if granularity == 'day':
+        return {'period': F('transaction_day')}
+    if granularity == 'week':
+        return {'period': TruncWeek('transaction_day')}
+    if granularity == 'month':
+        return {'period': TruncMonth('transaction_day')}
+    if granularity == 'quarter':
+        return {'period': TruncQuarter('transaction_day')}
+    if granularity == 'season':
+        return _season_columns()
+    return {}
+
+
+def run_analytics_query(farmer, query):
+    """Totals of a farmer's transactions grouped by the query's dimensions and period.
+
+    Compiles to one grouped query over the ``transaction_day`` indexes.
+    Every row carries income, expense and transfer totals, the net flow and
+    the transaction count; periods are given by their first day.
+    """
+    columns = _period_columns(query['granularity'])
+    for name in query['dimensions']:
+        columns.update(DIMENSIONS[name])
+
+    queryset = Transaction.objects.filter(
+        farmer=farmer,
+        transaction_day__gte=query['start_date'],
+        transaction_day__lte=query['end_date']
+    )
+    if 'transaction_type' in query:
+        queryset = queryset.filter(transaction_type=query['transaction_type'])
+    if 'account' in query:
+        queryset = queryset.filter(account_id=query['account'])
+
+    aliases = {name: column for name, column in columns.items() if not isinstance(column, str)}
+    fields = [column if isinstance(column, str) else name for name, column in columns.items()]
+    rows = queryset.annotate(**aliases).values(*fields).annotate(
+        income=Sum('amount', filter=Q(transaction_type='INCOME')),
+        expense=Sum('amount', filter=Q(transaction_type='EXPENSE')),
+        transfer=Sum('amount', filter=Q(transaction_type='TRANSFER')),
+        count=Count('id')
+    ).order_by(*fields)
+
+    results = []
+    for row in rows:
+        result = {}
+        if 'season' in columns:
+            result['period'] = date(row['season_year'], SEASON_START_MONTH[row['season']], 1)
+            result['season'] = row['season']
+        elif 'period' in columns:
+            result['period'] = row['period']
+        for name, column in columns.items():
+            if name not in ('period', 'season', 'season_year'):
+                result[name] = row[column if isinstance(column, str) else name]
+
+        income = row['income'] or Decimal('0.00')
+        expense = row['expense'] or Decimal('0.00')
+        result.update({
+            'income': income,
+            'expense': expense,
+            'transfer': row['transfer'] or Decimal('0.00'),
+            'net_flow': income - expense,
+            'transaction_count': row['count'],
+        })
+        results.append(result)
+
+    if 'season' in columns:
+        results.sort(key=lambda result: result['period'])
+    return results
+
+
+def farmer_analytics(farmer, query):
+    """Cached analytics result for one farmer; recomputed after any transaction write"""
+    key = ANALYTICS_CACHE_KEY.format(
+        farmer_id=farmer.id,
+        version=data_version(farmer.id),
+        digest=hashlib.sha256(json.dumps(query, sort_keys=True).encode('utf-8')).hexdigest()
+    )
+    payload = cache.get(key)
+    if payload is None:
+        payload = {**query, 'rows': run_analytics_query(farmer, query)}
+        cache.set(key, payload, ANALYTICS_CACHE_TIMEOUT)
+    return payload
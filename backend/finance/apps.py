@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class FinanceConfig(AppConfig):
@@ -8,3 +9,6 @@ class FinanceConfig(AppConfig):
 
     def ready(self):
         import finance.signals
+        from finance.search import create_search_indexes
+
+        post_migrate.connect(create_search_indexes, sender=self, dispatch_uid='finance_search_indexes')
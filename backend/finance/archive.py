@@ -0,0 +1,365 @@
+import gzip
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import groupby, islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .cache import bump_data_version
+from .models import Transaction, TransactionArchive, TransactionTagging
+from .partitioning import existing_partitions, is_partitioned, partition_name, year_bounds
+
+ARCHIVE_DIR = getattr(
+    settings, 'FINANCE_TRANSACTION_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'transaction_archive')
+)
+ARCHIVE_COLUMNS = [field.column for field in Transaction._meta.concrete_fields]
+
+
+def _encode(value):
+    # Unlike DjangoJSONEncoder, keeps full microsecond precision so rows round-trip exactly
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'Cannot archive {type(value).__name__}')
+
+
+def _detached_rows(table, chunk_size):
+    """Rows of a detached partition, streamed through a server side cursor"""
+    columns = ', '.join(f'"{column}"' for column in ARCHIVE_COLUMNS)
+    with transaction.atomic(), connection.chunked_cursor() as cursor:
+        cursor.execute(f'SELECT {columns} FROM "{table}" ORDER BY "farmer_id", "id"')
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(zip(ARCHIVE_COLUMNS, row))
+
+
+def _with_tag_ids(rows, chunk_size):
+    """Add each row's ``tag_ids``, looked up with one query per chunk of rows"""
+    chunk = []
+
+    def flush(chunk):
+        tag_ids = {}
+        for transaction_id, tag_id in TransactionTagging.objects.filter(
+            transaction_id__in=[row['id'] for row in chunk]
+        ).order_by('tag_id').values_list('transaction_id', 'tag_id'):
+            tag_ids.setdefault(transaction_id, []).append(tag_id)
+        for row in chunk:
+            row['tag_ids'] = tag_ids.get(row['id'], [])
+        return chunk
+
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield from flush(chunk)
+            chunk = []
+    if chunk:
+        yield from flush(chunk)
+
+
+def _table_exists(table):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [table])
+        return cursor.fetchone()[0]
+
+
+def _write_archive(year, rows):
+    """Write rows sorted by farmer into a new archive file, one gzip member per farmer.
+
+    The file is written under a temporary name, synced and renamed so a
+    crash never leaves a partial archive behind. Returns the unsaved
+    TransactionArchive entries that locate each farmer's member.
+    """
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    file_name = f'transactions_{year}_{timezone.now():%Y%m%d%H%M%S%f}.ndjson.gz'
+    path = os.path.join(ARCHIVE_DIR, file_name)
+    entries = []
+
+    with open(f'{path}.tmp', 'wb') as fh:
+        for farmer_id, farmer_rows in groupby(rows, key=lambda row: row['farmer_id']):
+            farmer_rows = list(farmer_rows)
+            member = gzip.compress(b''.join(
+                json.dumps(row, default=_encode, separators=(',', ':')).encode('utf-8') + b'\n'
+                for row in farmer_rows
+            ))
+            dates = [row['transaction_date'] for row in farmer_rows]
+            entries.append(TransactionArchive(
+                farmer_id=farmer_id,
+                year=year,
+                file_name=file_name,
+                offset=fh.tell(),
+                length=len(member),
+                row_count=len(farmer_rows),
+                first_date=min(dates),
+                last_date=max(dates)
+            ))
+            fh.write(member)
+        fh.flush()
+        os.fsync(fh.fileno())
+
+    if entries:
+        os.replace(f'{path}.tmp', path)
+    else:
+        os.remove(f'{path}.tmp')
+    return entries
+
+
+def archive_year(year, chunk_size=5000):
+    """Move one calendar year of transactions out of the database into an archive file.
+
+    With a partitioned table the year's partition is detached first, so no
+    new row can land in it while it is read, and dropped once the archive
+    index is saved; an interrupted run resumes from the detached partition.
+    Without partitioning the archived rows are removed with a raw delete.
+    Rows leave the table without going through ``Transaction.delete``:
+    account balances, budgets and crop totals keep counting them. Their tag
+    ids are archived with them and their taggings deleted in the same
+    database transaction. Returns the number of archived transactions.
+    """
+    table = partition_name(year)
+    attached = is_partitioned() and year in existing_partitions()
+
+    if attached or (is_partitioned() and _table_exists(table)):
+        if attached:
+            with connection.cursor() as cursor:
+                cursor.execute(f'ALTER TABLE "{Transaction._meta.db_table}" DETACH PARTITION "{table}"')
+
+        entries = _write_archive(year, _with_tag_ids(_detached_rows(table, chunk_size), chunk_size))
+        with transaction.atomic():
+            TransactionArchive.objects.bulk_create(entries, batch_size=1000)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM "{TransactionTagging._meta.db_table}" '
+                    f'WHERE "transaction_id" IN (SELECT "id" FROM "{table}")'
+                )
+                cursor.execute(f'DROP TABLE "{table}"')
+    else:
+        start, end = year_bounds(year)
+        in_year = Transaction.objects.filter(transaction_date__gte=start, transaction_date__lt=end)
+        # Rows written while the archive is being built are left for the next run
+        last_id = in_year.order_by('-id').values_list('id', flat=True).first()
+        if last_id is None:
+            return 0
+        archived = in_year.filter(id__lte=last_id)
+
+        rows = archived.order_by('farmer_id', 'id').values(*ARCHIVE_COLUMNS).iterator(chunk_size=chunk_size)
+        entries = _write_archive(year, _with_tag_ids(rows, chunk_size))
+        with transaction.atomic():
+            TransactionArchive.objects.bulk_create(entries, batch_size=1000)
+            # The taggings have no database constraint, so nothing else removes them
+            taggings = TransactionTagging.objects.filter(transaction_id__in=archived.values('id'))
+            taggings._raw_delete(taggings.db)
+            archived.order_by()._raw_delete(archived.db)
+
+    # Totals derived from the live rows no longer include the archived ones
+    bump_data_version(*(entry.farmer_id for entry in entries))
+    return sum(entry.row_count for entry in entries)
+
+
+def _archive_entries(farmer, years=None, start_date=None, end_date=None):
+    """The farmer's archive index entries, narrowed to the years the filters can match"""
+    entries = TransactionArchive.objects.filter(farmer=farmer)
+    if years is not None:
+        entries = entries.filter(year__in=years)
+    if start_date is not None:
+        entries = entries.filter(year__gte=start_date.year)
+    if end_date is not None:
+        entries = entries.filter(year__lte=end_date.year)
+    return entries
+
+
+def _read_member(entry):
+    with open(os.path.join(ARCHIVE_DIR, entry.file_name), 'rb') as fh:
+        fh.seek(entry.offset)
+        member = fh.read(entry.length)
+
+    for line in gzip.decompress(member).splitlines():
+        row = json.loads(line)
+        for name in ('transaction_date', 'created_at', 'updated_at'):
+            row[name] = parse_datetime(row[name])
+        yield row
+
+
+def iter_archived_transactions(farmer, years=None, start_date=None, end_date=None, newest_first=False):
+    """Yield a farmer's archived transactions as dicts, oldest archive first.
+
+    Only the farmer's own gzip member of each archive file is read, and only
+    for the years the date range overlaps. With ``newest_first`` the rows
+    come newest first; one year of the farmer's rows is sorted at a time.
+    """
+    order = ('-year', '-id') if newest_first else ('year', 'id')
+    entries = _archive_entries(farmer, years, start_date, end_date).order_by(*order)
+
+    for _, year_entries in groupby(entries, key=lambda entry: entry.year):
+        rows = (
+            row
+            for entry in year_entries
+            for row in _read_member(entry)
+            if (start_date is None or (row['transaction_day'] or '') >= start_date.isoformat())
+            and (end_date is None or (row['transaction_day'] or '') <= end_date.isoformat())
+        )
+        if newest_first:
+            # A year can span several archive files, so its rows are ordered together
+            rows = sorted(rows, key=lambda row: (row['transaction_date'], row['id']), reverse=True)
+        yield from rows
+
+
+def _api_rows(farmer, rows):
+    """Archived rows shaped like the transaction list API"""
+    from .models import ExpenseCategory, FinanceAccount, IncomeCategory, TransactionTag
+
+    accounts = dict(FinanceAccount.objects.filter(farmer=farmer).values_list('id', 'account_name'))
+    expense_categories = dict(ExpenseCategory.objects.filter(
+        id__in={row['expense_category_id'] for row in rows}
+    ).values_list('id', 'name'))
+    income_categories = dict(IncomeCategory.objects.filter(
+        id__in={row['income_category_id'] for row in rows}
+    ).values_list('id', 'name'))
+    # Archives written before tags were archived have no tag_ids
+    tags = dict(TransactionTag.objects.filter(
+        id__in={tag_id for row in rows for tag_id in row.get('tag_ids', [])}
+    ).values_list('id', 'name'))
+
+    return [
+        {
+            'id': row['id'],
+            'account': row['account_id'],
+            'account_name': accounts.get(row['account_id']),
+            'transaction_type': row['transaction_type'],
+            'amount': row['amount'],
+            'description': row['description'],
+            'expense_category': row['expense_category_id'],
+            'expense_category_name': expense_categories.get(row['expense_category_id']),
+            'income_category': row['income_category_id'],
+            'income_category_name': income_categories.get(row['income_category_id']),
+            'to_account': row['to_account_id'],
+            'to_account_name': accounts.get(row['to_account_id']),
+            'crop_finance': row['crop_finance_id'],
+            'recurring_rule': row.get('recurring_rule_id'),
+            'transaction_date': row['transaction_date'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+            'reference_number': row['reference_number'],
+            'notes': row['notes'],
+            'tags': row.get('tag_ids', []),
+            'tag_names': [tags[tag_id] for tag_id in row.get('tag_ids', []) if tag_id in tags],
+            'archived': True,
+        }
+        for row in rows
+    ]
+
+
+class ArchivedTransactionList:
+    """A farmer's archived transactions, newest first, as a lazy sequence for a paginator.
+
+    Slicing reads only the years up to the end of the slice, and years
+    before it are skipped unread when the archive index already knows how
+    many of their rows match. ``count()`` likewise reads only the members
+    the filters cut through.
+    """
+    ordered = True
+
+    def __init__(self, farmer, years=None, transaction_type=None, account_id=None, tag_id=None,
+                 start_date=None, end_date=None):
+        self.farmer = farmer
+        self.years = years
+        self.transaction_type = transaction_type
+        self.account_id = account_id
+        self.tag_id = tag_id
+        self.start_date = start_date
+        self.end_date = end_date
+
+    def _matches(self, row):
+        return (
+            (not self.transaction_type or row['transaction_type'] == self.transaction_type)
+            and (self.account_id is None or row['account_id'] == self.account_id)
+            and (self.tag_id is None or self.tag_id in row.get('tag_ids', []))
+        )
+
+    def _rows(self, years):
+        rows = iter_archived_transactions(
+            self.farmer, years, self.start_date, self.end_date, newest_first=True
+        )
+        return (row for row in rows if self._matches(row))
+
+    @cached_property
+    def _year_counts(self):
+        """``[(year, matching rows)]`` newest first; None where the members must be read to tell"""
+        unfiltered = not (self.transaction_type or self.account_id is not None or self.tag_id is not None)
+        counts = {}
+        for entry in _archive_entries(self.farmer, self.years, self.start_date, self.end_date):
+            whole = (
+                unfiltered
+                and (self.start_date is None or timezone.localdate(entry.first_date) >= self.start_date)
+                and (self.end_date is None or timezone.localdate(entry.last_date) <= self.end_date)
+            )
+            if entry.year in counts and counts[entry.year] is None:
+                continue
+            counts[entry.year] = counts.get(entry.year, 0) + entry.row_count if whole else None
+        return sorted(counts.items(), reverse=True)
+
+    def count(self):
+        return sum(
+            rows if rows is not None else sum(1 for _ in self._rows([year]))
+            for year, rows in self._year_counts
+        )
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        start, stop = index.start or 0, index.stop
+        years = []
+        for year, rows in self._year_counts:
+            if not years and rows is not None and start >= rows:
+                start -= rows
+                stop -= rows
+            else:
+                years.append(year)
+        if not years:
+            return []
+        return _api_rows(self.farmer, list(islice(self._rows(years), start, stop)))
+
+
+class LiveThenArchived:
+    """Paginator sequence of live transaction rows followed by the archived ones.
+
+    ``represent`` turns a slice of the live queryset into API rows; archived
+    rows keep only the fields the live rows have, plus ``archived``.
+    """
+    ordered = True
+
+    def __init__(self, live, represent, archived, fields):
+        self.live = live
+        self.represent = represent
+        self.archived = archived
+        self.fields = set(fields) | {'archived'}
+
+    @cached_property
+    def live_count(self):
+        return self.live.count()
+
+    def count(self):
+        return self.live_count + self.archived.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        start, stop = index.start or 0, index.stop
+        rows = list(self.represent(self.live[start:stop])) if start < self.live_count else []
+        if len(rows) < stop - start:
+            rows.extend(
+                {name: value for name, value in row.items() if name in self.fields}
+                for row in self.archived[max(start - self.live_count, 0):stop - self.live_count]
+            )
+        return rows
@@ -0,0 +1,275 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core import signing
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DecimalField, F, Q, RowRange, Sum, Value, When, Window
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .ledger import account_balances, post_adjustment, transaction_legs
+from .models import BalanceFlow, LedgerPosting, Transaction, local_day
+
+MONEY = DecimalField(max_digits=17, decimal_places=2)
+
+# Upper bound on the days returned by one balance history request
+HISTORY_MAX_DAYS = 731
+
+STATEMENT_CURSOR_SALT = 'finance.statement'
+
+
+# Postings that move money on a day; openings and adjustments correct every day's balance
+FLOW_POSTING_KINDS = ('TRANSACTION', 'REVERSAL')
+
+
+class InvalidStatementCursor(ValueError):
+    pass
+
+
+class BalanceHistoryUnavailable(ValueError):
+    pass
+
+
+def signed_amount(account_id):
+    """A transaction's impact on one account's balance, matching transaction_balance_deltas"""
+    return Case(
+        When(account_id=account_id, transaction_type='INCOME', then=F('amount')),
+        When(account_id=account_id, transaction_type='EXPENSE', then=-F('amount')),
+        When(account_id=account_id, to_account_id=account_id, transaction_type='TRANSFER',
+             then=Value(Decimal('0.00'))),
+        When(account_id=account_id, transaction_type='TRANSFER', then=-F('amount')),
+        When(to_account_id=account_id, transaction_type='TRANSFER', then=F('amount')),
+        default=Value(Decimal('0.00')),
+        output_field=MONEY
+    )
+
+
+def _account_transactions(account_id, after=None, through=None):
+    queryset = Transaction.objects.filter(
+        Q(account_id=account_id) | Q(to_account_id=account_id, transaction_type='TRANSFER')
+    )
+    if after is not None:
+        queryset = queryset.filter(transaction_day__gt=after)
+    if through is not None:
+        queryset = queryset.filter(transaction_day__lte=through)
+    return queryset
+
+
+def account_flow(account_id, after=None, through=None):
+    """Net balance change of an account from transactions on days in ``(after, through]``"""
+    total = _account_transactions(account_id, after, through).aggregate(
+        total=Sum(signed_amount(account_id))
+    )['total']
+    return total or Decimal('0.00')
+
+
+def flow_periods(day):
+    """``(period, start)`` of the day, month and year flows a day's activity is added to"""
+    return [
+        ('DAY', day),
+        ('MONTH', day.replace(day=1)),
+        ('YEAR', day.replace(month=1, day=1)),
+    ]
+
+
+def _after_day(day):
+    """Flows covering exactly the days after ``day``: the rest of its month by day,
+    the rest of its year by month and every later year whole"""
+    next_month = (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+    next_year = day.replace(year=day.year + 1, month=1, day=1)
+    return (
+        Q(period='DAY', start__gt=day, start__lt=next_month)
+        | Q(period='MONTH', start__gte=next_month, start__lt=next_year)
+        | Q(period='YEAR', start__gte=next_year)
+    )
+
+
+def balance_as_of(account_id, day):
+    """Closing balance of an account at the end of a local day.
+
+    The account's journal balance (latest checkpoint plus newer postings)
+    minus the net flow of every later day, summed from at most 30 day rows,
+    11 month rows and one row per later year. Manual adjustments count as
+    part of every day's balance, as they correct what the account held.
+    """
+    after = _after_day(day)
+    flows = BalanceFlow.objects.filter(Q(period='YEAR') | after, account_id=account_id).aggregate(
+        later=Sum('net_flow', filter=after),
+        years=Count('id', filter=Q(period='YEAR'))
+    )
+    if not flows['years'] and LedgerPosting.objects.filter(
+        account_id=account_id, kind__in=FLOW_POSTING_KINDS
+    ).exists():
+        raise BalanceHistoryUnavailable(
+            'Balance history of this account has not been built yet; run backfill_balance_flows'
+        )
+
+    return account_balances([account_id])[account_id] - (flows['later'] or Decimal('0.00'))
+
+
+def balance_history(account_id, start, end):
+    """Opening balance and the closing balance of every day from ``start`` to ``end``"""
+    opening = balance_as_of(account_id, start - timedelta(days=1))
+    flows = dict(BalanceFlow.objects.filter(
+        account_id=account_id, period='DAY', start__gte=start, start__lte=end
+    ).values_list('start', 'net_flow'))
+
+    points = []
+    balance = opening
+    day = start
+    while day <= end:
+        balance += flows.get(day, Decimal('0.00'))
+        points.append({'date': day, 'balance': balance})
+        day += timedelta(days=1)
+
+    return opening, points
+
+
+def account_statement(account_id, start, end, cursor=None, page_size=50):
+    """One page of an account's passbook: its transactions with the running balance.
+
+    The running balance is a window sum over the page's rows, started from
+    the balance before ``start`` on the first page and from the balance
+    carried in the signed keyset cursor on later pages, so each request
+    only reads its own rows. Returns ``(opening balance, rows, next cursor)``;
+    the opening balance of ``start`` is only given on the first page, later
+    pages return None for it.
+    """
+    if cursor:
+        try:
+            position = signing.loads(cursor, salt=STATEMENT_CURSOR_SALT)
+            if position['range'] != [account_id, start.isoformat(), end.isoformat()]:
+                raise ValueError('cursor of another statement')
+            after = (parse_datetime(position['date']), position['id'])
+            carried = Decimal(position['balance'])
+        except (signing.BadSignature, KeyError, TypeError, ValueError, ArithmeticError):
+            raise InvalidStatementCursor('Invalid statement cursor')
+    else:
+        after = None
+        carried = balance_as_of(account_id, start - timedelta(days=1))
+
+    queryset = _account_transactions(account_id, after=start - timedelta(days=1), through=end)
+    if after:
+        queryset = queryset.filter(
+            Q(transaction_date__gt=after[0]) | Q(transaction_date=after[0], id__gt=after[1])
+        )
+
+    order = [F('transaction_date').asc(), F('id').asc()]
+    rows = list(queryset.annotate(
+        signed_amount=signed_amount(account_id),
+        running_total=Window(Sum(signed_amount(account_id)), order_by=order, frame=RowRange(None, 0)),
+    ).order_by(*order).values(
+        'id', 'transaction_date', 'transaction_type', 'description', 'reference_number',
+        'account_id', 'account__account_name', 'to_account__account_name',
+        'expense_category__name', 'income_category__name', 'signed_amount', 'running_total'
+    )[:page_size + 1])
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = signing.dumps({
+            'range': [account_id, start.isoformat(), end.isoformat()],
+            'date': last['transaction_date'].isoformat(),
+            'id': last['id'],
+            'balance': str(carried + last['running_total']),
+        }, salt=STATEMENT_CURSOR_SALT)
+
+    entries = []
+    for row in rows:
+        amount = row['signed_amount']
+        if row['transaction_type'] == 'TRANSFER':
+            incoming = row['account_id'] != account_id
+            counterparty = row['account__account_name'] if incoming else row['to_account__account_name']
+        else:
+            counterparty = None
+        entries.append({
+            'id': row['id'],
+            'transaction_date': timezone.localtime(row['transaction_date']),
+            'transaction_type': row['transaction_type'],
+            'description': row['description'],
+            'reference_number': row['reference_number'],
+            'category_name': row['expense_category__name'] or row['income_category__name'],
+            'counterparty_account': counterparty,
+            'deposit': amount if amount > 0 else None,
+            'withdrawal': -amount if amount < 0 else None,
+            'balance': carried + row['running_total'],
+        })
+
+    return (None if cursor else carried), entries, next_cursor
+
+
+def transaction_flow_deltas(transactions, sign=1):
+    """Aggregate the balance impact of transactions per (account id, local day)"""
+    deltas = defaultdict(Decimal)
+
+    for txn in transactions:
+        day = txn.transaction_day or local_day(txn.transaction_date)
+        for account_id, amount in transaction_legs(txn):
+            deltas[(account_id, day)] += amount * sign
+
+    return deltas
+
+
+def apply_flow_deltas(deltas):
+    """Add per (account, day) deltas to the day, month and year flows they fall in.
+
+    Every changed flow is one ``net_flow + delta`` UPDATE, or an insert when
+    the period has no row yet; no other day is touched. Rows are written in
+    a fixed order so concurrent writers cannot deadlock.
+    """
+    changes = defaultdict(Decimal)
+    for (account_id, day), delta in deltas.items():
+        for period, start in flow_periods(day):
+            changes[(account_id, period, start)] += delta
+
+    with transaction.atomic():
+        for account_id, period, start in sorted(changes):
+            delta = changes[(account_id, period, start)]
+            if not delta:
+                continue
+            flows = BalanceFlow.objects.filter(account_id=account_id, period=period, start=start)
+            if flows.update(net_flow=F('net_flow') + delta):
+                continue
+            try:
+                with transaction.atomic():
+                    BalanceFlow.objects.create(account_id=account_id, period=period, start=start, net_flow=delta)
+            except IntegrityError:
+                # Another writer inserted the row first
+                flows.update(net_flow=F('net_flow') + delta)
+
+
+def record_balance_adjustment(account_id, delta):
+    """Journal a manual balance change.
+
+    A manual balance is a correction of what the account held before its
+    recorded transactions; it is not a flow of any day, so every closing
+    balance moves with it through the journal balance.
+    """
+    post_adjustment(account_id, delta)
+
+
+def rebuild_balance_flows(account_ids):
+    """Recreate the balance flows of these accounts from their ledger postings.
+
+    Transaction and reversal postings are grouped by account and day in one
+    query; postings outlive archived transactions, so archived years keep
+    their history. Run after ``backfill_ledger`` and while transactions of
+    these accounts are not being written. Returns the number of flows written.
+    """
+    account_ids = list(account_ids)
+    changes = defaultdict(Decimal)
+    for row in LedgerPosting.objects.filter(
+        account_id__in=account_ids, kind__in=FLOW_POSTING_KINDS
+    ).values('account_id', 'day').annotate(total=Sum('amount')).order_by():
+        for period, start in flow_periods(row['day']):
+            changes[(row['account_id'], period, start)] += row['total']
+
+    with transaction.atomic():
+        BalanceFlow.objects.filter(account_id__in=account_ids).delete()
+        flows = BalanceFlow.objects.bulk_create([
+            BalanceFlow(account_id=account_id, period=period, start=start, net_flow=net_flow)
+            for (account_id, period, start), net_flow in sorted(changes.items())
+        ], batch_size=1000)
+        return len(flows)
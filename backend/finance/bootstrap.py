@@ -0,0 +1,152 @@
+import calendar
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .categories import ensure_closure_rows
+from .models import FinanceAccount, Budget, ExpenseCategory, IncomeCategory
+
+# Canonical default categories; populate_categories and the bootstrap command both use these
+DEFAULT_EXPENSE_CATEGORIES = [
+    ('Seeds', 'Cost of seeds and seedlings'),
+    ('Fertilizers', 'Fertilizer and soil amendments'),
+    ('Pesticides', 'Pesticides, herbicides, and fungicides'),
+    ('Labor', 'Farm labor costs'),
+    ('Equipment', 'Farm equipment and tools'),
+    ('Fuel', 'Fuel and energy costs'),
+    ('Irrigation', 'Water and irrigation costs'),
+    ('Transportation', 'Transportation and logistics'),
+    ('Storage', 'Storage and warehousing'),
+    ('Insurance', 'Crop and equipment insurance'),
+    ('Utilities', 'Electricity, phone, internet'),
+    ('Maintenance', 'Equipment and facility maintenance'),
+    ('Professional Services', 'Veterinary, consulting, legal services'),
+    ('Taxes', 'Property taxes and fees'),
+    ('Marketing', 'Marketing and advertising expenses'),
+    ('Packaging', 'Packaging and processing costs'),
+    ('Other', 'Miscellaneous expenses'),
+]
+
+DEFAULT_INCOME_CATEGORIES = [
+    ('Crop Sales', 'Revenue from crop sales'),
+    ('Livestock Sales', 'Revenue from livestock sales'),
+    ('Dairy Products', 'Revenue from milk and dairy products'),
+    ('Poultry Products', 'Revenue from eggs and poultry'),
+    ('Government Subsidies', 'Government subsidies and support payments'),
+    ('Insurance Claims', 'Insurance claim payments'),
+    ('Equipment Rental', 'Income from renting out equipment'),
+    ('Land Rental', 'Income from renting out land'),
+    ('Consulting', 'Income from agricultural consulting services'),
+    ('Contract Farming', 'Income from contract farming agreements'),
+    ('Value-Added Products', 'Income from processed farm products'),
+    ('Agri-Tourism', 'Income from farm tourism activities'),
+    ('Other Farm Income', 'Other farm-related income sources'),
+    ('Off-Farm Income', 'Non-farm income sources'),
+]
+
+# (account_name, account_type) created for every new farmer
+DEFAULT_ACCOUNTS = [
+    ('Cash', 'CASH'),
+    ('Savings', 'SAVINGS'),
+]
+
+# Expense category name -> monthly amount of the starter budgets
+STARTER_BUDGETS = getattr(settings, 'FINANCE_STARTER_BUDGETS', {
+    'Seeds': Decimal('5000.00'),
+    'Fertilizers': Decimal('5000.00'),
+    'Labor': Decimal('10000.00'),
+})
+
+
+def ensure_default_categories():
+    """Insert any missing default categories, one statement per table.
+
+    Returns the number of expense and income categories that were created.
+    """
+    expense_before = ExpenseCategory.objects.count()
+    income_before = IncomeCategory.objects.count()
+
+    ExpenseCategory.objects.bulk_create(
+        [ExpenseCategory(name=name, description=description)
+         for name, description in DEFAULT_EXPENSE_CATEGORIES],
+        ignore_conflicts=True
+    )
+    IncomeCategory.objects.bulk_create(
+        [IncomeCategory(name=name, description=description)
+         for name, description in DEFAULT_INCOME_CATEGORIES],
+        ignore_conflicts=True
+    )
+    # bulk_create skips the signal that files new categories in the closure tables
+    ensure_closure_rows(ExpenseCategory)
+    ensure_closure_rows(IncomeCategory)
+
+    return (
+        ExpenseCategory.objects.count() - expense_before,
+        IncomeCategory.objects.count() - income_before,
+    )
+
+
+def bootstrap_farmers(farmer_ids, today=None, batch_size=1000):
+    """Give farmers their default accounts and this month's starter budgets.
+
+    Work is done in batches of ``batch_size`` farmers with a few bulk
+    inserts each. Farmers that already have any finance account are left
+    alone, so running it again only provisions newcomers. Returns the number
+    of farmers, accounts and budgets created.
+    """
+    today = today or timezone.localdate()
+    month_start = today.replace(day=1)
+    month_end = today.replace(day=calendar.monthrange(today.year, today.month)[1])
+
+    ensure_default_categories()
+    categories = dict(
+        ExpenseCategory.objects.filter(name__in=STARTER_BUDGETS).values_list('name', 'id')
+    )
+
+    farmer_ids = list(dict.fromkeys(farmer_ids))
+    counts = {'farmers': 0, 'accounts': 0, 'budgets': 0}
+
+    for start in range(0, len(farmer_ids), batch_size):
+        batch = farmer_ids[start:start + batch_size]
+
+        with transaction.atomic():
+            provisioned = set(
+                FinanceAccount.objects.filter(farmer_id__in=batch).values_list('farmer_id', flat=True)
+            )
+            new_farmers = [farmer_id for farmer_id in batch if farmer_id not in provisioned]
+            if not new_farmers:
+                continue
+
+            accounts = FinanceAccount.objects.bulk_create([
+                FinanceAccount(
+                    farmer_id=farmer_id,
+                    account_name=account_name,
+                    account_type=account_type,
+                    current_balance=Decimal('0.00')
+                )
+                for farmer_id in new_farmers
+                for account_name, account_type in DEFAULT_ACCOUNTS
+            ])
+
+            budgets = Budget.objects.bulk_create([
+                Budget(
+                    farmer_id=farmer_id,
+                    name=f'{category_name} - {month_start:%B %Y}',
+                    category_id=categories[category_name],
+                    budgeted_amount=amount,
+                    spent_amount=Decimal('0.00'),
+                    start_date=month_start,
+                    end_date=month_end
+                )
+                for farmer_id in new_farmers
+                for category_name, amount in STARTER_BUDGETS.items()
+                if category_name in categories
+            ])
+
+        counts['farmers'] += len(new_farmers)
+        counts['accounts'] += len(accounts)
+        counts['budgets'] += len(budgets)
+
+    return counts
@@ -0,0 +1,29 @@
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+DATA_VERSION_KEY = 'finance:data-version:{farmer_id}'
+
+
+def data_version(farmer_id):
+    """Current version of a farmer's finance data, used to key derived caches"""
+    version = cache.get(DATA_VERSION_KEY.format(farmer_id=farmer_id))
+    if version is None:
+        version = 1
+        cache.add(DATA_VERSION_KEY.format(farmer_id=farmer_id), version, timeout=None)
+    return version
+
+
+def bump_data_version(*farmer_ids):
+    """Invalidate every cache keyed on the data version of these farmers"""
+    for farmer_id in set(farmer_ids):
+        key = DATA_VERSION_KEY.format(farmer_id=farmer_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 2, timeout=None)
+
+
+def cache_is_shared():
+    """Whether the default cache is seen by every process, which priming and data versions need"""
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
@@ -0,0 +1,115 @@
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .models import ExpenseCategory, ExpenseCategoryClosure, IncomeCategory, IncomeCategoryClosure
+
+CYCLE_MESSAGE = 'A category cannot be placed under itself or its subcategories'
+
+CLOSURE_MODELS = {
+    ExpenseCategory: ExpenseCategoryClosure,
+    IncomeCategory: IncomeCategoryClosure,
+}
+
+
+def subtree_ids(category):
+    """Ids of a category and everything below it"""
+    closure = CLOSURE_MODELS[type(category)]
+    return list(closure.objects.filter(ancestor=category).values_list('descendant_id', flat=True))
+
+
+def creates_cycle(category, parent):
+    """Whether putting the category under ``parent`` would place it inside its own subtree"""
+    if category is None or category.pk is None or parent is None:
+        return False
+    return parent.pk == category.pk or parent.pk in subtree_ids(category)
+
+
+def place_category(category):
+    """Bring the closure rows of a category's subtree in line with its parent.
+
+    A new category gets its depth 0 row and a row for every ancestor. A
+    moved category has its whole subtree cut from the old ancestors and
+    joined under the new ones with one delete and one bulk insert.
+    """
+    closure = CLOSURE_MODELS[type(category)]
+
+    with transaction.atomic():
+        closure.objects.get_or_create(ancestor_id=category.pk, descendant_id=category.pk, defaults={'depth': 0})
+        current_parent = closure.objects.filter(descendant_id=category.pk, depth=1).values_list(
+            'ancestor_id', flat=True
+        ).first()
+        if current_parent == category.parent_id:
+            return
+
+        subtree = list(closure.objects.filter(ancestor_id=category.pk).values_list('descendant_id', 'depth'))
+        subtree_pks = [descendant_id for descendant_id, _ in subtree]
+        if category.parent_id in subtree_pks:
+            raise ValidationError({'parent': CYCLE_MESSAGE})
+
+        closure.objects.filter(descendant_id__in=subtree_pks).exclude(ancestor_id__in=subtree_pks).delete()
+        if category.parent_id:
+            ancestors = closure.objects.filter(descendant_id=category.parent_id).values_list('ancestor_id', 'depth')
+            closure.objects.bulk_create([
+                closure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=above + below + 1)
+                for ancestor_id, above in ancestors
+                for descendant_id, below in subtree
+            ])
+
+
+def detach_category(category):
+    """Cut a category's subtree from its ancestors before the category is deleted.
+
+    Its children become top-level categories; the rows that pair the
+    deleted category with anything are removed by the cascade.
+    """
+    closure = CLOSURE_MODELS[type(category)]
+    subtree_pks = subtree_ids(category)
+    closure.objects.filter(descendant_id__in=subtree_pks).exclude(ancestor_id__in=subtree_pks).delete()
+
+
+def ensure_closure_rows(model):
+    """Add the depth 0 row of categories inserted without signals, e.g. by bulk_create"""
+    closure = CLOSURE_MODELS[model]
+    missing = model.objects.filter(parent__isnull=True).exclude(
+        Exists(closure.objects.filter(ancestor=OuterRef('pk'), descendant=OuterRef('pk')))
+    ).values_list('pk', flat=True)
+    closure.objects.bulk_create(
+        [closure(ancestor_id=pk, descendant_id=pk, depth=0) for pk in missing], ignore_conflicts=True
+    )
+
+
+def rebuild_category_closure(model):
+    """Recreate a category tree's closure table from the ``parent`` links.
+
+    Returns the number of closure rows written.
+    """
+    closure = CLOSURE_MODELS[model]
+
+    with transaction.atomic():
+        parents = dict(model.objects.select_for_update().values_list('pk', 'parent_id'))
+        rows = []
+        for pk in parents:
+            ancestor_id, depth, seen = pk, 0, set()
+            # A cycle left behind by a raw update is cut where it closes
+            while ancestor_id is not None and ancestor_id not in seen:
+                seen.add(ancestor_id)
+                rows.append(closure(ancestor_id=ancestor_id, descendant_id=pk, depth=depth))
+                ancestor_id, depth = parents.get(ancestor_id), depth + 1
+
+        closure.objects.all().delete()
+        closure.objects.bulk_create(rows, batch_size=1000)
+        return len(rows)
+
+
+def ancestor_ids(model, category_ids):
+    """``{category id: [ancestor ids, nearest first]}`` for these categories, itself included"""
+    closure = CLOSURE_MODELS[model]
+    ancestors = defaultdict(list)
+    for descendant_id, ancestor_id in closure.objects.filter(
+        descendant_id__in=category_ids
+    ).order_by('descendant_id', 'depth').values_list('descendant_id', 'ancestor_id'):
+        ancestors[descendant_id].append(ancestor_id)
+    return ancestors
@@ -0,0 +1,261 @@
+import hashlib
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Case, Count, DecimalField, ExpressionWrapper, F, Sum, When
+from django.db.models.functions import Lower, TruncMonth
+from django.db.models.lookups import GreaterThan
+from django.utils import timezone
+
+from .models import CropFinance, ExpenseSummary, SummaryWatermark, SyncTombstone, Transaction
+from .services import CROP_COST_FIELDS, CROP_OTHER_COSTS_FIELD
+from .sync import SYNC_SETTLE_TIME
+
+COHORT_CACHE_TIMEOUT = getattr(settings, 'FINANCE_COHORT_CACHE_SECONDS', 15 * 60)
+COHORT_CACHE_KEY = 'finance:cohort:{kind}:{version}:{digest}'
+EXPENSE_SUMMARY = 'expense_summaries'
+
+COST_FIELDS = [*CROP_COST_FIELDS.values(), CROP_OTHER_COSTS_FIELD]
+MONEY = DecimalField(max_digits=17, decimal_places=2)
+
+
+def _investment():
+    total = F(COST_FIELDS[0])
+    for field in COST_FIELDS[1:]:
+        total = total + F(field)
+    return ExpressionWrapper(total, output_field=MONEY)
+
+
+class CohortError(ValueError):
+    pass
+
+
+def parse_cohort(query_params):
+    """Normalize the cohort filters of a request; the result also keys the cache"""
+    cohort = {}
+
+    for name in ('crop', 'season'):
+        value = query_params.get(name, '').strip().lower()
+        if value:
+            cohort[name] = value
+
+    try:
+        for name in ('year', 'year_from', 'year_to'):
+            if query_params.get(name):
+                cohort[name] = int(query_params[name])
+        for name in ('min_acres', 'max_acres'):
+            if query_params.get(name):
+                cohort[name] = str(Decimal(query_params[name]))
+        for name in ('start_month', 'end_month'):
+            if query_params.get(name):
+                cohort[name] = datetime.strptime(query_params[name], '%Y-%m').date().isoformat()
+    except (ArithmeticError, ValueError):
+        raise CohortError('Invalid cohort filter; years are integers, acres numbers and months YYYY-MM')
+
+    return cohort
+
+
+def crop_cohort(cohort):
+    """CropFinance rows of the crops, seasons and farm sizes a cohort describes"""
+    queryset = CropFinance.objects.all()
+    if 'crop' in cohort:
+        queryset = queryset.filter(crop_name__iexact=cohort['crop'])
+    if 'season' in cohort:
+        queryset = queryset.filter(season__iexact=cohort['season'])
+    if 'year' in cohort:
+        queryset = queryset.filter(year=cohort['year'])
+    if 'year_from' in cohort:
+        queryset = queryset.filter(year__gte=cohort['year_from'])
+    if 'year_to' in cohort:
+        queryset = queryset.filter(year__lte=cohort['year_to'])
+    if 'min_acres' in cohort:
+        queryset = queryset.filter(area_acres__gte=Decimal(cohort['min_acres']))
+    if 'max_acres' in cohort:
+        queryset = queryset.filter(area_acres__lte=Decimal(cohort['max_acres']))
+    return queryset
+
+
+def _cached(kind, cohort, compute):
+    """Cache ``compute(cohort)`` per cohort definition until the next summary refresh"""
+    refreshed_until = SummaryWatermark.objects.filter(name=EXPENSE_SUMMARY).values_list(
+        'refreshed_until', flat=True
+    ).first()
+    key = COHORT_CACHE_KEY.format(
+        kind=kind,
+        version=int(refreshed_until.timestamp()) if refreshed_until else 0,
+        digest=hashlib.sha256(json.dumps(cohort, sort_keys=True).encode('utf-8')).hexdigest()
+    )
+
+    result = cache.get(key)
+    if result is None:
+        result = compute(cohort)
+        cache.set(key, result, COHORT_CACHE_TIMEOUT)
+    return result
+
+
+def _per(numerator, denominator):
+    if numerator is None or not denominator:
+        return None
+    return (Decimal(numerator) / Decimal(denominator)).quantize(Decimal('0.01'))
+
+
+def _crop_stats(cohort):
+    investment = _investment()
+    rows = crop_cohort(cohort).annotate(
+        crop=Lower('crop_name'), crop_season=Lower('season')
+    ).values('crop', 'crop_season').annotate(
+        records=Count('id'),
+        farmers=Count('farmer', distinct=True),
+        total_area=Sum('area_acres'),
+        total_investment=Sum(investment),
+        revenue=Sum('total_revenue'),
+        avg_roi=Avg(Case(
+            When(
+                GreaterThan(investment, 0),
+                then=ExpressionWrapper((F('total_revenue') - investment) * 100 / investment, output_field=MONEY)
+            ),
+            output_field=MONEY
+        )),
+        avg_cost_per_acre=Avg(Case(
+            When(area_acres__gt=0, then=ExpressionWrapper(investment / F('area_acres'), output_field=MONEY)),
+            output_field=MONEY
+        )),
+        **{f'{field}_total': Sum(field) for field in COST_FIELDS}
+    ).order_by('-farmers', 'crop', 'crop_season')
+
+    groups = []
+    for row in rows:
+        area = row['total_area']
+        groups.append({
+            'crop': row['crop'],
+            'season': row['crop_season'],
+            'records': row['records'],
+            'farmers': row['farmers'],
+            'total_area': area,
+            'avg_roi': _per(row['avg_roi'], 1),
+            'cost_per_acre': _per(row['total_investment'], area),
+            'avg_cost_per_acre': _per(row['avg_cost_per_acre'], 1),
+            'revenue_per_acre': _per(row['revenue'], area),
+            'profit_per_acre': _per(row['revenue'] - row['total_investment'], area),
+            'cost_breakdown_per_acre': {
+                field: _per(row[f'{field}_total'], area) for field in COST_FIELDS
+            },
+        })
+
+    return {'cohort': cohort, 'groups': groups}
+
+
+def crop_stats(cohort):
+    """ROI and per-acre cost, revenue and profit for each crop and season of a cohort"""
+    return _cached('crops', cohort, _crop_stats)
+
+
+def _expense_mix(cohort):
+    summaries = ExpenseSummary.objects.all()
+    if 'start_month' in cohort:
+        summaries = summaries.filter(month__gte=cohort['start_month'])
+    if 'end_month' in cohort:
+        summaries = summaries.filter(month__lte=cohort['end_month'])
+
+    # Without crop filters the cohort is every farmer with recorded expenses
+    crop_filters = set(cohort) - {'start_month', 'end_month'}
+    if crop_filters:
+        farmers = crop_cohort(cohort).values('farmer_id')
+        summaries = summaries.filter(farmer_id__in=farmers)
+        cohort_size = crop_cohort(cohort).values('farmer_id').distinct().count()
+    else:
+        cohort_size = summaries.values('farmer_id').distinct().count()
+
+    rows = list(summaries.values('category_id', 'category__name').annotate(
+        total=Sum('total'),
+        transactions=Sum('transaction_count'),
+        farmers=Count('farmer_id', distinct=True)
+    ).order_by('-total'))
+
+    grand_total = sum((row['total'] for row in rows), Decimal('0.00'))
+
+    return {
+        'cohort': cohort,
+        'farmers': cohort_size,
+        'total_expense': grand_total,
+        'categories': [
+            {
+                'category_id': row['category_id'],
+                'category_name': row['category__name'] or 'Uncategorized',
+                'total': row['total'],
+                'share_percentage': _per(row['total'] * 100, grand_total),
+                'per_farmer': _per(row['total'], cohort_size),
+                'farmers': row['farmers'],
+                'transactions': row['transactions'],
+            }
+            for row in rows
+        ],
+    }
+
+
+def expense_mix(cohort):
+    """Expense category mix of a cohort, read from the materialized expense summaries"""
+    return _cached('expense-mix', cohort, _expense_mix)
+
+
+def _summarize_farmers(farmer_ids):
+    """Rebuild the expense summary rows of these farmers from their transactions"""
+    rows = Transaction.objects.filter(
+        farmer_id__in=farmer_ids,
+        transaction_type='EXPENSE',
+        transaction_day__isnull=False
+    ).annotate(month=TruncMonth('transaction_day')).values(
+        'farmer_id', 'month', 'expense_category_id'
+    ).annotate(total=Sum('amount'), transaction_count=Count('id')).order_by()
+
+    with transaction.atomic():
+        ExpenseSummary.objects.filter(farmer_id__in=farmer_ids).delete()
+        ExpenseSummary.objects.bulk_create([
+            ExpenseSummary(
+                farmer_id=row['farmer_id'],
+                month=row['month'],
+                category_id=row['expense_category_id'],
+                total=row['total'],
+                transaction_count=row['transaction_count']
+            )
+            for row in rows
+        ], batch_size=1000)
+
+
+def refresh_expense_summaries(full=False, batch_size=1000):
+    """Bring the materialized expense summaries up to date.
+
+    Only farmers with transactions written or deleted since the last refresh
+    are rebuilt, each with one grouped query per batch. Rows younger than
+    the sync settle time are left for the next run. Returns the number of
+    farmers refreshed.
+    """
+    until = timezone.now() - SYNC_SETTLE_TIME
+    watermark = SummaryWatermark.objects.filter(name=EXPENSE_SUMMARY).first()
+
+    if full or watermark is None:
+        ExpenseSummary.objects.all().delete()
+        farmer_ids = set(
+            Transaction.objects.filter(transaction_type='EXPENSE').values_list('farmer_id', flat=True).distinct()
+        )
+    else:
+        since = watermark.refreshed_until
+        farmer_ids = set(Transaction.objects.filter(
+            updated_at__gt=since, updated_at__lte=until
+        ).values_list('farmer_id', flat=True).distinct())
+        farmer_ids |= set(SyncTombstone.objects.filter(
+            collection='transactions', deleted_at__gt=since, deleted_at__lte=until
+        ).values_list('farmer_id', flat=True).distinct())
+
+    farmer_ids = sorted(farmer_ids)
+    for start in range(0, len(farmer_ids), batch_size):
+        _summarize_farmers(farmer_ids[start:start + batch_size])
+
+    SummaryWatermark.objects.update_or_create(
+        name=EXPENSE_SUMMARY, defaults={'refreshed_until': until}
+    )
+    return len(farmer_ids)
@@ -0,0 +1,227 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .fast_serializers import serialize_queryset
+from .ledger import ledger_balances
+from .models import Budget, FinanceAccount, FinancialGoal, Transaction
+
+
+class DashboardContext:
+    """Data several dashboard sections read, loaded at most once per request.
+
+    The bundle endpoint builds one context for all requested sections; the
+    single-section endpoints build their own, so every path returns the
+    same payloads.
+    """
+
+    def __init__(self, farmer, today=None, serializer_context=None):
+        self.farmer = farmer
+        self.today = today or timezone.localdate()
+        self.month_start = self.today.replace(day=1)
+        self.serializer_context = serializer_context or {}
+
+    @cached_property
+    def accounts(self):
+        return list(ledger_balances(FinanceAccount.objects.filter(farmer=self.farmer, is_active=True)))
+
+    @cached_property
+    def total_balance(self):
+        return sum((account.ledger_balance for account in self.accounts), Decimal('0.00'))
+
+    @cached_property
+    def trend_month_starts(self):
+        return [(self.today - timedelta(days=30 * i)).replace(day=1) for i in range(12)]
+
+    @cached_property
+    def monthly_flows(self):
+        """Income and expense per month from the oldest trend month on, in one grouped query.
+
+        Covers the trend window and the current month, including future-dated
+        transactions, so the summary and the trends share it.
+        """
+        return {
+            row['month']: row
+            for row in Transaction.objects.filter(
+                farmer=self.farmer,
+                transaction_day__gte=min(self.trend_month_starts)
+            ).annotate(
+                month=TruncMonth('transaction_day')
+            ).values('month').annotate(
+                income=Sum('amount', filter=Q(transaction_type='INCOME')),
+                expense=Sum('amount', filter=Q(transaction_type='EXPENSE'))
+            ).order_by()
+        }
+
+    @cached_property
+    def current_budgets(self):
+        """Active budgets covering today; spent amounts are kept current by the transaction signals"""
+        return list(Budget.objects.filter(
+            farmer=self.farmer, is_active=True, start_date__lte=self.today, end_date__gte=self.today
+        ).select_related('category'))
+
+    @cached_property
+    def goals(self):
+        return list(FinancialGoal.objects.filter(farmer=self.farmer))
+
+
+def summary_section(context):
+    """Balances, this month's cash flow, budget and goal counts and recent transactions"""
+    from .serializers import TransactionSerializer
+
+    month_flows = [row for month, row in context.monthly_flows.items() if month >= context.month_start]
+    monthly_income = sum((row['income'] or Decimal('0.00') for row in month_flows), Decimal('0.00'))
+    monthly_expense = sum((row['expense'] or Decimal('0.00') for row in month_flows), Decimal('0.00'))
+
+    recent_transactions = Transaction.objects.filter(
+        farmer=context.farmer
+    ).order_by('-transaction_date')[:5]
+
+    return {
+        'total_balance': context.total_balance,
+        'monthly_income': monthly_income,
+        'monthly_expense': monthly_expense,
+        'net_cash_flow': monthly_income - monthly_expense,
+        'active_budgets_count': len(context.current_budgets),
+        'overbudget_count': sum(
+            1 for budget in context.current_budgets if budget.spent_amount > budget.budgeted_amount
+        ),
+        'active_goals_count': sum(1 for goal in context.goals if not goal.is_achieved),
+        'achieved_goals_count': sum(1 for goal in context.goals if goal.is_achieved),
+        'recent_transactions': serialize_queryset(TransactionSerializer(), recent_transactions)
+    }
+
+
+def trends_section(context):
+    """Income, expense and net flow of each of the last 12 months"""
+    trends = []
+    for month_start in context.trend_month_starts:
+        totals = context.monthly_flows.get(month_start, {})
+        income = totals.get('income') or Decimal('0.00')
+        expense = totals.get('expense') or Decimal('0.00')
+
+        trends.append({
+            'month': month_start.strftime('%b %Y'),
+            'income': income,
+            'expense': expense,
+            'net_flow': income - expense
+        })
+
+    return trends
+
+
+def expense_breakdown_section(context, parent_id=None):
+    """This month's expenses by category.
+
+    Each top-level category, or each child of ``parent_id``, is reported with
+    its whole subtree through one join on the category closure table.
+    """
+    if parent_id:
+        # Children of the parent with their subtrees, and the parent's own spending
+        in_level = (
+            Q(expense_category__ancestor_links__ancestor__parent_id=parent_id)
+            | Q(expense_category__ancestor_links__ancestor_id=parent_id, expense_category__ancestor_links__depth=0)
+        )
+    else:
+        in_level = Q(expense_category__ancestor_links__ancestor__parent__isnull=True)
+
+    category_expenses = Transaction.objects.filter(
+        in_level,
+        farmer=context.farmer,
+        transaction_type='EXPENSE',
+        transaction_day__gte=context.month_start,
+        expense_category__isnull=False
+    ).values(
+        category_id=F('expense_category__ancestor_links__ancestor_id'),
+        category_name=F('expense_category__ancestor_links__ancestor__name')
+    ).annotate(
+        total_amount=Sum('amount'),
+        transaction_count=Count('id')
+    ).order_by('-total_amount')
+
+    # Calculate percentages
+    total_expense = sum(item['total_amount'] for item in category_expenses)
+
+    breakdown = []
+    for item in category_expenses:
+        percentage = (item['total_amount'] / total_expense * 100) if total_expense > 0 else 0
+        breakdown.append({
+            'category_id': item['category_id'],
+            'category_name': item['category_name'],
+            'amount': item['total_amount'],
+            'percentage': round(percentage, 2),
+            'transaction_count': item['transaction_count']
+        })
+
+    return breakdown
+
+
+def current_budgets_section(context):
+    """Active budgets covering today"""
+    from .serializers import BudgetSerializer
+
+    return BudgetSerializer(context.current_budgets, many=True, context=context.serializer_context).data
+
+
+def goal_progress_section(context):
+    """Goal counts, totals per goal type and the deadlines of the next 90 days"""
+    from .serializers import FinancialGoalSerializer
+
+    total_goals = len(context.goals)
+    achieved_goals = sum(1 for goal in context.goals if goal.is_achieved)
+
+    # Goals by type
+    goals_by_type = {}
+    for goal in context.goals:
+        goal_type = goal.get_goal_type_display()
+        if goal_type not in goals_by_type:
+            goals_by_type[goal_type] = {
+                'count': 0,
+                'total_target': Decimal('0.00'),
+                'total_achieved': Decimal('0.00')
+            }
+
+        goals_by_type[goal_type]['count'] += 1
+        goals_by_type[goal_type]['total_target'] += goal.target_amount
+        goals_by_type[goal_type]['total_achieved'] += goal.current_amount
+
+    # Upcoming deadlines
+    upcoming_goals = sorted(
+        (
+            goal for goal in context.goals
+            if not goal.is_achieved and context.today <= goal.target_date <= context.today + timedelta(days=90)
+        ),
+        key=lambda goal: goal.target_date
+    )
+
+    return {
+        'summary': {
+            'total_goals': total_goals,
+            'achieved_goals': achieved_goals,
+            'achievement_rate': (achieved_goals / total_goals * 100) if total_goals > 0 else 0
+        },
+        'goals_by_type': goals_by_type,
+        'upcoming_deadlines': FinancialGoalSerializer(
+            upcoming_goals[:5], many=True, context=context.serializer_context
+        ).data
+    }
+
+
+def total_balance_section(context):
+    """Total balance across the farmer's active accounts"""
+    return {'total_balance': context.total_balance}
+
+
+# Bundle section name -> builder; each takes the shared context
+DASHBOARD_SECTIONS = {
+    'summary': summary_section,
+    'trends': trends_section,
+    'expense_breakdown': expense_breakdown_section,
+    'current_budgets': current_budgets_section,
+    'goal_progress': goal_progress_section,
+    'total_balance': total_balance_section,
+}
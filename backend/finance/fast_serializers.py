@@ -0,0 +1,189 @@
+import decimal
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import ISO_8601, serializers
+from rest_framework.fields import empty
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.settings import api_settings
+
+# Fields whose representation of a non-null database value is the value itself
+PASSTHROUGH_FIELDS = (
+    serializers.IntegerField, serializers.CharField, serializers.BooleanField,
+    serializers.ChoiceField, PrimaryKeyRelatedField,
+)
+
+_SKIP = object()
+
+
+class NotCompilable(Exception):
+    """Raised when a serializer uses a field the values() path cannot reproduce"""
+
+
+def _file_formatter(field, model_field):
+    storage = model_field.storage
+    use_url = getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL)
+    request = field.context.get('request')
+
+    def format_file(name):
+        if not name:
+            return None
+        if not use_url:
+            return name
+        url = storage.url(name)
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    return format_file
+
+
+def _decimal_formatter(field):
+    """Precompute the quantize context DRF would build for every value"""
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if (not coerce_to_string or field.localize or field.decimal_places is None
+            or getattr(field, 'normalize_output', False)):
+        return field.to_representation
+
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    quantum = decimal.Decimal('.1') ** field.decimal_places
+    rounding = field.rounding
+
+    def format_decimal(value):
+        if not isinstance(value, decimal.Decimal):
+            return field.to_representation(value)
+        return '{:f}'.format(value.quantize(quantum, rounding=rounding, context=context))
+
+    return format_decimal
+
+
+def _datetime_formatter(field):
+    """Resolve the output timezone and format once instead of per value"""
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def format_datetime(value):
+        if value.tzinfo is None:
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    return format_datetime
+
+
+def _missing_value(field):
+    """What DRF emits when a dotted source crosses a null relation"""
+    if field.default is not empty:
+        return field.get_default()
+    if field.allow_null:
+        return None
+    if not field.required:
+        return _SKIP
+    raise NotCompilable(f'{field.field_name} cannot represent a missing relation')
+
+
+class ValuesSerializer:
+    """Serialize ``QuerySet.values()`` rows exactly like a ModelSerializer would.
+
+    The serializer's fields are compiled once into ``values()`` lookups and
+    formatter callables, so large lists skip model instantiation and DRF's
+    per-field attribute resolution. Raises ``NotCompilable`` for serializers
+    that use properties, methods or reverse relations; callers then fall back
+    to the regular serializer.
+    """
+
+    def __init__(self, serializer):
+        model = serializer.Meta.model
+        self.lookups = []
+        self.mappers = []
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if field.source == '*':
+                raise NotCompilable(name)
+
+            parts = field.source.split('.')
+            current = model
+            model_field = None
+            for position, part in enumerate(parts):
+                try:
+                    model_field = current._meta.get_field(part)
+                except FieldDoesNotExist:
+                    raise NotCompilable(name)
+                if model_field.many_to_many or model_field.one_to_many:
+                    raise NotCompilable(name)
+                if position < len(parts) - 1:
+                    if not model_field.is_relation:
+                        raise NotCompilable(name)
+                    current = model_field.related_model
+
+            # A dotted source is missing when any relation along the path is null
+            guards = ['__'.join(parts[:depth]) for depth in range(1, len(parts))]
+            lookup = '__'.join(parts)
+            missing = _missing_value(field) if guards else None
+
+            if isinstance(field, serializers.FileField):
+                formatter = _file_formatter(field, model_field)
+            elif isinstance(field, PASSTHROUGH_FIELDS):
+                formatter = None
+            elif isinstance(field, serializers.DecimalField):
+                formatter = _decimal_formatter(field)
+            elif isinstance(field, serializers.DateTimeField):
+                formatter = _datetime_formatter(field)
+            elif isinstance(field, (serializers.DateField, serializers.FloatField)):
+                formatter = field.to_representation
+            else:
+                raise NotCompilable(name)
+
+            self.lookups.extend(guards)
+            self.lookups.append(lookup)
+            self.mappers.append((name, lookup, guards, missing, formatter))
+
+        self.lookups = list(dict.fromkeys(self.lookups))
+
+    def queryset(self, queryset):
+        return queryset.values(*self.lookups)
+
+    def to_representation(self, rows):
+        mappers = self.mappers
+        data = []
+
+        for row in rows:
+            item = {}
+            for name, lookup, guards, missing, formatter in mappers:
+                if guards:
+                    for guard in guards:
+                        if row[guard] is None:
+                            break
+                    else:
+                        guard = None
+                    if guard is not None:
+                        if missing is not _SKIP:
+                            item[name] = missing
+                        continue
+
+                value = row[lookup]
+                if value is None:
+                    item[name] = None
+                elif formatter is None:
+                    item[name] = value
+                else:
+                    item[name] = formatter(value)
+            data.append(item)
+
+        return data
+
+
+def serialize_queryset(serializer, queryset):
+    """Serialize ``queryset`` with the values() fast path when ``serializer`` allows it"""
+    try:
+        values_serializer = ValuesSerializer(serializer)
+    except NotCompilable:
+        return serializer.__class__(queryset, many=True, context=serializer.context).data
+    return values_serializer.to_representation(values_serializer.queryset(queryset))
@@ -0,0 +1,231 @@
+from datetime import date
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils import timezone
+
+from .cache import data_version
+from .ledger import ledger_balances
+from .models import FinanceAccount, Transaction
+
+HISTORY_MONTHS = getattr(settings, 'FINANCE_FORECAST_HISTORY_MONTHS', 36)
+FORECAST_CACHE_TIMEOUT = 60 * 60 * 24
+FORECAST_CACHE_KEY = 'finance:forecast:{farmer_id}:{version}:{months}'
+
+# Kharif is sown with the monsoon and harvested in autumn, Rabi over the winter
+KHARIF_MONTHS = (6, 7, 8, 9, 10)
+RABI_MONTHS = (11, 12, 1, 2, 3)
+
+# Ridge penalty on the trend and seasonal terms; keeps short histories close to their mean
+SEASONAL_PENALTY = 1.0
+INTERCEPT_PENALTY = 1e-6
+
+
+def _month_number(day):
+    return day.year * 12 + day.month - 1
+
+
+def _month_label(number):
+    return f'{number // 12:04d}-{number % 12 + 1:02d}'
+
+
+def design_matrix(month_numbers, origin):
+    """Regressors for monthly net flow: level, trend, Kharif/Rabi seasons and an annual harmonic"""
+    month_numbers = np.asarray(month_numbers)
+    calendar_month = month_numbers % 12 + 1
+    angle = 2 * np.pi * calendar_month / 12
+
+    return np.column_stack([
+        np.ones(len(month_numbers)),
+        (month_numbers - origin) / 12.0,
+        np.isin(calendar_month, KHARIF_MONTHS).astype(float),
+        np.isin(calendar_month, RABI_MONTHS).astype(float),
+        np.sin(angle),
+        np.cos(angle),
+    ])
+
+
+def fit_seasonal_models(flows, observed, design):
+    """Fit one ridge-regularised seasonal model per account column at once.
+
+    ``flows`` and ``observed`` are (months x accounts) arrays; months an
+    account did not exist for are masked out. The normal equations of all
+    accounts are built with einsum and solved as one batched system.
+    """
+    weighted = design[:, :, None] * observed[:, None, :]              # months x k x accounts
+    gram = np.einsum('mk,mla->akl', design, weighted)                  # accounts x k x k
+    moments = np.einsum('mka,ma->ak', weighted, flows)                 # accounts x k
+
+    penalty = np.full(design.shape[1], SEASONAL_PENALTY)
+    penalty[0] = INTERCEPT_PENALTY
+    gram += np.diag(penalty)[None, :, :]
+
+    return np.linalg.solve(gram, moments[:, :, None])[:, :, 0]        # accounts x k
+
+
+def _signed_flows(rows, columns):
+    """Yield (column, day, signed amount) for each leg of the aggregated rows"""
+    for row in rows:
+        amount = float(row['total'])
+        if row['transaction_type'] == 'INCOME':
+            yield columns.get(row['account_id']), row['transaction_day'], amount
+        elif row['transaction_type'] == 'EXPENSE':
+            yield columns.get(row['account_id']), row['transaction_day'], -amount
+        elif row['transaction_type'] == 'TRANSFER':
+            yield columns.get(row['account_id']), row['transaction_day'], -amount
+            if row['to_account_id']:
+                yield columns.get(row['to_account_id']), row['transaction_day'], amount
+
+
+def forecast_accounts(accounts, months, today=None):
+    """Project monthly net flow and balance for ``accounts`` over the next ``months``.
+
+    The daily income/expense series of all given accounts is read in a
+    single grouped query, bucketed into months with NumPy and fitted with
+    :func:`fit_seasonal_models`. Returns ``{account_id: [month dicts]}``.
+    """
+    accounts = list(accounts)
+    if not accounts:
+        return {}
+
+    today = today or timezone.localdate()
+    current_month = _month_number(today)
+    first_month = current_month - HISTORY_MONTHS
+    history_start = date(first_month // 12, first_month % 12 + 1, 1)
+    month_start = today.replace(day=1)
+
+    columns = {account.id: position for position, account in enumerate(accounts)}
+    account_ids = list(columns)
+
+    rows = Transaction.objects.filter(
+        account_id__in=account_ids,
+        transaction_day__gte=history_start,
+        transaction_day__lt=month_start
+    ).values(
+        'account_id', 'to_account_id', 'transaction_type', 'transaction_day'
+    ).annotate(total=Sum('amount')).order_by()
+
+    incoming = Transaction.objects.filter(
+        to_account_id__in=account_ids,
+        transaction_type='TRANSFER',
+        transaction_day__gte=history_start,
+        transaction_day__lt=month_start
+    ).exclude(account_id__in=account_ids).values(
+        'account_id', 'to_account_id', 'transaction_type', 'transaction_day'
+    ).annotate(total=Sum('amount')).order_by()
+
+    flows = np.zeros((HISTORY_MONTHS, len(accounts)))
+    cells_column, cells_month, cells_amount = [], [], []
+    for column, day, amount in _signed_flows(list(rows) + list(incoming), columns):
+        if column is not None:
+            cells_column.append(column)
+            cells_month.append(_month_number(day) - first_month)
+            cells_amount.append(amount)
+    np.add.at(flows, (np.array(cells_month, dtype=int), np.array(cells_column, dtype=int)), cells_amount)
+
+    # An account is observed from its creation or first transaction, whichever is earlier
+    opened = np.array([
+        _month_number(timezone.localtime(account.created_at).date()) - first_month
+        for account in accounts
+    ])
+    has_activity = flows.any(axis=0)
+    first_activity = np.where(has_activity, (flows != 0).argmax(axis=0), HISTORY_MONTHS)
+    start = np.minimum(opened, first_activity)
+    observed = (np.arange(HISTORY_MONTHS)[:, None] >= start[None, :]).astype(float)
+
+    history_months = np.arange(first_month, current_month)
+    future_months = np.arange(current_month + 1, current_month + 1 + months)
+    coefficients = fit_seasonal_models(flows, observed, design_matrix(history_months, current_month))
+    predicted = design_matrix(future_months, current_month) @ coefficients.T       # months x accounts
+
+    balances = np.array([float(account.ledger_balance) for account in accounts])
+    projected = balances[None, :] + np.cumsum(predicted, axis=0)
+
+    return {
+        account.id: [
+            {
+                'month': _month_label(month),
+                'net_flow': round(float(predicted[step, column]), 2),
+                'projected_balance': round(float(projected[step, column]), 2),
+            }
+            for step, month in enumerate(future_months)
+        ]
+        for column, account in enumerate(accounts)
+    }
+
+
+def _forecast_payload(accounts, per_account, months):
+    totals = [
+        {
+            'month': month['month'],
+            'net_flow': round(sum(per_account[a.id][step]['net_flow'] for a in accounts), 2),
+            'projected_balance': round(
+                sum(per_account[a.id][step]['projected_balance'] for a in accounts), 2
+            ),
+        }
+        for step, month in enumerate(per_account[accounts[0].id])
+    ] if accounts else []
+
+    return {
+        'months': months,
+        'generated_at': timezone.now(),
+        'accounts': [
+            {
+                'account_id': account.id,
+                'account_name': account.account_name,
+                'current_balance': account.ledger_balance,
+                'forecast': per_account[account.id],
+            }
+            for account in accounts
+        ],
+        'total': totals,
+    }
+
+
+def farmer_forecast(farmer, months):
+    """Cached balance forecast for one farmer; recomputed after any transaction write"""
+    key = FORECAST_CACHE_KEY.format(farmer_id=farmer.id, version=data_version(farmer.id), months=months)
+    payload = cache.get(key)
+    if payload is None:
+        accounts = list(ledger_balances(FinanceAccount.objects.filter(farmer=farmer, is_active=True)).order_by('id'))
+        payload = _forecast_payload(accounts, forecast_accounts(accounts, months), months)
+        cache.set(key, payload, FORECAST_CACHE_TIMEOUT)
+    return payload
+
+
+def forecast_all_farmers(months, chunk_size=5000):
+    """Forecast every active account in chunks and prime each farmer's cache entry.
+
+    Each chunk of accounts is fitted with one query and one batched solve,
+    so the cost grows with the number of chunks, not the number of farmers.
+    Returns the number of farmers forecast.
+    """
+    farmers = 0
+    accounts = ledger_balances(FinanceAccount.objects.filter(is_active=True)).order_by('farmer_id', 'id')
+    chunk = []
+
+    def flush(chunk):
+        per_account = forecast_accounts(chunk, months)
+        by_farmer = {}
+        for account in chunk:
+            by_farmer.setdefault(account.farmer_id, []).append(account)
+        for farmer_id, farmer_accounts in by_farmer.items():
+            key = FORECAST_CACHE_KEY.format(
+                farmer_id=farmer_id, version=data_version(farmer_id), months=months
+            )
+            cache.set(key, _forecast_payload(farmer_accounts, per_account, months), FORECAST_CACHE_TIMEOUT)
+        return len(by_farmer)
+
+    for account in accounts.iterator(chunk_size=chunk_size):
+        # Never split a farmer's accounts across chunks
+        if len(chunk) >= chunk_size and chunk[-1].farmer_id != account.farmer_id:
+            farmers += flush(chunk)
+            chunk = []
+        chunk.append(account)
+
+    if chunk:
+        farmers += flush(chunk)
+
+    return farmers
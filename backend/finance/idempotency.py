@@ -0,0 +1,90 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_KEY_TTL = timedelta(hours=getattr(settings, 'FINANCE_IDEMPOTENCY_KEY_TTL_HOURS', 24))
+
+
+def _request_fingerprint(request):
+    body = json.dumps(request.data, cls=JSONEncoder, sort_keys=True)
+    payload = f'{request.method}\n{request.path}\n{body}'
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _replay(stored):
+    response = Response(stored.response_body, status=stored.response_status)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view_method):
+    """Make a viewset action replay its first successful response for a repeated key.
+
+    Requests without the ``Idempotency-Key`` header are handled as before.
+    The wrapped action and the stored response are committed together, so a
+    concurrent retry with the same key either sees the stored response or
+    loses the unique constraint race and has its own writes rolled back.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+
+        if len(key) > 255:
+            return Response(
+                {'error': f'{IDEMPOTENCY_HEADER} must be at most 255 characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        fingerprint = _request_fingerprint(request)
+        live_keys = IdempotencyKey.objects.filter(
+            farmer=request.user,
+            key=key,
+            created_at__gte=timezone.now() - IDEMPOTENCY_KEY_TTL
+        )
+
+        stored = live_keys.first()
+        if stored is not None:
+            if stored.request_hash != fingerprint:
+                return Response(
+                    {'error': f'{IDEMPOTENCY_HEADER} was already used for a different request'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            return _replay(stored)
+
+        try:
+            with transaction.atomic():
+                response = view_method(self, request, *args, **kwargs)
+
+                # Only successful results are remembered; failed requests may be retried
+                if status.is_success(response.status_code):
+                    # Expired keys are purged lazily by the same unique slot
+                    IdempotencyKey.objects.filter(farmer=request.user, key=key).delete()
+                    IdempotencyKey.objects.create(
+                        farmer=request.user,
+                        key=key,
+                        request_hash=fingerprint,
+                        response_status=response.status_code,
+                        response_body=json.loads(json.dumps(response.data, cls=JSONEncoder))
+                    )
+        except IntegrityError:
+            stored = live_keys.first()
+            if stored is None:
+                raise
+            return _replay(stored)
+
+        return response
+
+    return wrapper
@@ -0,0 +1,223 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import DecimalField, Exists, F, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import BalanceCheckpoint, FinanceAccount, LedgerPosting, Transaction, local_day
+
+MONEY = DecimalField(max_digits=17, decimal_places=2)
+ZERO = Value(Decimal('0.00'), output_field=MONEY)
+CENT = Decimal('0.01')
+
+
+def transaction_legs(txn):
+    """``(account id, amount)`` of each balance movement a transaction makes"""
+    if txn.transaction_type == 'INCOME':
+        return [(txn.account_id, txn.amount)]
+    if txn.transaction_type == 'EXPENSE':
+        return [(txn.account_id, -txn.amount)]
+    if txn.transaction_type == 'TRANSFER':
+        legs = [(txn.account_id, -txn.amount)]
+        if txn.to_account_id:
+            legs.append((txn.to_account_id, txn.amount))
+        return legs
+    return []
+
+
+def transaction_postings(transactions, kind='TRANSACTION'):
+    """Unsaved postings for every leg of the transactions; reversals flip the sign"""
+    sign = -1 if kind == 'REVERSAL' else 1
+    return [
+        LedgerPosting(
+            account_id=account_id,
+            transaction_id=txn.pk,
+            kind=kind,
+            amount=amount * sign,
+            day=txn.transaction_day or local_day(txn.transaction_date)
+        )
+        for txn in transactions
+        for account_id, amount in transaction_legs(txn)
+    ]
+
+
+def record_postings(postings):
+    LedgerPosting.objects.bulk_create(postings, batch_size=1000)
+
+
+def post_adjustment(account_id, delta, kind='ADJUSTMENT'):
+    """Journal a balance change that has no transaction behind it"""
+    if delta:
+        LedgerPosting.objects.create(
+            account_id=account_id, kind=kind, amount=delta, day=timezone.localdate()
+        )
+
+
+def ledger_balances(accounts=None, through=None):
+    """Accounts annotated with ``ledger_balance``, their balance from the journal.
+
+    Starts from each account's latest checkpoint and adds the postings after
+    it, optionally only those up to posting id ``through``.
+    """
+    checkpoints = BalanceCheckpoint.objects.filter(account=OuterRef('pk')).order_by('-last_posting_id')
+    if through is not None:
+        checkpoints = checkpoints.filter(last_posting_id__lte=through)
+
+    tail = LedgerPosting.objects.filter(
+        account=OuterRef('pk'), id__gt=Coalesce(OuterRef('checkpoint_posting_id'), Value(0))
+    )
+    if through is not None:
+        tail = tail.filter(id__lte=through)
+    tail = tail.order_by().values('account').annotate(total=Sum('amount')).values('total')
+
+    queryset = accounts if accounts is not None else FinanceAccount.objects.all()
+    return queryset.annotate(
+        checkpoint_posting_id=Subquery(checkpoints.values('last_posting_id')[:1]),
+        checkpoint_balance=Coalesce(Subquery(checkpoints.values('balance')[:1]), ZERO, output_field=MONEY),
+        ledger_balance=F('checkpoint_balance') + Coalesce(Subquery(tail), ZERO, output_field=MONEY),
+    )
+
+
+def account_balances(account_ids):
+    """``{account id: journal balance}`` of these accounts in one query"""
+    return {
+        pk: balance.quantize(CENT)
+        for pk, balance in ledger_balances(FinanceAccount.objects.filter(pk__in=account_ids))
+        .values_list('pk', 'ledger_balance')
+    }
+
+
+def verify_accounts(account_ids, fix=False):
+    """Compare the cached ``current_balance`` of these accounts with the journal.
+
+    Writes only journal postings, so the cache goes stale with every
+    transaction. Returns ``(account id, cached balance, ledger balance)``
+    for every account that disagrees; with ``fix`` the accounts are locked
+    in id order and their cache is refreshed from the journal.
+    """
+    with transaction.atomic():
+        accounts = FinanceAccount.objects.filter(pk__in=account_ids).order_by('pk')
+        if fix:
+            list(accounts.select_for_update().values_list('pk'))
+
+        mismatches = [
+            (row['pk'], row['current_balance'], ledger_balance)
+            for row in ledger_balances(accounts).values('pk', 'current_balance', 'ledger_balance')
+            for ledger_balance in [row['ledger_balance'].quantize(CENT)]
+            if row['current_balance'] != ledger_balance
+        ]
+
+        if fix:
+            now = timezone.now()
+            for account_id, _, ledger_balance in mismatches:
+                FinanceAccount.objects.filter(pk=account_id).update(
+                    current_balance=ledger_balance, updated_at=now
+                )
+
+    return mismatches
+
+
+def checkpoint_accounts(account_ids, settle_time):
+    """Record a checkpoint for each account with postings since its last one.
+
+    Only postings older than ``settle_time`` are folded in, so a writer that
+    commits late with a lower posting id is never skipped. Returns the
+    number of checkpoints created.
+    """
+    through = LedgerPosting.objects.filter(
+        created_at__lte=timezone.now() - settle_time
+    ).aggregate(last=Max('id'))['last']
+    if through is None:
+        return 0
+
+    new_postings = LedgerPosting.objects.filter(
+        account=OuterRef('pk'),
+        id__gt=Coalesce(OuterRef('checkpoint_posting_id'), Value(0)),
+        id__lte=through
+    )
+    rows = ledger_balances(
+        FinanceAccount.objects.filter(pk__in=account_ids), through=through
+    ).filter(Exists(new_postings)).values('pk', 'ledger_balance')
+
+    checkpoints = BalanceCheckpoint.objects.bulk_create([
+        BalanceCheckpoint(account_id=row['pk'], last_posting_id=through, balance=row['ledger_balance'])
+        for row in rows
+    ], batch_size=1000)
+    return len(checkpoints)
+
+
+def backfill_accounts(account_ids):
+    """Journal the existing transactions of accounts that have no postings yet.
+
+    Each account gets a posting per transaction leg plus an opening posting
+    for the part of ``current_balance`` its transactions do not explain.
+    Returns the number of postings written.
+    """
+    with transaction.atomic():
+        account_ids = list(
+            FinanceAccount.objects.select_for_update().filter(pk__in=account_ids)
+            .exclude(ledger_postings__isnull=False).order_by('pk').values_list('pk', flat=True)
+        )
+        if not account_ids:
+            return 0
+        accounts = set(account_ids)
+
+        postings = [
+            posting
+            for posting in transaction_postings(
+                Transaction.objects.filter(Q(account_id__in=accounts) | Q(to_account_id__in=accounts))
+                .only('id', 'account_id', 'to_account_id', 'transaction_type', 'amount',
+                      'transaction_date', 'transaction_day')
+                .order_by('transaction_date', 'id')
+                .iterator(chunk_size=2000)
+            )
+            if posting.account_id in accounts
+        ]
+
+        explained = {account_id: Decimal('0.00') for account_id in account_ids}
+        for posting in postings:
+            explained[posting.account_id] += posting.amount
+
+        today = timezone.localdate()
+        first_day = {}
+        for posting in postings:
+            first_day.setdefault(posting.account_id, posting.day)
+
+        balances = FinanceAccount.objects.filter(pk__in=account_ids).values_list('pk', 'current_balance')
+        openings = [
+            LedgerPosting(
+                account_id=account_id,
+                kind='OPENING',
+                amount=balance - explained[account_id],
+                day=first_day.get(account_id, today)
+            )
+            for account_id, balance in balances if balance != explained[account_id]
+        ]
+
+        record_postings(openings + postings)
+        return len(openings) + len(postings)
+
+
+def map_account_batches(func, account_ids, batch_size=1000, workers=4):
+    """Yield ``func(batch)`` for batches of account ids, run on worker threads.
+
+    Batches never share an account, so workers take disjoint row locks; each
+    thread uses and finally closes its own database connection.
+    """
+    account_ids = list(account_ids)
+    batches = [account_ids[start:start + batch_size] for start in range(0, len(account_ids), batch_size)]
+
+    def run(batch):
+        try:
+            return func(batch)
+        finally:
+            connection.close()
+
+    if workers <= 1:
+        yield from map(func, batches)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(run, batches)
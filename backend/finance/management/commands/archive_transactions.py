@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+from finance.archive import ARCHIVE_DIR, archive_year
+from finance.models import Transaction
+
+
+class Command(BaseCommand):
+    help = ('Move transactions of old calendar years out of the database into compressed '
+            'per-year archive files; archived transactions stay readable through the API')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-years', type=int, default=3,
+                            help='Archive years that ended more than this many years ago')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Rows fetched from the database per round trip')
+
+    def handle(self, *args, **options):
+        if options['older_than_years'] < 1:
+            raise CommandError('--older-than-years must be at least 1')
+
+        first = Transaction.objects.aggregate(first=Min('transaction_date'))['first']
+        if first is None:
+            self.stdout.write('No transactions to archive')
+            return
+
+        this_year = timezone.localdate().year
+        total = 0
+        for year in range(timezone.localtime(first).year, this_year - options['older_than_years']):
+            archived = archive_year(year, chunk_size=options['chunk_size'])
+            total += archived
+            self.stdout.write(f'{year}: archived {archived} transactions')
+
+        self.stdout.write(self.style.SUCCESS(f'Archived {total} transactions to {ARCHIVE_DIR}'))
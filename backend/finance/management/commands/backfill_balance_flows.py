@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from finance.balances import rebuild_balance_flows
+from finance.models import FinanceAccount
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily, monthly and yearly balance flows of every account from the ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Accounts rebuilt per database transaction')
+
+    def handle(self, *args, **options):
+        account_ids = list(FinanceAccount.objects.order_by('pk').values_list('pk', flat=True))
+        batch_size = options['batch_size']
+
+        written = 0
+        for start in range(0, len(account_ids), batch_size):
+            written += rebuild_balance_flows(account_ids[start:start + batch_size])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} balance flows for {len(account_ids)} accounts'
+        ))
@@ -0,0 +1,66 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+from finance.models import CropFinance, Transaction
+from finance.services import (
+    CROP_COST_FIELDS, CROP_OTHER_COSTS_FIELD, CROP_REVENUE_FIELD, crop_bucket_names, crop_finance_field
+)
+
+ROLLUP_FIELDS = [*CROP_COST_FIELDS.values(), CROP_OTHER_COSTS_FIELD, CROP_REVENUE_FIELD]
+
+
+class Command(BaseCommand):
+    help = ('Recompute crop season cost buckets and revenue from the transactions tagged with '
+            'each season (replaces hand-entered amounts for seasons that have tagged transactions)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Crop seasons recomputed per database transaction')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = Transaction.objects.aggregate(last=Max('crop_finance_id'))['last'] or 0
+        updated = 0
+
+        for start in range(0, last_id, batch_size):
+            end = start + batch_size
+
+            # One grouped query per batch of crop seasons
+            rows = Transaction.objects.filter(
+                crop_finance_id__gt=start,
+                crop_finance_id__lte=end,
+                transaction_type__in=['INCOME', 'EXPENSE']
+            ).values(
+                'crop_finance_id', 'transaction_type', 'expense_category_id'
+            ).annotate(total=Sum('amount')).order_by()
+
+            rows = list(rows)
+            category_names = crop_bucket_names(
+                {row['expense_category_id'] for row in rows if row['expense_category_id']}
+            )
+            totals = defaultdict(lambda: dict.fromkeys(ROLLUP_FIELDS, Decimal('0.00')))
+            for row in rows:
+                field = crop_finance_field(row['transaction_type'], category_names.get(row['expense_category_id']))
+                totals[row['crop_finance_id']][field] += row['total']
+
+            if not totals:
+                continue
+
+            now = timezone.now()
+            with transaction.atomic():
+                crop_finances = list(
+                    CropFinance.objects.select_for_update().filter(pk__in=totals).only('id', *ROLLUP_FIELDS)
+                )
+                for crop_finance in crop_finances:
+                    for field, amount in totals[crop_finance.id].items():
+                        setattr(crop_finance, field, amount)
+                    crop_finance.updated_at = now
+                CropFinance.objects.bulk_update(crop_finances, [*ROLLUP_FIELDS, 'updated_at'])
+
+            updated += len(crop_finances)
+
+        self.stdout.write(self.style.SUCCESS(f'Recomputed {updated} crop seasons'))
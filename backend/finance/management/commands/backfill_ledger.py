@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from finance.ledger import backfill_accounts, map_account_batches
+from finance.models import FinanceAccount
+
+
+class Command(BaseCommand):
+    help = ('Journal the existing transactions and opening balances of accounts '
+            'that have no ledger postings yet')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Accounts journaled per database transaction')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Batches processed in parallel')
+
+    def handle(self, *args, **options):
+        account_ids = FinanceAccount.objects.filter(
+            ledger_postings__isnull=True
+        ).order_by('pk').values_list('pk', flat=True)
+
+        written = sum(map_account_batches(
+            backfill_accounts, account_ids, options['batch_size'], options['workers']
+        ))
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} ledger postings'))
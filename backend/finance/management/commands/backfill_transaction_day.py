@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+from django.db.models.functions import TruncDate
+from finance.models import Transaction
+
+
+class Command(BaseCommand):
+    help = 'Fill the stored local transaction_day for transactions created before the column existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows updated per statement')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        pending = Transaction.objects.filter(transaction_day__isnull=True)
+        bounds = pending.aggregate(low=Min('id'), high=Max('id'))
+
+        if bounds['low'] is None:
+            self.stdout.write(self.style.SUCCESS('All transactions already have a transaction_day'))
+            return
+
+        updated = 0
+        # Set-based update per id range; TruncDate converts to the current (TIME_ZONE) zone in SQL
+        for start in range(bounds['low'], bounds['high'] + 1, batch_size):
+            updated += pending.filter(
+                id__gte=start, id__lt=start + batch_size
+            ).update(transaction_day=TruncDate('transaction_date'))
+
+        self.stdout.write(self.style.SUCCESS(f'Backfilled transaction_day for {updated} transactions'))
@@ -0,0 +1,28 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from finance.bootstrap import bootstrap_farmers
+
+
+class Command(BaseCommand):
+    help = ('Provision default categories, Cash/Savings accounts and starter budgets for farmers '
+            'that have no finance accounts yet')
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*',
+                            help='Only these farmers (default: every active non-staff user)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Farmers provisioned per database transaction')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(is_active=True)
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        else:
+            users = users.filter(is_staff=False)
+
+        farmer_ids = users.exclude(finance_accounts__isnull=False).values_list('id', flat=True)
+        counts = bootstrap_farmers(farmer_ids.iterator(), batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            'Provisioned {farmers} farmers with {accounts} accounts and {budgets} budgets'.format(**counts)
+        ))
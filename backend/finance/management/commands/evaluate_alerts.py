@@ -0,0 +1,26 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from finance.alerts import evaluate_alerts
+
+
+class Command(BaseCommand):
+    help = 'Evaluate budgets and goals of all farmers and refresh finance alerts (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Evaluate as of this date (YYYY-MM-DD), defaults to today')
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Date must be in YYYY-MM-DD format')
+
+        counts = evaluate_alerts(today)
+
+        self.stdout.write(self.style.SUCCESS(
+            'Alerts: {BUDGET_OVERSPENT} overspent, {BUDGET_BURN_RATE} burn rate, '
+            '{GOAL_DEADLINE} goal deadlines'.format(**counts)
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from finance.cache import cache_is_shared
+from finance.forecasting import forecast_all_farmers
+
+
+class Command(BaseCommand):
+    help = 'Precompute cash-flow forecasts for every farmer and store them in the cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, nargs='+', default=[6],
+                            help='Forecast horizons to compute (3-12 months)')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Accounts fitted together in one batch')
+
+    def handle(self, *args, **options):
+        for months in options['months']:
+            if not 3 <= months <= 12:
+                raise CommandError('Forecast horizon must be between 3 and 12 months')
+        if not cache_is_shared():
+            raise CommandError(
+                'The default cache is local to this process, so the forecasts would never reach the '
+                'web workers; set REDIS_URL to use a shared Redis cache'
+            )
+
+        for months in options['months']:
+            farmers = forecast_all_farmers(months, chunk_size=options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Forecast {months} months ahead for {farmers} farmers'
+            ))
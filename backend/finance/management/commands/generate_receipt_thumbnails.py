@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from finance.models import Transaction
+from finance.receipts import generate_receipt_thumbnail
+
+
+class Command(BaseCommand):
+    help = 'Generate thumbnails for stored transaction receipts that do not have one yet'
+
+    def handle(self, *args, **options):
+        pending = Transaction.objects.exclude(
+            Q(receipt_image='') | Q(receipt_image__isnull=True)
+        ).filter(
+            Q(receipt_thumbnail='') | Q(receipt_thumbnail__isnull=True)
+        ).values_list('receipt_image', flat=True).distinct()
+
+        generated = 0
+        for name in pending.iterator():
+            try:
+                generate_receipt_thumbnail(name)
+                generated += 1
+            except (OSError, ValueError) as exc:
+                self.stderr.write(f'Skipping {name}: {exc}')
+
+        self.stdout.write(self.style.SUCCESS(f'Generated thumbnails for {generated} receipts'))
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from finance.partitioning import (
+    conversion_sql, create_partition_sql, existing_partitions, is_partitioned,
+    secondary_index_definitions, year_range
+)
+
+
+class Command(BaseCommand):
+    help = ('Range-partition the transactions table by transaction_date year (PostgreSQL), '
+            'or add the upcoming yearly partitions once it is partitioned (run yearly)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--years-ahead', type=int, default=1,
+                            help='Also create partitions for this many future years')
+        parser.add_argument('--dry-run', action='store_true', help='Print the SQL instead of running it')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Table partitioning requires PostgreSQL')
+
+        this_year = timezone.localdate().year
+        last_year = this_year + options['years_ahead']
+
+        if is_partitioned():
+            attached = existing_partitions()
+            statements = [
+                create_partition_sql(year)
+                for year in range(this_year, last_year + 1) if year not in attached
+            ]
+            summary = f'Added {len(statements)} yearly partitions'
+        else:
+            first_year, data_last_year = year_range()
+            statements = conversion_sql(
+                first_year, max(last_year, data_last_year), secondary_index_definitions()
+            )
+            summary = (f'Partitioned transactions into yearly partitions '
+                       f'{first_year}-{max(last_year, data_last_year)}')
+
+        if options['dry_run']:
+            for statement in statements:
+                self.stdout.write(f'{statement};')
+            return
+
+        # The conversion rewrites the table and holds an exclusive lock until it commits
+        with transaction.atomic(), connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+        self.stdout.write(self.style.SUCCESS(summary))
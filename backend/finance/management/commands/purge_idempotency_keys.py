@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from finance.idempotency import IDEMPOTENCY_KEY_TTL
+from finance.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Delete stored idempotency keys older than their time-to-live'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=int, default=None,
+            help='Override the configured time-to-live (FINANCE_IDEMPOTENCY_KEY_TTL_HOURS)'
+        )
+
+    def handle(self, *args, **options):
+        ttl = timedelta(hours=options['hours']) if options['hours'] is not None else IDEMPOTENCY_KEY_TTL
+        deleted, _ = IdempotencyKey.objects.filter(
+            created_at__lt=timezone.now() - ttl
+        ).delete()
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired idempotency keys'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from finance.categories import rebuild_category_closure
+from finance.models import ExpenseCategory, IncomeCategory
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the expense and income category closure tables from the parent links'
+
+    def handle(self, *args, **options):
+        expense_rows = rebuild_category_closure(ExpenseCategory)
+        income_rows = rebuild_category_closure(IncomeCategory)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {expense_rows} expense and {income_rows} income category closure rows'
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from finance.cohorts import refresh_expense_summaries
+
+
+class Command(BaseCommand):
+    help = 'Refresh the materialized expense summaries behind cohort analytics (run every few minutes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Rebuild every farmer instead of only those changed since the last run')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Farmers rebuilt per batch')
+
+    def handle(self, *args, **options):
+        farmers = refresh_expense_summaries(full=options['full'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Refreshed expense summaries of {farmers} farmers'))
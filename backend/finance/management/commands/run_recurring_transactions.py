@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from finance.recurring import materialize_due_transactions
+
+
+class Command(BaseCommand):
+    help = 'Record every due occurrence of the active recurring transactions (run daily)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Treat this day (YYYY-MM-DD) as today')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Rules processed per database transaction')
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--date must be YYYY-MM-DD')
+
+        rules, created = materialize_due_transactions(today, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Created {created} transactions from {rules} recurring rules'))
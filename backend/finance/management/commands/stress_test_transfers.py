@@ -0,0 +1,88 @@
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from finance.balances import account_flow
+from finance.ledger import account_balances
+from finance.models import FinanceAccount, Transaction
+from finance.services import TransferError, transfer_funds
+
+
+class Command(BaseCommand):
+    help = ('Hammer transfers and transfer batches from parallel threads on a throwaway farmer, '
+            'then check that no money was created, lost or overdrawn (PostgreSQL)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--operations', type=int, default=200,
+                            help='Transfers or transfer batches per thread')
+        parser.add_argument('--accounts', type=int, default=4)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--keep', action='store_true', help='Keep the stress test farmer afterwards')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql' and options['threads'] > 1:
+            raise CommandError('Parallel transfers need row locks; run against PostgreSQL or use --threads 1')
+
+        farmer = User.objects.create_user(f'transfer-stress-{timezone.now():%Y%m%d%H%M%S%f}')
+        opening = Decimal('1000.00')
+        account_ids = [
+            FinanceAccount.objects.create(
+                farmer=farmer, account_name=f'Stress {index}', account_type='CASH', current_balance=opening
+            ).pk
+            for index in range(options['accounts'])
+        ]
+        counts = {'applied': 0, 'refused': 0}
+        lock = threading.Lock()
+
+        def worker(seed):
+            rng = random.Random(seed)
+            try:
+                for _ in range(options['operations']):
+                    # Mix single transfers with batches that cross in both directions
+                    transfers = [
+                        (*rng.sample(account_ids, 2), Decimal(rng.randrange(1, 40000)) / 100, 'Stress transfer')
+                        for _ in range(rng.choice([1, 1, 2, 3]))
+                    ]
+                    try:
+                        transfer_funds(farmer, transfers)
+                        outcome = 'applied'
+                    except TransferError:
+                        outcome = 'refused'
+                    with lock:
+                        counts[outcome] += 1
+            finally:
+                connection.close()
+
+        seed = options['seed'] if options['seed'] is not None else random.randrange(2 ** 32)
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            list(pool.map(worker, [seed + index for index in range(options['threads'])]))
+
+        balances = account_balances(account_ids)
+        problems = []
+        if sum(balances.values()) != opening * len(account_ids):
+            problems.append(f'total balance {sum(balances.values())} != {opening * len(account_ids)}')
+        problems.extend(
+            f'account {account_id} overdrawn: {balance}' for account_id, balance in balances.items() if balance < 0
+        )
+        problems.extend(
+            f'account {account_id}: ledger {balance}, transactions {opening + flow}'
+            for account_id, balance in balances.items()
+            for flow in [account_flow(account_id).quantize(Decimal('0.01'))]
+            if balance != opening + flow
+        )
+        transfers = Transaction.objects.filter(farmer=farmer).count()
+
+        if not options['keep']:
+            farmer.delete()
+
+        summary = (f"{counts['applied']} operations applied ({transfers} transfers), "
+                   f"{counts['refused']} refused for insufficient balance, seed {seed}")
+        if problems:
+            raise CommandError(f'{summary}; ' + '; '.join(problems))
+        self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from finance.ledger import checkpoint_accounts, map_account_batches, verify_accounts
+from finance.models import FinanceAccount
+from finance.sync import SYNC_SETTLE_TIME
+
+
+class Command(BaseCommand):
+    help = ('Compare every cached current_balance with the ledger journal in parallel; '
+            'optionally refresh the stale caches and record balance checkpoints')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='Refresh stale current_balance caches from the journal')
+        parser.add_argument('--checkpoint', action='store_true',
+                            help='Record a balance checkpoint for accounts with new postings')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Accounts checked per query')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Batches processed in parallel')
+
+    def handle(self, *args, **options):
+        def process(batch):
+            mismatches = verify_accounts(batch, fix=options['fix'])
+            checkpoints = checkpoint_accounts(batch, SYNC_SETTLE_TIME) if options['checkpoint'] else 0
+            return mismatches, checkpoints
+
+        account_ids = FinanceAccount.objects.order_by('pk').values_list('pk', flat=True)
+        mismatched = checkpointed = 0
+
+        for mismatches, checkpoints in map_account_batches(
+            process, account_ids, options['batch_size'], options['workers']
+        ):
+            checkpointed += checkpoints
+            for account_id, cached, ledger in mismatches:
+                mismatched += 1
+                self.stdout.write(self.style.WARNING(
+                    f'Account {account_id}: cached {cached}, ledger {ledger}'
+                ))
+
+        action = 'refreshed' if options['fix'] else 'found'
+        self.stdout.write(self.style.SUCCESS(
+            f'{mismatched} stale cached balances {action}, {checkpointed} checkpoints recorded'
+        ))
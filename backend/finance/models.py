@@ -1,7 +1,19 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import User
 from decimal import Decimal
 
+from django.utils import timezone
+
+from .receipts import receipt_storage
+
+
+def local_day(value):
+    """Calendar date of a datetime in the project's time zone"""
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return timezone.localdate(value)
+
 class FinanceAccount(models.Model):
     """Model to represent different finance accounts for a farmer"""
     ACCOUNT_TYPES = [
@@ -17,6 +29,7 @@ class FinanceAccount(models.Model):
     account_type = models.CharField(max_length=20, choices=ACCOUNT_TYPES)
     account_number = models.CharField(max_length=50, blank=True, null=True)
     bank_name = models.CharField(max_length=100, blank=True, null=True)
+    # Cache of the ledger journal, refreshed by verify_ledger --fix; reads use ledger_balances()
     current_balance = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -25,6 +38,9 @@ class FinanceAccount(models.Model):
     class Meta:
         db_table = 'finance_accounts'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['farmer', 'updated_at'], name='accounts_farmer_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.farmer.username} - {self.account_name}"
@@ -34,6 +50,8 @@ class ExpenseCategory(models.Model):
     """Model for expense categories"""
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True, null=True)
+    # Subcategories roll up into their parent; the tree is mirrored in ExpenseCategoryClosure
+    parent = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='children')
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -44,11 +62,18 @@ class ExpenseCategory(models.Model):
     def __str__(self):
         return self.name
 
+    def clean(self):
+        from .categories import CYCLE_MESSAGE, creates_cycle
+        if creates_cycle(self, self.parent):
+            raise ValidationError({'parent': CYCLE_MESSAGE})
+
 
 class IncomeCategory(models.Model):
     """Model for income categories"""
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True, null=True)
+    # Subcategories roll up into their parent; the tree is mirrored in IncomeCategoryClosure
+    parent = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='children')
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -59,6 +84,43 @@ class IncomeCategory(models.Model):
     def __str__(self):
         return self.name
 
+    def clean(self):
+        from .categories import CYCLE_MESSAGE, creates_cycle
+        if creates_cycle(self, self.parent):
+            raise ValidationError({'parent': CYCLE_MESSAGE})
+
+
+class ExpenseCategoryClosure(models.Model):
+    """Every (ancestor, descendant) pair of the expense category tree, a category with itself at depth 0"""
+    ancestor = models.ForeignKey(ExpenseCategory, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(ExpenseCategory, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveSmallIntegerField()
+
+    class Meta:
+        db_table = 'expense_category_closure'
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='expense_closure_pair_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['descendant', 'depth'], name='expense_closure_desc_idx'),
+        ]
+
+
+class IncomeCategoryClosure(models.Model):
+    """Every (ancestor, descendant) pair of the income category tree, a category with itself at depth 0"""
+    ancestor = models.ForeignKey(IncomeCategory, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(IncomeCategory, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveSmallIntegerField()
+
+    class Meta:
+        db_table = 'income_category_closure'
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='income_closure_pair_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['descendant', 'depth'], name='income_closure_desc_idx'),
+        ]
+
 
 class Transaction(models.Model):
     """Model to track all financial transactions"""
@@ -81,84 +143,153 @@ class Transaction(models.Model):
     # Transfer related fields
     to_account = models.ForeignKey(FinanceAccount, on_delete=models.SET_NULL, null=True, blank=True, related_name='incoming_transfers')
 
+    # Crop season the money was spent on or earned from; rolled up into its cost buckets
+    crop_finance = models.ForeignKey('CropFinance', on_delete=models.SET_NULL, null=True, blank=True, related_name='transactions')
+    # Rule that generated this transaction; unique per occurrence date so reruns cannot duplicate it
+    recurring_rule = models.ForeignKey(
+        'RecurringTransaction', on_delete=models.SET_NULL, db_constraint=False, null=True, blank=True,
+        related_name='transactions'
+    )
+
+    tags = models.ManyToManyField(
+        'TransactionTag', through='TransactionTagging', blank=True, related_name='transactions'
+    )
+
     transaction_date = models.DateTimeField()
+    # Local (TIME_ZONE) date of transaction_date, stored so day/month filters can use an index
+    transaction_day = models.DateField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     # Additional metadata
     reference_number = models.CharField(max_length=100, blank=True, null=True)
     notes = models.TextField(blank=True, null=True)
-    receipt_image = models.ImageField(upload_to='transaction_receipts/', blank=True, null=True)
+    receipt_image = models.ImageField(upload_to='transaction_receipts/', storage=receipt_storage, blank=True, null=True)
+    receipt_thumbnail = models.ImageField(storage=receipt_storage, blank=True, null=True, editable=False)
 
     class Meta:
         db_table = 'transactions'
         ordering = ['-transaction_date']
+        constraints = [
+            # Includes transaction_date, the partition key, so it holds on a partitioned table
+            models.UniqueConstraint(
+                fields=['recurring_rule', 'transaction_date'],
+                condition=models.Q(recurring_rule__isnull=False),
+                name='unique_recurring_occurrence'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['farmer', 'updated_at'], name='txn_farmer_updated_idx'),
+            models.Index(fields=['updated_at'], name='txn_updated_idx'),
+            models.Index(fields=['farmer', 'transaction_day'], name='txn_farmer_day_idx'),
+            models.Index(fields=['farmer', 'transaction_type', 'transaction_day'], name='txn_farmer_type_day_idx'),
+            models.Index(fields=['farmer', 'expense_category', 'transaction_day'], name='txn_farmer_category_day_idx'),
+            # Account statements and balance lookups read both sides of transfers
+            models.Index(fields=['account', 'transaction_day'], name='txn_account_day_idx'),
+            models.Index(fields=['to_account', 'transaction_day'], name='txn_to_account_day_idx'),
+        ]
 
     def __str__(self):
         return f"{self.farmer.username} - {self.transaction_type} - ₹{self.amount}"
 
     def save(self, *args, **kwargs):
-        """Override save to update account balance"""
+        """Override save to journal the balance change and update the rollups"""
         is_new = self._state.adding
         old_transaction = None
 
         if not is_new:
             old_transaction = Transaction.objects.get(pk=self.pk)
 
+        self.transaction_day = local_day(self.transaction_date)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'transaction_date' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'transaction_day'}
+
         super().save(*args, **kwargs)
 
-        # Update account balance
-        self.update_account_balance(old_transaction)
+        self.update_crop_finance(old_transaction)
+        self.update_balance_flows(old_transaction)
+        self.record_ledger_postings(old_transaction)
 
     def delete(self, *args, **kwargs):
-        """Override delete to update account balance"""
-        account = self.account
-        to_account = self.to_account
+        """Override delete to reverse the journal postings and the rollups"""
+        from .ledger import record_postings, transaction_postings
+        reversals = transaction_postings([self], kind='REVERSAL')
 
         super().delete(*args, **kwargs)
+        record_postings(reversals)
 
-        # Reverse the transaction impact on balance
-        if self.transaction_type == 'INCOME':
-            account.current_balance -= self.amount
-        elif self.transaction_type == 'EXPENSE':
-            account.current_balance += self.amount
-        elif self.transaction_type == 'TRANSFER':
-            account.current_balance += self.amount
-            if to_account:
-                to_account.current_balance -= self.amount
-                to_account.save()
-
-        account.save()
-
-    def update_account_balance(self, old_transaction=None):
-        """Update account balances based on transaction"""
-        account = self.account
-        to_account = self.to_account
-
-        # If updating existing transaction, reverse old impact first
+        # Take the transaction out of its crop season rollup
+        from .services import apply_crop_deltas, transaction_crop_deltas
+        apply_crop_deltas(transaction_crop_deltas([self], sign=-1))
+
+        from .balances import apply_flow_deltas, transaction_flow_deltas
+        apply_flow_deltas(transaction_flow_deltas([self], sign=-1))
+
+    def update_crop_finance(self, old_transaction=None):
+        """Move the transaction's amount between crop season cost buckets"""
+        from .services import apply_crop_deltas, merge_crop_deltas, transaction_crop_deltas
+
+        deltas = transaction_crop_deltas([self])
+        if old_transaction:
+            deltas = merge_crop_deltas(deltas, transaction_crop_deltas([old_transaction], sign=-1))
+        apply_crop_deltas(deltas)
+
+    def update_balance_flows(self, old_transaction=None):
+        """Move the transaction's amount between the daily balance flows it falls in"""
+        from .balances import apply_flow_deltas, transaction_flow_deltas
+
+        deltas = transaction_flow_deltas([self])
+        if old_transaction:
+            for key, delta in transaction_flow_deltas([old_transaction], sign=-1).items():
+                deltas[key] += delta
+        apply_flow_deltas(deltas)
+
+    def record_ledger_postings(self, old_transaction=None):
+        """Journal the transaction's legs, reversing the old ones when they changed"""
+        from .ledger import record_postings, transaction_legs, transaction_postings
+
+        postings = transaction_postings([self])
         if old_transaction:
-            if old_transaction.transaction_type == 'INCOME':
-                account.current_balance -= old_transaction.amount
-            elif old_transaction.transaction_type == 'EXPENSE':
-                account.current_balance += old_transaction.amount
-            elif old_transaction.transaction_type == 'TRANSFER':
-                account.current_balance += old_transaction.amount
-                if old_transaction.to_account:
-                    old_transaction.to_account.current_balance -= old_transaction.amount
-                    old_transaction.to_account.save()
-
-        # Apply new transaction impact
-        if self.transaction_type == 'INCOME':
-            account.current_balance += self.amount
-        elif self.transaction_type == 'EXPENSE':
-            account.current_balance -= self.amount
-        elif self.transaction_type == 'TRANSFER':
-            account.current_balance -= self.amount
-            if to_account:
-                to_account.current_balance += self.amount
-                to_account.save()
-
-        account.save()
+            if (transaction_legs(old_transaction) == transaction_legs(self)
+                    and old_transaction.transaction_day == self.transaction_day):
+                return
+            postings = transaction_postings([old_transaction], kind='REVERSAL') + postings
+        record_postings(postings)
+
+
+class TransactionTag(models.Model):
+    """Free-form label a farmer attaches to any number of transactions"""
+    farmer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transaction_tags')
+    name = models.CharField(max_length=50)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'transaction_tags'
+        ordering = ['name']
+        unique_together = ['farmer', 'name']
+
+    def __str__(self):
+        return f"{self.farmer.username} - {self.name}"
+
+
+class TransactionTagging(models.Model):
+    """Link between a transaction and one of its tags"""
+    # No database constraint: a partitioned transactions table has no unique id to reference
+    transaction = models.ForeignKey(
+        Transaction, on_delete=models.CASCADE, db_constraint=False, related_name='taggings'
+    )
+    tag = models.ForeignKey(TransactionTag, on_delete=models.CASCADE, related_name='taggings')
+
+    class Meta:
+        db_table = 'transaction_taggings'
+        constraints = [
+            models.UniqueConstraint(fields=['transaction', 'tag'], name='unique_transaction_tag'),
+        ]
+        indexes = [
+            models.Index(fields=['tag', 'transaction'], name='tagging_tag_txn_idx'),
+        ]
 
 
 class Budget(models.Model):
@@ -180,6 +311,9 @@ class Budget(models.Model):
     class Meta:
         db_table = 'budgets'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['farmer', 'updated_at'], name='budgets_farmer_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.farmer.username} - {self.name}"
@@ -226,6 +360,9 @@ class CropFinance(models.Model):
         db_table = 'crop_finances'
         unique_together = ['farmer', 'crop_name', 'season', 'year']
         ordering = ['-year', '-created_at']
+        indexes = [
+            models.Index(fields=['farmer', 'updated_at'], name='crops_farmer_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.farmer.username} - {self.crop_name} {self.season} {self.year}"
@@ -272,6 +409,9 @@ class FinancialGoal(models.Model):
     class Meta:
         db_table = 'financial_goals'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['farmer', 'updated_at'], name='goals_farmer_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.farmer.username} - {self.goal_name}"
@@ -285,3 +425,271 @@ class FinancialGoal(models.Model):
         if self.target_amount == 0:
             return 0
         return (self.current_amount / self.target_amount) * 100
+
+
+class IdempotencyKey(models.Model):
+    """Stored response of a POST made with an ``Idempotency-Key`` header"""
+    farmer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField()
+    response_body = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        db_table = 'idempotency_keys'
+        constraints = [
+            models.UniqueConstraint(fields=['farmer', 'key'], name='unique_idempotency_key_per_farmer'),
+        ]
+
+    def __str__(self):
+        return f"{self.farmer_id} - {self.key}"
+
+
+class SyncTombstone(models.Model):
+    """Record of a deleted row, served to offline clients by the delta sync endpoint"""
+    # No database constraint: tombstones must outlive the rows (and farmers) they describe
+    farmer = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    collection = models.CharField(max_length=30)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'sync_tombstones'
+        indexes = [
+            models.Index(fields=['farmer', 'deleted_at'], name='tombstones_farmer_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.farmer_id} - {self.collection} #{self.object_id}"
+
+
+class FinanceAlert(models.Model):
+    """Alert produced by the nightly budget and goal evaluation"""
+    ALERT_TYPES = [
+        ('BUDGET_OVERSPENT', 'Budget Overspent'),
+        ('BUDGET_BURN_RATE', 'Budget Burn Rate'),
+        ('GOAL_DEADLINE', 'Goal Deadline Approaching'),
+    ]
+    PRIORITIES = [
+        ('high', 'High'),
+        ('medium', 'Medium'),
+        ('low', 'Low'),
+    ]
+
+    farmer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='finance_alerts')
+    alert_type = models.CharField(max_length=20, choices=ALERT_TYPES)
+    # Budget id for budget alerts, FinancialGoal id for goal alerts
+    source_id = models.BigIntegerField()
+    priority = models.CharField(max_length=10, choices=PRIORITIES)
+    title = models.CharField(max_length=150)
+    message = models.TextField()
+    amount = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
+    evaluated_on = models.DateField()
+    is_dismissed = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'finance_alerts'
+        ordering = ['-evaluated_on', '-id']
+        constraints = [
+            models.UniqueConstraint(fields=['alert_type', 'source_id'], name='unique_alert_per_source'),
+        ]
+        indexes = [
+            models.Index(fields=['farmer', 'is_dismissed', '-evaluated_on'], name='alerts_farmer_open_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.farmer_id} - {self.title}"
+
+
+class ExpenseSummary(models.Model):
+    """Materialized expense totals per farmer, month and category for cohort analytics"""
+    farmer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    month = models.DateField()
+    category = models.ForeignKey(ExpenseCategory, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    total = models.DecimalField(max_digits=15, decimal_places=2)
+    transaction_count = models.IntegerField()
+
+    class Meta:
+        db_table = 'expense_summaries'
+        constraints = [
+            models.UniqueConstraint(fields=['farmer', 'month', 'category'], name='unique_expense_summary'),
+        ]
+        indexes = [
+            models.Index(fields=['month', 'category'], name='expense_summary_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.farmer_id} - {self.month:%Y-%m} - {self.category_id}"
+
+
+class SummaryWatermark(models.Model):
+    """How far a materialized summary has been refreshed"""
+    name = models.CharField(max_length=50, unique=True)
+    refreshed_until = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'summary_watermarks'
+
+    def __str__(self):
+        return f"{self.name} @ {self.refreshed_until}"
+
+
+class TransactionArchive(models.Model):
+    """Location of one farmer's archived transactions inside a compressed archive file"""
+    farmer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transaction_archives')
+    year = models.IntegerField()
+    # Relative to FINANCE_TRANSACTION_ARCHIVE_DIR; each farmer is a separate gzip member of the file
+    file_name = models.CharField(max_length=255)
+    offset = models.BigIntegerField()
+    length = models.BigIntegerField()
+    row_count = models.IntegerField()
+    first_date = models.DateTimeField()
+    last_date = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'transaction_archives'
+        ordering = ['year', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['farmer', 'file_name'], name='unique_archive_member'),
+        ]
+        indexes = [
+            models.Index(fields=['farmer', 'year'], name='archive_farmer_year_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.farmer_id} - {self.year} ({self.row_count} transactions)"
+
+
+class BalanceFlow(models.Model):
+    """Net balance change of an account from the transactions of one day, month or year.
+
+    Each write adds its amount to the day, month and year it falls in, so
+    the closing balance of any day is the account's balance minus a sum
+    over at most a month of days, a year of months and the later years.
+    """
+    PERIODS = [
+        ('DAY', 'Day'),
+        ('MONTH', 'Month'),
+        ('YEAR', 'Year'),
+    ]
+
+    account = models.ForeignKey(FinanceAccount, on_delete=models.CASCADE, related_name='balance_flows')
+    period = models.CharField(max_length=5, choices=PERIODS)
+    start = models.DateField()
+    net_flow = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
+
+    class Meta:
+        db_table = 'balance_flows'
+        ordering = ['account', 'period', 'start']
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'period', 'start'], name='unique_balance_flow'),
+        ]
+
+    def __str__(self):
+        return f"{self.account_id} - {self.period} {self.start}: ₹{self.net_flow}"
+
+
+class LedgerPosting(models.Model):
+    """Append-only journal entry moving money into (positive) or out of an account"""
+    POSTING_KINDS = [
+        ('OPENING', 'Opening Balance'),
+        ('TRANSACTION', 'Transaction'),
+        ('REVERSAL', 'Reversal'),
+        ('ADJUSTMENT', 'Manual Adjustment'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    account = models.ForeignKey(FinanceAccount, on_delete=models.CASCADE, related_name='ledger_postings')
+    # Postings outlive edits, deletes and archiving of their transaction
+    transaction = models.ForeignKey(
+        Transaction, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True,
+        related_name='ledger_postings'
+    )
+    kind = models.CharField(max_length=20, choices=POSTING_KINDS)
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+    day = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'ledger_postings'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['account', 'id'], name='ledger_account_id_idx'),
+            models.Index(fields=['created_at'], name='ledger_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.account_id} - {self.kind}: ₹{self.amount}"
+
+    @property
+    def entry_type(self):
+        # Accounts hold assets, so money coming in is a debit
+        return 'DEBIT' if self.amount >= 0 else 'CREDIT'
+
+
+class BalanceCheckpoint(models.Model):
+    """Account balance after every ledger posting up to ``last_posting_id``"""
+    account = models.ForeignKey(FinanceAccount, on_delete=models.CASCADE, related_name='balance_checkpoints')
+    last_posting_id = models.BigIntegerField()
+    balance = models.DecimalField(max_digits=15, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'balance_checkpoints'
+        ordering = ['account', '-last_posting_id']
+        indexes = [
+            models.Index(fields=['account', '-last_posting_id'], name='checkpoint_account_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.account_id} @ {self.last_posting_id}: ₹{self.balance}"
+
+
+class RecurringTransaction(models.Model):
+    """Rule that records the same transaction on a fixed schedule"""
+    FREQUENCIES = [
+        ('DAILY', 'Daily'),
+        ('WEEKLY', 'Weekly'),
+        ('MONTHLY', 'Monthly'),
+        ('QUARTERLY', 'Quarterly'),
+        ('YEARLY', 'Yearly'),
+    ]
+
+    farmer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recurring_transactions')
+    account = models.ForeignKey(FinanceAccount, on_delete=models.CASCADE, related_name='recurring_transactions')
+    transaction_type = models.CharField(max_length=20, choices=Transaction.TRANSACTION_TYPES)
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+    description = models.TextField()
+    expense_category = models.ForeignKey(ExpenseCategory, on_delete=models.SET_NULL, null=True, blank=True)
+    income_category = models.ForeignKey(IncomeCategory, on_delete=models.SET_NULL, null=True, blank=True)
+    to_account = models.ForeignKey(
+        FinanceAccount, on_delete=models.SET_NULL, null=True, blank=True, related_name='incoming_recurring_transfers'
+    )
+
+    # Every ``interval`` days/weeks/months/quarters/years from start_date
+    frequency = models.CharField(max_length=10, choices=FREQUENCIES)
+    interval = models.PositiveIntegerField(default=1)
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    next_run_date = models.DateField()
+    last_run_date = models.DateField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        db_table = 'recurring_transactions'
+        ordering = ['next_run_date', 'id']
+        indexes = [
+            models.Index(fields=['is_active', 'next_run_date'], name='recurring_due_idx'),
+            models.Index(fields=['farmer', 'updated_at'], name='recurring_farmer_updated_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.farmer.username} - {self.description} ({self.get_frequency_display()})"
@@ -0,0 +1,137 @@
+from datetime import datetime
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.utils import timezone
+
+from .models import Transaction
+
+TABLE = Transaction._meta.db_table
+LEGACY_TABLE = f'{TABLE}_legacy'
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+
+def partition_name(year):
+    return f'{TABLE}_y{year}'
+
+
+def year_bounds(year):
+    """Start and end of a calendar year in the project's time zone, matching transaction_day"""
+    return (
+        timezone.make_aware(datetime(year, 1, 1)),
+        timezone.make_aware(datetime(year + 1, 1, 1)),
+    )
+
+
+def is_partitioned(using=DEFAULT_DB_ALIAS):
+    """Whether the transactions table is range partitioned (PostgreSQL only)"""
+    if connections[using].vendor != 'postgresql':
+        return False
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relkind = 'p' FROM pg_class c WHERE c.oid = to_regclass(%s)", [TABLE]
+        )
+        row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+def existing_partitions():
+    """``{year: table name}`` of the yearly partitions attached to transactions"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.oid = to_regclass(%s)
+            """,
+            [TABLE]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    prefix = f'{TABLE}_y'
+    return {
+        int(name[len(prefix):]): name
+        for name in names if name.startswith(prefix) and name[len(prefix):].isdigit()
+    }
+
+
+def create_partition_sql(year):
+    start, end = year_bounds(year)
+    return (
+        f'CREATE TABLE IF NOT EXISTS "{partition_name(year)}" PARTITION OF "{TABLE}" '
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+
+
+def conversion_sql(first_year, last_year, index_definitions):
+    """Statements that turn the plain transactions table into a partitioned one.
+
+    The table is rebuilt under its own name: the old table is renamed, a
+    partitioned copy with the same columns is created, one partition per
+    year plus a default partition are attached, rows are copied and the old
+    table is dropped. Postgres requires the partition key in the primary
+    key, so it becomes ``(id, transaction_date)``; ``id`` keeps its sequence.
+    """
+    statements = [
+        f'ALTER TABLE "{TABLE}" RENAME TO "{LEGACY_TABLE}"',
+        f'CREATE TABLE "{TABLE}" (LIKE "{LEGACY_TABLE}" INCLUDING DEFAULTS INCLUDING IDENTITY '
+        f'INCLUDING GENERATED INCLUDING STORAGE) PARTITION BY RANGE ("transaction_date")',
+        f'ALTER TABLE "{TABLE}" ADD PRIMARY KEY ("id", "transaction_date")',
+    ]
+
+    for field in Transaction._meta.concrete_fields:
+        if field.remote_field and field.db_constraint:
+            target = field.remote_field.model
+            statements.append(
+                f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{TABLE}_{field.column}_fk" '
+                f'FOREIGN KEY ("{field.column}") REFERENCES "{target._meta.db_table}" '
+                f'("{target._meta.pk.column}") DEFERRABLE INITIALLY DEFERRED'
+            )
+
+    statements.extend(create_partition_sql(year) for year in range(first_year, last_year + 1))
+    statements.append(f'CREATE TABLE "{DEFAULT_PARTITION}" PARTITION OF "{TABLE}" DEFAULT')
+
+    columns = ', '.join(f'"{field.column}"' for field in Transaction._meta.concrete_fields)
+    statements.append(
+        f'INSERT INTO "{TABLE}" ({columns}) OVERRIDING SYSTEM VALUE '
+        f'SELECT {columns} FROM "{LEGACY_TABLE}"'
+    )
+    statements.append(
+        f"SELECT setval(pg_get_serial_sequence('\"{TABLE}\"', 'id'), "
+        f'COALESCE((SELECT MAX("id") FROM "{TABLE}"), 1))'
+    )
+    statements.append(f'DROP TABLE "{LEGACY_TABLE}"')
+
+    # Secondary indexes are created on the parent after the copy and cascade to every partition
+    statements.extend(index_definitions)
+    statements.append(f'ANALYZE "{TABLE}"')
+    return statements
+
+
+def secondary_index_definitions():
+    """CREATE INDEX statements of the current table, minus the primary key"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT indexdef FROM pg_indexes
+            WHERE tablename = %s AND indexname NOT IN (
+                SELECT conname FROM pg_constraint
+                WHERE conrelid = to_regclass(%s) AND contype = 'p'
+            )
+            """,
+            [TABLE, TABLE]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def year_range():
+    """First and last year that holds transactions, in the project's time zone"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT MIN("transaction_date"), MAX("transaction_date") FROM "{TABLE}"')
+        first, last = cursor.fetchone()
+
+    this_year = timezone.localdate().year
+    first_year = timezone.localtime(first).year if first else this_year
+    last_year = timezone.localtime(last).year if last else this_year
+    return first_year, max(last_year, this_year)
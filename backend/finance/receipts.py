@@ -0,0 +1,136 @@
+import hashlib
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+logger = logging.getLogger('finance')
+
+RECEIPT_UPLOAD_DIR = 'transaction_receipts'
+THUMBNAIL_DIR = 'thumbs'
+THUMBNAIL_SIZE = getattr(settings, 'FINANCE_RECEIPT_THUMBNAIL_SIZE', (320, 320))
+THUMBNAIL_QUALITY = getattr(settings, 'FINANCE_RECEIPT_THUMBNAIL_QUALITY', 70)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """File storage that names every upload after the SHA-256 of its content.
+
+    The upload is hashed while it is streamed to a temporary file in chunks,
+    then moved to ``<dir>/<aa>/<sha256><ext>``. Re-uploading the same receipt
+    resolves to the file already on disk instead of writing a second copy.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Names are derived from content, so an existing file is a hit, not a clash
+        return name
+
+    def _save(self, name, content):
+        directory = os.path.dirname(name) or RECEIPT_UPLOAD_DIR
+        extension = os.path.splitext(name)[1].lower()
+
+        staging_dir = self.path(directory)
+        os.makedirs(staging_dir, exist_ok=True)
+        fd, staging_path = tempfile.mkstemp(dir=staging_dir, suffix='.part')
+
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(fd, 'wb') as staging_file:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    staging_file.write(chunk)
+
+            content_hash = digest.hexdigest()
+            final_name = f'{directory}/{content_hash[:2]}/{content_hash}{extension}'
+            final_path = self.path(final_name)
+
+            if os.path.exists(final_path):
+                os.remove(staging_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(staging_path, final_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(final_path, self.file_permissions_mode)
+        except Exception:
+            if os.path.exists(staging_path):
+                os.remove(staging_path)
+            raise
+
+        return final_name.replace('\\', '/')
+
+
+receipt_storage = ContentAddressedStorage()
+
+
+def thumbnail_name_for(name):
+    """Return the storage name of the thumbnail belonging to a receipt"""
+    base = os.path.splitext(os.path.basename(name))[0]
+    return f'{RECEIPT_UPLOAD_DIR}/{THUMBNAIL_DIR}/{base[:2]}/{base}.jpg'
+
+
+def generate_receipt_thumbnail(name):
+    """Create a compressed JPEG thumbnail for a stored receipt.
+
+    Safe to call from a worker thread, a management command or repeatedly:
+    the thumbnail is written to a temporary file and atomically renamed, and
+    an existing thumbnail is reused. Every transaction pointing at the same
+    receipt is updated in a single query.
+    """
+    from PIL import Image, ImageOps
+    from .models import Transaction
+
+    thumb_name = thumbnail_name_for(name)
+    thumb_path = receipt_storage.path(thumb_name)
+
+    if not os.path.exists(thumb_path):
+        with receipt_storage.open(name, 'rb') as source:
+            image = Image.open(source)
+            # Let the JPEG decoder downscale while reading, much cheaper than a full decode
+            image.draft('RGB', THUMBNAIL_SIZE)
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail(THUMBNAIL_SIZE)
+
+            buffer = BytesIO()
+            image.convert('RGB').save(buffer, 'JPEG', quality=THUMBNAIL_QUALITY, optimize=True)
+
+        os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+        fd, staging_path = tempfile.mkstemp(dir=os.path.dirname(thumb_path), suffix='.part')
+        with os.fdopen(fd, 'wb') as staging_file:
+            staging_file.write(buffer.getvalue())
+        os.replace(staging_path, thumb_path)
+
+    Transaction.objects.filter(receipt_image=name).exclude(
+        receipt_thumbnail=thumb_name
+    ).update(receipt_thumbnail=thumb_name, updated_at=timezone.now())
+
+    return thumb_name
+
+
+_thumbnail_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'FINANCE_RECEIPT_THUMBNAIL_WORKERS', 2),
+    thread_name_prefix='receipt-thumbnails'
+)
+
+
+def _run_thumbnail_job(name):
+    close_old_connections()
+    try:
+        generate_receipt_thumbnail(name)
+    except Exception:
+        logger.exception('Failed to generate thumbnail for receipt %s', name)
+    finally:
+        connection.close()
+
+
+def schedule_receipt_thumbnail(name):
+    """Generate the thumbnail in the background once the current transaction commits"""
+    transaction.on_commit(lambda: _thumbnail_executor.submit(_run_thumbnail_job, name))
@@ -0,0 +1,92 @@
+import calendar
+from datetime import date, datetime, time, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import RecurringTransaction, Transaction
+from .services import bulk_create_transactions
+
+# Occurrences created for one rule per pass; a rule far behind catches up over several passes
+MAX_OCCURRENCES_PER_PASS = 366
+
+MONTHS_PER_PERIOD = {'MONTHLY': 1, 'QUARTERLY': 3, 'YEARLY': 12}
+
+
+def _add_months(day, months, anchor_day):
+    """Move ``months`` ahead, keeping the rule's day of month where the month has it"""
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return date(year, month, min(anchor_day, calendar.monthrange(year, month)[1]))
+
+
+def next_occurrence(rule, day):
+    """The occurrence of a rule that follows the one on ``day``"""
+    if rule.frequency == 'DAILY':
+        return day + timedelta(days=rule.interval)
+    if rule.frequency == 'WEEKLY':
+        return day + timedelta(weeks=rule.interval)
+    return _add_months(day, MONTHS_PER_PERIOD[rule.frequency] * rule.interval, rule.start_date.day)
+
+
+def occurrence_transaction(rule, day):
+    return Transaction(
+        farmer_id=rule.farmer_id,
+        account_id=rule.account_id,
+        to_account_id=rule.to_account_id if rule.transaction_type == 'TRANSFER' else None,
+        transaction_type=rule.transaction_type,
+        amount=rule.amount,
+        description=rule.description,
+        expense_category_id=rule.expense_category_id,
+        income_category_id=rule.income_category_id,
+        recurring_rule=rule,
+        transaction_date=timezone.make_aware(datetime.combine(day, time.min))
+    )
+
+
+def materialize_due_transactions(today=None, batch_size=500):
+    """Record every occurrence of the active recurring rules that is due by ``today``.
+
+    Rules are claimed in batches with SELECT ... FOR UPDATE SKIP LOCKED, so
+    concurrent runs split the work. Each batch's occurrences go through
+    ``bulk_create_transactions`` (journal postings, budgets and the rest
+    applied in aggregate) and the rules' ``next_run_date`` is advanced in the same
+    database transaction, which makes reruns idempotent. Returns the number
+    of rules processed and transactions created.
+    """
+    today = today or timezone.localdate()
+    rules_processed = created = 0
+
+    while True:
+        with transaction.atomic():
+            rules = list(
+                RecurringTransaction.objects.select_for_update(skip_locked=True)
+                .filter(is_active=True, next_run_date__lte=today)
+                .order_by('next_run_date', 'id')[:batch_size]
+            )
+            if not rules:
+                break
+
+            now = timezone.now()
+            pending = []
+            for rule in rules:
+                day = rule.next_run_date
+                for _ in range(MAX_OCCURRENCES_PER_PASS):
+                    if day > today or (rule.end_date and day > rule.end_date):
+                        break
+                    pending.append(occurrence_transaction(rule, day))
+                    rule.last_run_date = day
+                    day = next_occurrence(rule, day)
+
+                rule.next_run_date = day
+                if rule.end_date and day > rule.end_date:
+                    rule.is_active = False
+                rule.updated_at = now
+
+            created += len(bulk_create_transactions(pending))
+            RecurringTransaction.objects.bulk_update(
+                rules, ['next_run_date', 'last_run_date', 'is_active', 'updated_at'], batch_size=batch_size
+            )
+            rules_processed += len(rules)
+
+    return rules_processed, created
@@ -0,0 +1,54 @@
+import datetime
+import uuid
+from decimal import Decimal
+
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack is optional
+    msgpack = None
+
+
+def _encode_msgpack_default(value):
+    """Encode types msgpack has no native representation for, as compactly as possible"""
+    if isinstance(value, Decimal):
+        if value == value.to_integral_value():
+            return int(value)
+        # Money values fit comfortably in a double; longer ones stay exact as strings
+        if len(value.as_tuple().digits) <= 15:
+            return float(value)
+        return str(value)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, Promise):
+        return force_str(value)
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    if hasattr(value, '__iter__'):
+        return list(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not MessagePack serializable')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Binary MessagePack renderer for low-bandwidth clients.
+
+    Selected with ``Accept: application/msgpack`` or ``?format=msgpack``.
+    Datetimes are sent as native MessagePack timestamps and decimals as
+    integers or doubles where that is lossless for the value.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(
+            data, default=_encode_msgpack_default, datetime=True, use_bin_type=True
+        )
@@ -0,0 +1,111 @@
+import logging
+
+from django.db import DatabaseError, connections
+from django.db.models import Q, TextField
+from django.db.models.functions import Cast, Upper
+
+logger = logging.getLogger('finance')
+
+# Free-text transaction columns covered by search
+SEARCH_FIELDS = ('description', 'notes', 'reference_number')
+# 'simple' does not stem, which suits names, village and mandi terms and receipt numbers
+SEARCH_CONFIG = 'simple'
+
+
+def _is_postgres(using):
+    return connections[using].vendor == 'postgresql'
+
+
+def search_vector():
+    from django.contrib.postgres.search import SearchVector
+    return SearchVector(*SEARCH_FIELDS, config=SEARCH_CONFIG)
+
+
+def substring_filter(term):
+    """Case-insensitive substring match on every search field.
+
+    On PostgreSQL ``icontains`` compiles to ``UPPER(col::text) LIKE ...``,
+    which the trigram indexes from :func:`search_indexes` cover.
+    """
+    condition = Q()
+    for field in SEARCH_FIELDS:
+        condition |= Q(**{f'{field}__icontains': term})
+    return condition
+
+
+def search_transactions(queryset, term, rank=True, also=None):
+    """Filter transactions by free text, best matches first when ``rank`` is set.
+
+    PostgreSQL matches whole words through the full-text index and partial
+    words or receipt numbers through the trigram indexes. Other databases
+    fall back to a plain substring match. ``also`` is an extra ``Q`` whose
+    matches are included as well.
+    """
+    term = term.strip()
+    if not term:
+        return queryset
+
+    condition = substring_filter(term)
+    if also is not None:
+        condition |= also
+
+    if not _is_postgres(queryset.db):
+        return queryset.filter(condition)
+
+    from django.contrib.postgres.search import SearchQuery, SearchRank
+
+    query = SearchQuery(term, config=SEARCH_CONFIG, search_type='websearch')
+    queryset = queryset.annotate(search_document=search_vector()).filter(
+        Q(search_document=query) | condition
+    )
+    if rank:
+        queryset = queryset.annotate(
+            search_rank=SearchRank(search_vector(), query)
+        ).order_by('-search_rank', '-transaction_date')
+    return queryset
+
+
+def search_indexes():
+    """GIN indexes behind :func:`search_transactions` (PostgreSQL only)"""
+    from django.contrib.postgres.indexes import GinIndex, OpClass
+
+    return [
+        GinIndex(search_vector(), name='txn_search_vector_idx'),
+        *(
+            GinIndex(
+                OpClass(Upper(Cast(field, TextField())), name='gin_trgm_ops'),
+                name=f'txn_{field}_trgm_idx'
+            )
+            for field in SEARCH_FIELDS
+        ),
+    ]
+
+
+def create_search_indexes(using='default', **kwargs):
+    """Create the search indexes after migrate.
+
+    They are expression indexes that need the pg_trgm extension, so they are
+    kept out of the model Meta and created here, concurrently and only once.
+    PostgreSQL cannot build an index concurrently on a partitioned table; there
+    the index is created on the parent, which builds it on every partition.
+    """
+    if not _is_postgres(using):
+        return
+
+    from .models import Transaction
+    from .partitioning import is_partitioned
+
+    connection = connections[using]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            existing = connection.introspection.get_constraints(cursor, Transaction._meta.db_table)
+    except DatabaseError:
+        logger.warning('Could not enable pg_trgm; transaction search will not be indexed')
+        return
+
+    concurrently = not is_partitioned(using)
+    with connection.schema_editor(atomic=False) as schema_editor:
+        for index in search_indexes():
+            if index.name not in existing:
+                schema_editor.add_index(Transaction, index, concurrently=concurrently)
@@ -1,12 +1,58 @@
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from django.utils import timezone
 from .models import (
     FinanceAccount, Transaction, ExpenseCategory, IncomeCategory,
-    Budget, CropFinance, FinancialGoal
+    Budget, CropFinance, FinancialGoal, FinanceAlert, RecurringTransaction, TransactionTag
 )
+from .categories import CYCLE_MESSAGE, creates_cycle
 
 
-class FinanceAccountSerializer(serializers.ModelSerializer):
-    """Serializer for FinanceAccount model"""
+def parse_fieldset(query_params):
+    """Return the ``?fields=`` and ``?omit=`` field names of a request as sets"""
+    def names(param):
+        return {
+            name.strip() for name in query_params.get(param, '').split(',') if name.strip()
+        }
+    return names('fields'), names('omit')
+
+
+class SparseFieldsetMixin:
+    """Let read requests trim a serializer with ``?fields=a,b`` and ``?omit=c``.
+
+    When the response is rendered as MessagePack, decimals and datetimes are
+    handed to the renderer as native values instead of formatted strings.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return
+
+        only, omit = parse_fieldset(request.query_params)
+        if only:
+            for name in set(self.fields) - only:
+                self.fields.pop(name)
+        for name in omit & set(self.fields):
+            self.fields.pop(name)
+
+        renderer = getattr(request, 'accepted_renderer', None)
+        if renderer is not None and renderer.format == 'msgpack':
+            for field in self.fields.values():
+                if isinstance(field, serializers.DecimalField):
+                    field.coerce_to_string = False
+                elif isinstance(field, (serializers.DateTimeField, serializers.DateField)):
+                    field.format = None
+
+
+class FinanceAccountSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Serializer for FinanceAccount model.
+
+    ``current_balance`` is reported from the journal when the account was
+    loaded through ``ledger_balances``; the stored column is only a cache.
+    """
 
     class Meta:
         model = FinanceAccount
@@ -16,26 +62,44 @@ class FinanceAccountSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if 'current_balance' in data and getattr(instance, 'ledger_balance', None) is not None:
+            data['current_balance'] = self.fields['current_balance'].to_representation(instance.ledger_balance)
+        return data
 
-class ExpenseCategorySerializer(serializers.ModelSerializer):
+
+class ExpenseCategorySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for ExpenseCategory model"""
 
     class Meta:
         model = ExpenseCategory
-        fields = ['id', 'name', 'description', 'is_active', 'created_at']
+        fields = ['id', 'name', 'description', 'parent', 'is_active', 'created_at']
         read_only_fields = ['id', 'created_at']
 
+    def validate_parent(self, value):
+        """Validate that the category does not end up under itself"""
+        if creates_cycle(self.instance, value):
+            raise serializers.ValidationError(CYCLE_MESSAGE)
+        return value
+
 
-class IncomeCategorySerializer(serializers.ModelSerializer):
+class IncomeCategorySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for IncomeCategory model"""
 
     class Meta:
         model = IncomeCategory
-        fields = ['id', 'name', 'description', 'is_active', 'created_at']
+        fields = ['id', 'name', 'description', 'parent', 'is_active', 'created_at']
         read_only_fields = ['id', 'created_at']
 
+    def validate_parent(self, value):
+        """Validate that the category does not end up under itself"""
+        if creates_cycle(self.instance, value):
+            raise serializers.ValidationError(CYCLE_MESSAGE)
+        return value
+
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for Transaction model (read operations)"""
     account_name = serializers.CharField(source='account.account_name', read_only=True)
     to_account_name = serializers.CharField(source='to_account.account_name', read_only=True)
@@ -48,21 +112,51 @@ class TransactionSerializer(serializers.ModelSerializer):
             'id', 'account', 'account_name', 'transaction_type', 'amount', 
             'description', 'expense_category', 'expense_category_name',
             'income_category', 'income_category_name', 'to_account', 
-            'to_account_name', 'transaction_date', 'created_at', 'updated_at',
-            'reference_number', 'notes', 'receipt_image'
+            'to_account_name', 'crop_finance', 'recurring_rule', 'transaction_date', 'created_at',
+            'updated_at', 'reference_number', 'notes', 'receipt_thumbnail'
         ]
+        read_only_fields = ['id', 'recurring_rule', 'created_at', 'updated_at', 'receipt_thumbnail']
+
+
+class TransactionTagSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Serializer for TransactionTag model"""
+
+    class Meta:
+        model = TransactionTag
+        fields = ['id', 'name', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+    def validate_name(self, value):
+        """Validate that the farmer has no other tag with this name"""
+        tags = TransactionTag.objects.filter(farmer=self.context['request'].user, name=value)
+        if self.instance is not None:
+            tags = tags.exclude(pk=self.instance.pk)
+        if tags.exists():
+            raise serializers.ValidationError("A tag with this name already exists")
+        return value
+
+
+class TransactionDetailSerializer(TransactionSerializer):
+    """Serializer for a single Transaction, including the full-size receipt and tags"""
+    tag_names = serializers.SlugRelatedField(source='tags', slug_field='name', many=True, read_only=True)
+
+    class Meta(TransactionSerializer.Meta):
+        fields = TransactionSerializer.Meta.fields + ['receipt_image', 'tags', 'tag_names']
+        read_only_fields = TransactionSerializer.Meta.read_only_fields + ['tags']
+
 
 class TransactionCreateSerializer(serializers.ModelSerializer):
     """Serializer for Transaction model (create/update operations)"""
+    tags = serializers.PrimaryKeyRelatedField(
+        many=True, queryset=TransactionTag.objects.all(), required=False
+    )
 
     class Meta:
         model = Transaction
         fields = [
             'account', 'transaction_type', 'amount', 'description',
-            'expense_category', 'income_category', 'to_account',
-            'transaction_date', 'reference_number', 'notes', 'receipt_image'
+            'expense_category', 'income_category', 'to_account', 'crop_finance',
+            'transaction_date', 'reference_number', 'notes', 'receipt_image', 'tags'
         ]
 
     def validate(self, data):
@@ -98,18 +192,107 @@ class TransactionCreateSerializer(serializers.ModelSerializer):
 
     def validate_account(self, value):
         """Validate that account belongs to the current user"""
-        if value.farmer != self.context['request'].user:
+        if value.farmer_id != self.context['request'].user.id:
             raise serializers.ValidationError("Invalid account")
         return value
 
     def validate_to_account(self, value):
         """Validate that to_account belongs to the current user"""
-        if value and value.farmer != self.context['request'].user:
+        if value and value.farmer_id != self.context['request'].user.id:
             raise serializers.ValidationError("Invalid destination account")
         return value
 
+    def validate_crop_finance(self, value):
+        """Validate that the crop season belongs to the current user"""
+        if value and value.farmer_id != self.context['request'].user.id:
+            raise serializers.ValidationError("Invalid crop season")
+        return value
 
-class BudgetSerializer(serializers.ModelSerializer):
+    def validate_tags(self, value):
+        """Validate that every tag belongs to the current user"""
+        if any(tag.farmer_id != self.context['request'].user.id for tag in value):
+            raise serializers.ValidationError("Invalid tag")
+        return value
+
+
+class RecurringTransactionSerializer(SparseFieldsetMixin, TransactionCreateSerializer):
+    """Serializer for recurring transaction rules"""
+    account_name = serializers.CharField(source='account.account_name', read_only=True)
+
+    class Meta:
+        model = RecurringTransaction
+        fields = [
+            'id', 'account', 'account_name', 'transaction_type', 'amount', 'description',
+            'expense_category', 'income_category', 'to_account', 'frequency', 'interval',
+            'start_date', 'end_date', 'next_run_date', 'last_run_date', 'is_active',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'next_run_date', 'last_run_date', 'created_at', 'updated_at']
+
+    def validate(self, data):
+        data = super().validate(data)
+
+        if data.get('interval') is not None and data['interval'] < 1:
+            raise serializers.ValidationError("Interval must be at least 1")
+
+        start_date = data.get('start_date', getattr(self.instance, 'start_date', None))
+        end_date = data.get('end_date', getattr(self.instance, 'end_date', None))
+        if start_date and end_date and end_date < start_date:
+            raise serializers.ValidationError("End date must be on or after start date")
+
+        return data
+
+
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Resolve primary keys against a dict of objects prefetched into the context"""
+
+    def __init__(self, lookup, **kwargs):
+        self.lookup = lookup
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+        try:
+            return self.context[self.lookup][pk]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+
+
+class TransactionBatchSerializer(TransactionCreateSerializer):
+    """Serializer for one row of a batch create.
+
+    Related objects are looked up in the ``accounts``, ``expense_categories``,
+    ``income_categories`` and ``crop_finances`` dicts passed in the context,
+    so validating a whole batch costs no per-row queries.
+    """
+    account = PrefetchedPrimaryKeyRelatedField('accounts', queryset=FinanceAccount.objects.none())
+    to_account = PrefetchedPrimaryKeyRelatedField(
+        'accounts', queryset=FinanceAccount.objects.none(), required=False, allow_null=True
+    )
+    expense_category = PrefetchedPrimaryKeyRelatedField(
+        'expense_categories', queryset=ExpenseCategory.objects.none(), required=False, allow_null=True
+    )
+    income_category = PrefetchedPrimaryKeyRelatedField(
+        'income_categories', queryset=IncomeCategory.objects.none(), required=False, allow_null=True
+    )
+    crop_finance = PrefetchedPrimaryKeyRelatedField(
+        'crop_finances', queryset=CropFinance.objects.none(), required=False, allow_null=True
+    )
+
+    class Meta(TransactionCreateSerializer.Meta):
+        fields = [
+            field for field in TransactionCreateSerializer.Meta.fields
+            if field not in ('receipt_image', 'tags')
+        ]
+
+
+class BudgetSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for Budget model (read operations)"""
     category_name = serializers.CharField(source='category.name', read_only=True)
     remaining_amount = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True)
@@ -151,7 +334,7 @@ class BudgetCreateSerializer(serializers.ModelSerializer):
         return data
 
 
-class CropFinanceSerializer(serializers.ModelSerializer):
+class CropFinanceSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for CropFinance model"""
     total_investment = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True)
     profit_loss = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True)
@@ -192,7 +375,7 @@ class CropFinanceSerializer(serializers.ModelSerializer):
         return data
 
 
-class FinancialGoalSerializer(serializers.ModelSerializer):
+class FinancialGoalSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for FinancialGoal model"""
     remaining_amount = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True)
     percentage_achieved = serializers.DecimalField(max_digits=5, decimal_places=2, read_only=True)
@@ -220,6 +403,18 @@ class FinancialGoalSerializer(serializers.ModelSerializer):
         return data
 
 
+class FinanceAlertSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Serializer for FinanceAlert model"""
+
+    class Meta:
+        model = FinanceAlert
+        fields = [
+            'id', 'alert_type', 'priority', 'title', 'message', 'amount',
+            'evaluated_on', 'is_dismissed', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
 # Additional serializers for dashboard and analytics
 
 class DashboardSummarySerializer(serializers.Serializer):
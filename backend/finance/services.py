@@ -0,0 +1,253 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .balances import apply_flow_deltas, transaction_flow_deltas
+from .cache import bump_data_version
+from .categories import ancestor_ids
+from .ledger import account_balances, record_postings, transaction_legs, transaction_postings
+from .models import (
+    FinanceAccount, Transaction, Budget, CropFinance, ExpenseCategory, local_day
+)
+
+
+def transaction_balance_deltas(transactions):
+    """Aggregate the balance impact of transactions per account id"""
+    deltas = defaultdict(Decimal)
+
+    for txn in transactions:
+        for account_id, amount in transaction_legs(txn):
+            deltas[account_id] += amount
+
+    return deltas
+
+
+def transaction_budget_deltas(transactions):
+    """Aggregate expense amounts per budget id.
+
+    A transaction counts towards every active budget of its farmer whose
+    category is its expense category or one of that category's parents,
+    and whose period contains the transaction's local date. Ancestors and
+    candidate budgets are fetched in one query each.
+    """
+    expenses = [
+        txn for txn in transactions
+        if txn.transaction_type == 'EXPENSE' and txn.expense_category_id
+    ]
+    if not expenses:
+        return {}
+
+    ancestors = ancestor_ids(ExpenseCategory, {txn.expense_category_id for txn in expenses})
+    keys = {
+        (txn.farmer_id, category_id)
+        for txn in expenses
+        for category_id in ancestors.get(txn.expense_category_id, [txn.expense_category_id])
+    }
+    lookup = Q()
+    for farmer_id, category_id in keys:
+        lookup |= Q(farmer_id=farmer_id, category_id=category_id)
+
+    budgets = defaultdict(list)
+    for budget in Budget.objects.filter(lookup, is_active=True).only(
+        'id', 'farmer_id', 'category_id', 'start_date', 'end_date'
+    ):
+        budgets[(budget.farmer_id, budget.category_id)].append(budget)
+
+    deltas = defaultdict(Decimal)
+    for txn in expenses:
+        for category_id in ancestors.get(txn.expense_category_id, [txn.expense_category_id]):
+            for budget in budgets[(txn.farmer_id, category_id)]:
+                if budget.start_date <= txn.transaction_day <= budget.end_date:
+                    deltas[budget.id] += txn.amount
+
+    return deltas
+
+
+def apply_budget_deltas(deltas):
+    """Apply per-budget spent deltas with one UPDATE per budget"""
+    now = timezone.now()
+
+    for budget_id in sorted(deltas):
+        delta = deltas[budget_id]
+        if delta:
+            Budget.objects.filter(pk=budget_id).update(
+                spent_amount=F('spent_amount') + delta,
+                updated_at=now
+            )
+
+
+# Expense category name -> CropFinance cost bucket; any other category lands in other_costs
+CROP_COST_FIELDS = {
+    'Seeds': 'seed_cost',
+    'Fertilizers': 'fertilizer_cost',
+    'Pesticides': 'pesticide_cost',
+    'Labor': 'labor_cost',
+    'Irrigation': 'irrigation_cost',
+    'Equipment': 'equipment_cost',
+}
+CROP_REVENUE_FIELD = 'total_revenue'
+CROP_OTHER_COSTS_FIELD = 'other_costs'
+
+
+def crop_finance_field(transaction_type, category_name):
+    """CropFinance column a transaction of this type and expense category rolls up into"""
+    if transaction_type == 'INCOME':
+        return CROP_REVENUE_FIELD
+    if transaction_type == 'EXPENSE':
+        return CROP_COST_FIELDS.get(category_name, CROP_OTHER_COSTS_FIELD)
+    return None
+
+
+def crop_bucket_names(category_ids):
+    """``{category id: name}`` naming each category by its nearest ancestor with a cost bucket.
+
+    A subcategory such as "Harvest labor" under "Labor" lands in the
+    labor bucket; categories outside every bucket keep their own name.
+    """
+    if not category_ids:
+        return {}
+
+    ancestors = ancestor_ids(ExpenseCategory, category_ids)
+    names = dict(ExpenseCategory.objects.filter(
+        pk__in={pk for chain in ancestors.values() for pk in chain} | set(category_ids)
+    ).values_list('id', 'name'))
+
+    buckets = {}
+    for category_id in category_ids:
+        chain = [names.get(pk) for pk in ancestors.get(category_id, [category_id])]
+        buckets[category_id] = next((name for name in chain if name in CROP_COST_FIELDS), names.get(category_id))
+    return buckets
+
+
+def transaction_crop_deltas(transactions, sign=1):
+    """Aggregate crop season rollup deltas as ``{crop_finance_id: {field: amount}}``.
+
+    Transfers are never attributed to a crop. Expense categories are
+    resolved to their cost bucket in two queries.
+    """
+    attributed = [
+        txn for txn in transactions
+        if txn.crop_finance_id and txn.transaction_type in ('INCOME', 'EXPENSE')
+    ]
+    if not attributed:
+        return {}
+
+    category_names = crop_bucket_names({txn.expense_category_id for txn in attributed if txn.expense_category_id})
+
+    deltas = defaultdict(lambda: defaultdict(Decimal))
+    for txn in attributed:
+        field = crop_finance_field(txn.transaction_type, category_names.get(txn.expense_category_id))
+        deltas[txn.crop_finance_id][field] += sign * txn.amount
+
+    return deltas
+
+
+def merge_crop_deltas(*deltas):
+    """Add several ``transaction_crop_deltas`` results together"""
+    merged = defaultdict(lambda: defaultdict(Decimal))
+    for delta in deltas:
+        for crop_finance_id, fields in delta.items():
+            for field, amount in fields.items():
+                merged[crop_finance_id][field] += amount
+    return merged
+
+
+def apply_crop_deltas(deltas):
+    """Apply crop season rollup deltas with one UPDATE per crop season"""
+    now = timezone.now()
+
+    for crop_finance_id in sorted(deltas):
+        changes = {
+            field: F(field) + amount
+            for field, amount in deltas[crop_finance_id].items() if amount
+        }
+        if changes:
+            CropFinance.objects.filter(pk=crop_finance_id).update(updated_at=now, **changes)
+
+
+def bulk_create_transactions(transactions, batch_size=500):
+    """Insert transactions in bulk and apply their side effects in aggregate.
+
+    ``bulk_create`` bypasses ``Transaction.save`` and the post_save signals,
+    so the stored ``transaction_day`` is filled in here, the ledger postings
+    are inserted and balance flows, budget spent amounts and crop season
+    rollups are updated once per affected row, inside the same database
+    transaction as the insert. Account rows are not touched; balances are
+    read from the journal.
+    """
+    if not transactions:
+        return []
+
+    for txn in transactions:
+        txn.transaction_day = local_day(txn.transaction_date)
+
+    with transaction.atomic():
+        created = Transaction.objects.bulk_create(transactions, batch_size=batch_size)
+        apply_budget_deltas(transaction_budget_deltas(created))
+        apply_crop_deltas(transaction_crop_deltas(created))
+        apply_flow_deltas(transaction_flow_deltas(created))
+        record_postings(transaction_postings(created))
+
+    bump_data_version(*(txn.farmer_id for txn in created))
+    return created
+
+
+class TransferError(ValueError):
+    pass
+
+
+def transfer_funds(farmer, transfers, when=None):
+    """Move money between a farmer's accounts in one database transaction.
+
+    ``transfers`` is a list of ``(from_account_id, to_account_id, amount,
+    description)``. Only the accounts the batch takes money from can be
+    overdrawn, so only those are locked with SELECT ... FOR UPDATE, in id
+    order, before their journal balance is read; concurrent transfers out
+    of the same account queue up instead of deadlocking or overdrawing, and
+    every other write stays insert-only. The batch is all or nothing: it is
+    refused if any account would end up below zero after its net movement.
+    Returns the created TRANSFER transactions and the new balances by
+    account id.
+    """
+    when = when or timezone.now()
+    account_ids = set()
+    for from_account_id, to_account_id, amount, _ in transfers:
+        if from_account_id == to_account_id:
+            raise TransferError('from_account and to_account must be different accounts')
+        if not amount.is_finite() or amount <= 0:
+            raise TransferError('Amount must be positive')
+        account_ids.update((from_account_id, to_account_id))
+
+    with transaction.atomic():
+        if FinanceAccount.objects.filter(pk__in=account_ids, farmer=farmer).count() != len(account_ids):
+            raise TransferError('Invalid account')
+
+        pending = [
+            Transaction(
+                farmer=farmer,
+                account_id=from_account_id,
+                to_account_id=to_account_id,
+                transaction_type='TRANSFER',
+                amount=amount,
+                description=description,
+                transaction_date=when
+            )
+            for from_account_id, to_account_id, amount, description in transfers
+        ]
+
+        deltas = transaction_balance_deltas(pending)
+        debited = sorted(account_id for account_id, delta in deltas.items() if delta < 0)
+        list(FinanceAccount.objects.select_for_update().filter(pk__in=debited).order_by('pk').values_list('pk'))
+
+        # Read after the locks are held, so the balances include every transfer committed before
+        balances = account_balances(debited)
+        if any(balances[account_id] + deltas[account_id] < 0 for account_id in debited):
+            raise TransferError('Insufficient balance')
+
+        created = bulk_create_transactions(pending)
+        balances = account_balances(account_ids)
+
+    return created, balances
@@ -1,6 +1,31 @@
-from django.db.models.signals import post_save, post_delete
+from decimal import Decimal
+
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
-from .models import Transaction, Budget, ExpenseCategory, IncomeCategory
+from .models import (
+    FinanceAccount, Transaction, Budget, ExpenseCategory, IncomeCategory, SyncTombstone
+)
+from .cache import bump_data_version
+from .categories import detach_category, place_category
+from .ledger import post_adjustment
+from .receipts import schedule_receipt_thumbnail, thumbnail_name_for
+from .sync import SYNC_COLLECTION_NAMES
+
+
+@receiver(post_save, sender=Transaction)
+def queue_receipt_thumbnail(sender, instance, **kwargs):
+    """Keep the list-view thumbnail in step with the attached receipt.
+
+    A new or replaced receipt gets its thumbnail generated; removing the
+    receipt clears the thumbnail with a queryset update, so no signal fires.
+    """
+    if instance.receipt_image:
+        if instance.receipt_thumbnail.name != thumbnail_name_for(instance.receipt_image.name):
+            schedule_receipt_thumbnail(instance.receipt_image.name)
+    elif instance.receipt_thumbnail:
+        from django.utils import timezone
+        Transaction.objects.filter(pk=instance.pk).update(receipt_thumbnail='', updated_at=timezone.now())
+        instance.receipt_thumbnail = ''
 
 
 @receiver(post_save, sender=Transaction)
@@ -13,7 +38,8 @@ def update_budget_spent_amount(sender, instance, **kwargs):
 
         budgets = Budget.objects.filter(
             farmer=instance.farmer,
-            category=instance.expense_category,
+            # The category's own budgets and those of every parent category
+            category__descendant_links__descendant=instance.expense_category,
             start_date__lte=current_date,
             end_date__gte=current_date,
             is_active=True
@@ -25,8 +51,8 @@ def update_budget_spent_amount(sender, instance, **kwargs):
             spent = Transaction.objects.filter(
                 farmer=budget.farmer,
                 transaction_type='EXPENSE',
-                expense_category=budget.category,
-                transaction_date__date__range=[budget.start_date, budget.end_date]
+                expense_category__ancestor_links__ancestor=budget.category,
+                transaction_day__range=[budget.start_date, budget.end_date]
             ).aggregate(total=Sum('amount'))['total'] or 0
 
             budget.spent_amount = spent
@@ -42,7 +68,8 @@ def update_budget_on_transaction_delete(sender, instance, **kwargs):
 
         budgets = Budget.objects.filter(
             farmer=instance.farmer,
-            category=instance.expense_category,
+            # The category's own budgets and those of every parent category
+            category__descendant_links__descendant=instance.expense_category,
             start_date__lte=current_date,
             end_date__gte=current_date,
             is_active=True
@@ -54,58 +81,62 @@ def update_budget_on_transaction_delete(sender, instance, **kwargs):
             spent = Transaction.objects.filter(
                 farmer=budget.farmer,
                 transaction_type='EXPENSE',
-                expense_category=budget.category,
-                transaction_date__date__range=[budget.start_date, budget.end_date]
+                expense_category__ancestor_links__ancestor=budget.category,
+                transaction_day__range=[budget.start_date, budget.end_date]
             ).aggregate(total=Sum('amount'))['total'] or 0
 
             budget.spent_amount = spent
             budget.save()
 
 
-def create_default_categories():
-    """Create default income and expense categories"""
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_save, sender=FinanceAccount)
+@receiver(post_delete, sender=FinanceAccount)
+def invalidate_derived_caches(sender, instance, **kwargs):
+    """Expire forecasts and other caches derived from the farmer's transactions"""
+    bump_data_version(instance.farmer_id)
 
-    # Default expense categories
-    expense_categories = [
-        ('Seeds', 'Cost of seeds and seedlings'),
-        ('Fertilizers', 'Fertilizer and soil amendments'),
-        ('Pesticides', 'Pesticides, herbicides, and fungicides'),
-        ('Labor', 'Farm labor costs'),
-        ('Equipment', 'Farm equipment and tools'),
-        ('Fuel', 'Fuel and energy costs'),
-        ('Irrigation', 'Water and irrigation costs'),
-        ('Transportation', 'Transportation and logistics'),
-        ('Storage', 'Storage and warehousing'),
-        ('Insurance', 'Crop and equipment insurance'),
-        ('Utilities', 'Electricity, phone, internet'),
-        ('Maintenance', 'Equipment and facility maintenance'),
-        ('Professional Services', 'Veterinary, consulting, legal services'),
-        ('Taxes', 'Property taxes and fees'),
-        ('Other', 'Miscellaneous expenses'),
-    ]
-
-    for name, description in expense_categories:
-        ExpenseCategory.objects.get_or_create(
-            name=name,
-            defaults={'description': description}
-        )
 
-    # Default income categories
-    income_categories = [
-        ('Crop Sales', 'Revenue from crop sales'),
-        ('Livestock Sales', 'Revenue from livestock sales'),
-        ('Dairy Products', 'Revenue from milk and dairy products'),
-        ('Government Subsidies', 'Government subsidies and support'),
-        ('Insurance Claims', 'Insurance claim payments'),
-        ('Equipment Rental', 'Income from renting out equipment'),
-        ('Consulting', 'Income from consulting services'),
-        ('Contract Farming', 'Income from contract farming'),
-        ('Other Farm Income', 'Other farm-related income'),
-        ('Off-Farm Income', 'Non-farm income sources'),
-    ]
-
-    for name, description in income_categories:
-        IncomeCategory.objects.get_or_create(
-            name=name,
-            defaults={'description': description}
-        )
+@receiver(post_save, sender=FinanceAccount)
+def journal_opening_balance(sender, instance, created, raw=False, **kwargs):
+    """Journal the balance a new account starts with"""
+    if created and not raw:
+        post_adjustment(instance.pk, Decimal(str(instance.current_balance)), kind='OPENING')
+
+
+@receiver(post_save, sender=ExpenseCategory)
+@receiver(post_save, sender=IncomeCategory)
+def update_category_closure(sender, instance, raw=False, **kwargs):
+    """Keep the closure table in step with the category's parent"""
+    if not raw:
+        place_category(instance)
+
+
+@receiver(pre_delete, sender=ExpenseCategory)
+@receiver(pre_delete, sender=IncomeCategory)
+def detach_deleted_category(sender, instance, **kwargs):
+    """Turn the subcategories of a deleted category into top-level ones"""
+    detach_category(instance)
+
+
+def record_sync_tombstone(sender, instance, **kwargs):
+    """Remember deleted rows so offline clients can drop them on their next sync"""
+    SyncTombstone.objects.create(
+        farmer_id=instance.farmer_id,
+        collection=SYNC_COLLECTION_NAMES[sender],
+        object_id=instance.pk
+    )
+
+
+for synced_model in SYNC_COLLECTION_NAMES:
+    post_delete.connect(
+        record_sync_tombstone, sender=synced_model,
+        dispatch_uid=f'sync_tombstone_{synced_model._meta.model_name}'
+    )
+
+
+def create_default_categories():
+    """Create default income and expense categories"""
+    from .bootstrap import ensure_default_categories
+    ensure_default_categories()
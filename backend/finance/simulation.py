@@ -0,0 +1,157 @@
+import hashlib
+import json
+import math
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import CropFinance
+
+SIMULATION_TRIALS = getattr(settings, 'FINANCE_SIMULATION_TRIALS', 100000)
+SIMULATION_CACHE_TIMEOUT = 60 * 60 * 24
+SIMULATION_CACHE_KEY = 'finance:crop-simulation:{digest}'
+PROFIT_PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+
+# Spread used when the farmer has too little history for a crop (log scale)
+DEFAULT_YIELD_SIGMA = 0.20
+DEFAULT_PRICE_SIGMA = 0.15
+DEFAULT_COST_SIGMA = 0.10
+MIN_SIGMA = 0.02
+MIN_HISTORY = 3
+
+
+class SimulationError(ValueError):
+    pass
+
+
+def _digest(inputs):
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _log_spread(values, default_sigma):
+    """Mean and standard deviation of log values, falling back to a neutral prior"""
+    values = np.asarray([v for v in values if v > 0], dtype=float)
+    if len(values) < MIN_HISTORY:
+        return None, default_sigma
+    logs = np.log(values)
+    return float(logs.mean()), max(float(logs.std(ddof=1)), MIN_SIGMA)
+
+
+def crop_priors(crop_finance):
+    """Yield, price and cost priors from the farmer's other seasons of the same crop"""
+    history = list(CropFinance.objects.filter(
+        farmer_id=crop_finance.farmer_id,
+        crop_name__iexact=crop_finance.crop_name
+    ).exclude(pk=crop_finance.pk).values_list(
+        'expected_yield', 'actual_yield', 'total_revenue', 'area_acres',
+        'seed_cost', 'fertilizer_cost', 'pesticide_cost', 'labor_cost',
+        'irrigation_cost', 'equipment_cost', 'other_costs'
+    ))
+
+    yield_ratios, prices, costs_per_acre = [], [], []
+    for expected, actual, revenue, area, *costs in history:
+        if expected and actual:
+            yield_ratios.append(float(actual / expected))
+        if actual and revenue:
+            prices.append(float(revenue / actual))
+        if area:
+            costs_per_acre.append(float(sum(costs) / area))
+
+    yield_bias, yield_sigma = _log_spread(yield_ratios, DEFAULT_YIELD_SIGMA)
+    log_price, price_sigma = _log_spread(prices, DEFAULT_PRICE_SIGMA)
+    _, cost_sigma = _log_spread(costs_per_acre, DEFAULT_COST_SIGMA)
+
+    return {
+        'seasons': len(history),
+        'yield_bias': yield_bias or 0.0,
+        'yield_sigma': yield_sigma,
+        'price': float(np.exp(log_price)) if log_price is not None else None,
+        'price_sigma': price_sigma,
+        'cost_sigma': cost_sigma,
+    }
+
+
+def simulation_inputs(crop_finance, price=None, cost=None, trials=None):
+    """Resolve the numbers a simulation depends on; they also form its cache key"""
+    expected_yield = crop_finance.expected_yield or crop_finance.actual_yield
+    if not expected_yield or expected_yield <= 0:
+        raise SimulationError('expected_yield is required to simulate a season')
+
+    for name, value in (('price', price), ('cost', cost)):
+        if value is not None and not math.isfinite(value):
+            raise SimulationError(f'{name} must be a finite number')
+    if price is not None and price <= 0:
+        raise SimulationError('price must be positive')
+
+    priors = crop_priors(crop_finance)
+    price = float(price) if price is not None else priors['price']
+    if not price or price <= 0:
+        raise SimulationError(
+            'No sale history for this crop; pass the expected price per unit as price'
+        )
+
+    cost = float(cost) if cost is not None else float(crop_finance.total_investment)
+    if cost < 0:
+        raise SimulationError('cost must not be negative')
+
+    return {
+        **priors,
+        'expected_yield': float(expected_yield),
+        'price': price,
+        'cost': cost,
+        'trials': int(trials or SIMULATION_TRIALS),
+    }
+
+
+def run_simulation(inputs):
+    """Sample yield, price and cost overrun for every trial at once.
+
+    Yield and price are log-normal around the expected yield and price,
+    with the farmer's historical yield bias and spreads. Costs can only
+    overrun the plan, so their multiplier is half-normal on the log scale.
+    The generator is seeded from the inputs, so a repeat call is exact.
+    """
+    rng = np.random.default_rng(int(_digest(inputs)[:16], 16))
+    trials = inputs['trials']
+
+    yields = inputs['expected_yield'] * np.exp(
+        rng.normal(inputs['yield_bias'], inputs['yield_sigma'], trials)
+    )
+    prices = inputs['price'] * np.exp(
+        rng.normal(-inputs['price_sigma'] ** 2 / 2, inputs['price_sigma'], trials)
+    )
+    costs = inputs['cost'] * np.exp(np.abs(rng.normal(0.0, inputs['cost_sigma'], trials)))
+
+    profit = yields * prices - costs
+    break_even = costs / yields
+
+    profit_percentiles = np.percentile(profit, PROFIT_PERCENTILES)
+    break_even_percentiles = np.percentile(break_even, (50, 90))
+
+    return {
+        'trials': trials,
+        'inputs': inputs,
+        'expected_profit': round(float(profit.mean()), 2),
+        'profit_percentiles': {
+            f'p{p}': round(float(value), 2) for p, value in zip(PROFIT_PERCENTILES, profit_percentiles)
+        },
+        'probability_of_loss': round(float((profit < 0).mean()), 4),
+        'break_even_price': {
+            'planned': round(inputs['cost'] / inputs['expected_yield'], 2),
+            'p50': round(float(break_even_percentiles[0]), 2),
+            'p90': round(float(break_even_percentiles[1]), 2),
+        },
+    }
+
+
+def simulate_crop_finance(crop_finance, price=None, cost=None, trials=None):
+    """Monte Carlo profit distribution for a crop season, cached on its inputs"""
+    inputs = simulation_inputs(crop_finance, price=price, cost=cost, trials=trials)
+    key = SIMULATION_CACHE_KEY.format(digest=_digest(inputs))
+
+    result = cache.get(key)
+    if result is None:
+        result = run_simulation(inputs)
+        cache.set(key, result, SIMULATION_CACHE_TIMEOUT)
+    return result
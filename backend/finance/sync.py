@@ -0,0 +1,142 @@
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import (
+    FinanceAccount, Transaction, Budget, CropFinance, FinancialGoal, LedgerPosting, SyncTombstone
+)
+from .ledger import ledger_balances
+from .serializers import (
+    FinanceAccountSerializer, TransactionSerializer, BudgetSerializer,
+    CropFinanceSerializer, FinancialGoalSerializer
+)
+
+# Collection name -> (model, read serializer, related objects the serializer touches)
+SYNC_COLLECTIONS = {
+    'accounts': (FinanceAccount, FinanceAccountSerializer, []),
+    'transactions': (
+        Transaction, TransactionSerializer,
+        ['account', 'to_account', 'expense_category', 'income_category']
+    ),
+    'budgets': (Budget, BudgetSerializer, ['category']),
+    'crop_finances': (CropFinance, CropFinanceSerializer, []),
+    'financial_goals': (FinancialGoal, FinancialGoalSerializer, []),
+}
+SYNC_COLLECTION_NAMES = {model: name for name, (model, _, _) in SYNC_COLLECTIONS.items()}
+
+DELETED_POSITION = 'deleted'
+
+# Rows younger than this are left for the next sync, so a write that commits
+# late with an older updated_at cannot slip behind the returned cursor
+SYNC_SETTLE_TIME = timedelta(seconds=getattr(settings, 'FINANCE_SYNC_SETTLE_SECONDS', 5))
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(positions):
+    payload = json.dumps(positions, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor into ``{position: (updated_at, id)}``"""
+    if not cursor:
+        return {}
+
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return {
+            name: (datetime.fromisoformat(stamp), int(pk))
+            for name, (stamp, pk) in raw.items()
+            if name in SYNC_COLLECTIONS or name == DELETED_POSITION
+        }
+    except (binascii.Error, UnicodeError, ValueError, TypeError, AttributeError):
+        raise InvalidCursor('Invalid sync cursor')
+
+
+def _after(queryset, time_field, position):
+    """Keyset filter for rows strictly after ``(time, id)``"""
+    if position is None:
+        return queryset
+    stamp, pk = position
+    return queryset.filter(
+        Q(**{f'{time_field}__gt': stamp}) | Q(**{time_field: stamp, 'id__gt': pk})
+    )
+
+
+def _changed_rows(model, farmer):
+    """Rows of one collection annotated with ``changed_at``, when a client last saw them change.
+
+    Transaction writes only journal postings, so an account has changed when
+    either the row itself or its latest posting is newer than the cursor.
+    """
+    queryset = model.objects.filter(farmer=farmer)
+    if model is not FinanceAccount:
+        return queryset.annotate(changed_at=F('updated_at'))
+
+    latest_posting = LedgerPosting.objects.filter(account=OuterRef('pk')).order_by('-id').values('created_at')[:1]
+    return ledger_balances(queryset).annotate(
+        changed_at=Greatest('updated_at', Coalesce(Subquery(latest_posting), 'updated_at'))
+    )
+
+
+def collect_changes(farmer, cursor, page_size, context=None):
+    """Return rows changed or deleted after ``cursor`` for one farmer.
+
+    Every collection is read with a ``(changed_at, id)`` keyset and at most
+    ``page_size`` rows each; ``changed_at`` is ``updated_at`` except for
+    accounts, whose balance changes arrive as journal postings.
+    The returned cursor only ever moves forward.
+    """
+    positions = decode_cursor(cursor)
+    until = timezone.now() - SYNC_SETTLE_TIME
+    has_more = False
+    changes = {}
+
+    for name, (model, serializer_class, related) in SYNC_COLLECTIONS.items():
+        queryset = _after(
+            _changed_rows(model, farmer).filter(changed_at__lte=until),
+            'changed_at', positions.get(name)
+        ).select_related(*related).order_by('changed_at', 'id')
+
+        rows = list(queryset[:page_size + 1])
+        if len(rows) > page_size:
+            has_more = True
+            rows = rows[:page_size]
+
+        if rows:
+            positions[name] = (rows[-1].changed_at, rows[-1].id)
+        changes[name] = serializer_class(rows, many=True, context=context or {}).data
+
+    tombstones = list(_after(
+        SyncTombstone.objects.filter(farmer=farmer, deleted_at__lte=until),
+        'deleted_at', positions.get(DELETED_POSITION)
+    ).order_by('deleted_at', 'id').values('id', 'collection', 'object_id', 'deleted_at')[:page_size + 1])
+
+    if len(tombstones) > page_size:
+        has_more = True
+        tombstones = tombstones[:page_size]
+
+    deleted = {name: [] for name in SYNC_COLLECTIONS}
+    for tombstone in tombstones:
+        deleted.setdefault(tombstone['collection'], []).append(tombstone['object_id'])
+    if tombstones:
+        positions[DELETED_POSITION] = (tombstones[-1]['deleted_at'], tombstones[-1]['id'])
+
+    return {
+        'cursor': encode_cursor({
+            name: [stamp.isoformat(), pk] for name, (stamp, pk) in positions.items()
+        }),
+        'has_more': has_more,
+        'changes': changes,
+        'deleted': deleted,
+    }
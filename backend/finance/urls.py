@@ -5,11 +5,14 @@ from . import views
 router = DefaultRouter()
 router.register(r'accounts', views.FinanceAccountViewSet, basename='finance-accounts')
 router.register(r'transactions', views.TransactionViewSet, basename='transactions')
+router.register(r'transaction-tags', views.TransactionTagViewSet, basename='transaction-tags')
+router.register(r'recurring-transactions', views.RecurringTransactionViewSet, basename='recurring-transactions')
 router.register(r'expense-categories', views.ExpenseCategoryViewSet, basename='expense-categories')
 router.register(r'income-categories', views.IncomeCategoryViewSet, basename='income-categories')
 router.register(r'budgets', views.BudgetViewSet, basename='budgets')
 router.register(r'crop-finances', views.CropFinanceViewSet, basename='crop-finances')
 router.register(r'financial-goals', views.FinancialGoalViewSet, basename='financial-goals')
+router.register(r'alerts', views.FinanceAlertViewSet, basename='alerts')
 
 app_name = 'finance'
 
@@ -21,4 +24,15 @@ urlpatterns = [
     path('api/finance/dashboard/summary/', views.dashboard_summary, name='dashboard-summary'),
     path('api/finance/dashboard/trends/', views.monthly_trends, name='monthly-trends'),
     path('api/finance/dashboard/expense-breakdown/', views.expense_categories_breakdown, name='expense-breakdown'),
+    path('api/finance/dashboard/bundle/', views.dashboard_bundle, name='dashboard-bundle'),
+
+    # Grouped analytics for charts
+    path('api/finance/analytics/', views.finance_analytics, name='analytics'),
+
+    # Cohort analytics (staff only)
+    path('api/finance/cohorts/crops/', views.cohort_crop_stats, name='cohort-crops'),
+    path('api/finance/cohorts/expense-mix/', views.cohort_expense_mix, name='cohort-expense-mix'),
+
+    # Offline sync
+    path('api/finance/sync/', views.sync_changes, name='sync'),
 ]
@@ -2,34 +2,116 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum, Q
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Case, F, Q, Sum, Value, When
+from django.db.models.lookups import GreaterThanOrEqual
 from django.utils import timezone
 from datetime import datetime, timedelta
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 from django.db import transaction
 
 from .models import (
     FinanceAccount, Transaction, ExpenseCategory, IncomeCategory,
-    Budget, CropFinance, FinancialGoal
+    Budget, CropFinance, FinancialGoal, FinanceAlert, RecurringTransaction, TransactionTag
 )
 from .serializers import (
     FinanceAccountSerializer, TransactionSerializer, ExpenseCategorySerializer,
     IncomeCategorySerializer, BudgetSerializer, CropFinanceSerializer,
-    FinancialGoalSerializer, TransactionCreateSerializer, BudgetCreateSerializer
+    FinancialGoalSerializer, TransactionCreateSerializer, BudgetCreateSerializer,
+    TransactionDetailSerializer, TransactionBatchSerializer, parse_fieldset,
+    FinanceAlertSerializer, RecurringTransactionSerializer, TransactionTagSerializer
+)
+from .services import bulk_create_transactions, transfer_funds, TransferError
+from .idempotency import idempotent
+from .sync import collect_changes, InvalidCursor
+from .search import search_transactions
+from .alerts import refresh_budget_spent_amounts
+from .archive import ArchivedTransactionList, LiveThenArchived
+from .balances import (
+    HISTORY_MAX_DAYS, BalanceHistoryUnavailable, InvalidStatementCursor, account_statement, balance_as_of,
+    balance_history, record_balance_adjustment
+)
+from .fast_serializers import ValuesSerializer, NotCompilable, serialize_queryset
+from .ledger import ledger_balances
+from .dashboard import (
+    DASHBOARD_SECTIONS, DashboardContext, current_budgets_section, expense_breakdown_section,
+    goal_progress_section, summary_section, total_balance_section, trends_section
 )
 
 
-class FinanceAccountViewSet(viewsets.ModelViewSet):
+def sparse_queryset(queryset, serializer):
+    """Restrict the columns loaded by ``queryset`` to what ``serializer`` emits.
+
+    Sources that are not plain model fields (properties, methods, reverse or
+    many-to-many relations) leave the queryset untouched.
+    """
+    model = queryset.model
+    columns = {model._meta.pk.name}
+    related = set()
+
+    for field in serializer.fields.values():
+        if field.source == '*':
+            return queryset
+
+        parts = field.source.split('.')
+        current = model
+        for position, part in enumerate(parts):
+            try:
+                model_field = current._meta.get_field(part)
+            except FieldDoesNotExist:
+                return queryset
+            if model_field.many_to_many or model_field.one_to_many:
+                return queryset
+            if position < len(parts) - 1:
+                if not model_field.is_relation:
+                    return queryset
+                current = model_field.related_model
+
+        if len(parts) > 1:
+            related.add('__'.join(parts[:-1]))
+        columns.add('__'.join(parts))
+
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset.only(*columns)
+
+
+class SparseFieldsetViewSetMixin:
+    """Load only the columns needed for ``?fields=``/``?omit=`` on list and retrieve"""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+
+        only, omit = parse_fieldset(self.request.query_params)
+        if not only and not omit:
+            return queryset
+
+        return sparse_queryset(queryset, self.get_serializer())
+
+
+class FinanceAccountViewSet(SparseFieldsetViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for managing finance accounts"""
     serializer_class = FinanceAccountSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return FinanceAccount.objects.filter(farmer=self.request.user, is_active=True)
+        return ledger_balances(FinanceAccount.objects.filter(farmer=self.request.user, is_active=True))
 
     def perform_create(self, serializer):
         serializer.save(farmer=self.request.user)
 
+    def perform_update(self, serializer):
+        # Only a balance sent by the client is a correction; the stored column may be stale
+        new_balance = serializer.validated_data.get('current_balance')
+        previous_balance = serializer.instance.ledger_balance
+        account = serializer.save()
+        if new_balance is not None:
+            record_balance_adjustment(account.pk, new_balance - previous_balance)
+            account.ledger_balance = new_balance
+
     @action(detail=True, methods=['post'])
     def update_balance(self, request, pk=None):
         """Manually update account balance"""
@@ -39,7 +121,8 @@ class FinanceAccountViewSet(viewsets.ModelViewSet):
         if new_balance is not None:
             try:
                 account.current_balance = Decimal(str(new_balance))
-                account.save()
+                account.save(update_fields=['current_balance', 'updated_at'])
+                record_balance_adjustment(account.pk, account.current_balance - account.ledger_balance)
                 return Response({
                     'message': 'Balance updated successfully',
                     'new_balance': account.current_balance
@@ -55,23 +138,161 @@ class FinanceAccountViewSet(viewsets.ModelViewSet):
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    @action(detail=True, methods=['get'])
+    def balance(self, request, pk=None):
+        """Closing balance of the account on a given day"""
+        account = self.get_object()
+        try:
+            day = datetime.strptime(request.query_params['date'], '%Y-%m-%d').date()
+        except (KeyError, ValueError):
+            return Response(
+                {'error': 'date is required as YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            balance = balance_as_of(account.id, day)
+        except BalanceHistoryUnavailable as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_409_CONFLICT)
+
+        return Response({
+            'account': account.id,
+            'date': day,
+            'balance': balance
+        })
+
+    @action(detail=True, methods=['get'], url_path='balance-history')
+    def balance_history(self, request, pk=None):
+        """Daily closing balances of the account over a date range"""
+        account = self.get_object()
+        end_date = timezone.localdate()
+        start_date = end_date - timedelta(days=29)
+        try:
+            if request.query_params.get('start_date'):
+                start_date = datetime.strptime(request.query_params['start_date'], '%Y-%m-%d').date()
+            if request.query_params.get('end_date'):
+                end_date = datetime.strptime(request.query_params['end_date'], '%Y-%m-%d').date()
+        except ValueError:
+            return Response(
+                {'error': 'Dates must be YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not 0 <= (end_date - start_date).days < HISTORY_MAX_DAYS:
+            return Response(
+                {'error': f'end_date must be on or after start_date and at most {HISTORY_MAX_DAYS} days later'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            opening_balance, points = balance_history(account.id, start_date, end_date)
+        except BalanceHistoryUnavailable as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_409_CONFLICT)
+
+        return Response({
+            'account': account.id,
+            'start_date': start_date,
+            'end_date': end_date,
+            'opening_balance': opening_balance,
+            'balances': points
+        })
+
+    @action(detail=True, methods=['get'])
+    def statement(self, request, pk=None):
+        """Passbook-style statement: transactions with their running balance"""
+        account = self.get_object()
+        params = request.query_params
+        end_date = timezone.localdate()
+        start_date = end_date.replace(day=1)
+        try:
+            if params.get('start_date'):
+                start_date = datetime.strptime(params['start_date'], '%Y-%m-%d').date()
+            if params.get('end_date'):
+                end_date = datetime.strptime(params['end_date'], '%Y-%m-%d').date()
+            page_size = min(max(int(params.get('page_size', 50)), 1), 500)
+        except ValueError:
+            return Response(
+                {'error': 'Dates must be YYYY-MM-DD and page_size an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if end_date < start_date:
+            return Response(
+                {'error': 'end_date must be on or after start_date'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            opening_balance, entries, cursor = account_statement(
+                account.id, start_date, end_date, params.get('cursor'), page_size
+            )
+        except InvalidStatementCursor as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except BalanceHistoryUnavailable as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_409_CONFLICT)
+
+        return Response({
+            'account': account.id,
+            'account_name': account.account_name,
+            'start_date': start_date,
+            'end_date': end_date,
+            'opening_balance': opening_balance,
+            'results': entries,
+            'cursor': cursor,
+            'has_more': cursor is not None
+        })
+
     @action(detail=False, methods=['get'])
     def total_balance(self, request):
         """Get total balance across all accounts"""
-        total = self.get_queryset().aggregate(
-            total=Sum('current_balance')
-        )['total'] or Decimal('0.00')
+        return Response(total_balance_section(DashboardContext(request.user)))
+
+    @action(detail=False, methods=['get'])
+    def forecast(self, request):
+        """Project monthly cash flow and balances of all accounts"""
+        from .forecasting import farmer_forecast
 
-        return Response({'total_balance': total})
+        try:
+            months = int(request.query_params.get('months', 6))
+        except (TypeError, ValueError):
+            months = 0
+        if not 3 <= months <= 12:
+            return Response(
+                {'error': 'months must be an integer between 3 and 12'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
+        return Response(farmer_forecast(request.user, months))
 
-class TransactionViewSet(viewsets.ModelViewSet):
+
+def top_level_totals(transactions, category_field):
+    """Totals per top-level category, each including its subcategories.
+
+    One join through the closure table picks each transaction's top-level
+    ancestor; the join is an outer one, so transactions without a category
+    are reported under ``None``.
+    """
+    link = f'{category_field}__ancestor_links__ancestor'
+    return [
+        {category_field: row['category_id'], f'{category_field}__name': row['category_name'], 'total': row['total']}
+        for row in transactions.filter(**{f'{link}__parent__isnull': True}).values(
+            category_id=F(f'{link}_id'), category_name=F(f'{link}__name')
+        ).annotate(total=Sum('amount')).order_by('-total')
+    ]
+
+
+class TransactionViewSet(SparseFieldsetViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for managing transactions"""
     permission_classes = [IsAuthenticated]
 
+    # Upper bound on rows accepted by the batch endpoint
+    BATCH_SIZE_LIMIT = 500
+
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return TransactionCreateSerializer
+        if self.action == 'retrieve':
+            return TransactionDetailSerializer
         return TransactionSerializer
 
     def get_queryset(self):
@@ -87,6 +308,22 @@ class TransactionViewSet(viewsets.ModelViewSet):
         if account_id:
             queryset = queryset.filter(account_id=account_id)
 
+        # Filter by expense category, including its subcategories
+        category_id = self.request.query_params.get('category')
+        if category_id:
+            try:
+                queryset = queryset.filter(expense_category__ancestor_links__ancestor_id=int(category_id))
+            except ValueError:
+                pass
+
+        # Filter by tag
+        tag_id = self.request.query_params.get('tag')
+        if tag_id:
+            try:
+                queryset = queryset.filter(taggings__tag_id=int(tag_id))
+            except ValueError:
+                pass
+
         # Filter by date range
         start_date = self.request.query_params.get('start_date')
         end_date = self.request.query_params.get('end_date')
@@ -94,19 +331,88 @@ class TransactionViewSet(viewsets.ModelViewSet):
         if start_date:
             try:
                 start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(transaction_date__gte=start_date)
+                queryset = queryset.filter(transaction_day__gte=start_date)
             except ValueError:
                 pass
 
         if end_date:
             try:
                 end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(transaction_date__lte=end_date)
+                queryset = queryset.filter(transaction_day__lte=end_date)
             except ValueError:
                 pass
 
+        # Free-text search over description, notes and reference number
+        search = self.request.query_params.get('q')
+        if search:
+            queryset = search_transactions(queryset, search)
+
         return queryset
 
+    def archived_rows(self, params):
+        """Archived transactions matching the request's filters.
+
+        Raises ValueError for malformed filters and for filters the archive
+        cannot apply.
+        """
+        if params.get('category') or params.get('q'):
+            raise ValueError('Archived transactions cannot be filtered by category or q')
+        try:
+            return ArchivedTransactionList(
+                self.request.user,
+                years=[int(params['year'])] if params.get('year') else None,
+                transaction_type=params.get('type', '').upper() or None,
+                account_id=int(params['account']) if params.get('account') else None,
+                tag_id=int(params['tag']) if params.get('tag') else None,
+                start_date=datetime.strptime(params['start_date'], '%Y-%m-%d').date() if params.get('start_date') else None,
+                end_date=datetime.strptime(params['end_date'], '%Y-%m-%d').date() if params.get('end_date') else None
+            )
+        except ValueError:
+            raise ValueError('year, account and tag must be integers and dates YYYY-MM-DD')
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('include_archived', '').lower() in ('1', 'true'):
+            return self.list_with_archived(request)
+
+        # Build rows straight from values(); falls back to the serializer if it cannot be compiled
+        try:
+            values_serializer = ValuesSerializer(self.get_serializer())
+        except NotCompilable:
+            return super().list(request, *args, **kwargs)
+
+        queryset = values_serializer.queryset(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(values_serializer.to_representation(page))
+
+        return Response(values_serializer.to_representation(queryset))
+
+    def list_with_archived(self, request):
+        """The live transactions, newest first, followed by the archived ones"""
+        try:
+            archived = self.archived_rows(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = self.get_serializer()
+        queryset = self.filter_queryset(self.get_queryset()).order_by('-transaction_date', '-id')
+        try:
+            values_serializer = ValuesSerializer(serializer)
+            live, represent = values_serializer.queryset(queryset), values_serializer.to_representation
+        except NotCompilable:
+            live, represent = queryset, lambda rows: self.get_serializer(rows, many=True).data
+
+        rows = LiveThenArchived(live, represent, archived, serializer.fields)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(rows[0:len(rows)])
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(farmer=self.request.user)
 
@@ -136,7 +442,7 @@ class TransactionViewSet(viewsets.ModelViewSet):
 
         # Filter by date range
         period_transactions = queryset.filter(
-            transaction_date__date__range=[start_date, end_date]
+            transaction_day__range=[start_date, end_date]
         )
 
         # Calculate totals
@@ -150,18 +456,13 @@ class TransactionViewSet(viewsets.ModelViewSet):
 
         net_flow = income - expense
 
-        # Category-wise breakdown
-        expense_by_category = period_transactions.filter(
-            transaction_type='EXPENSE'
-        ).values('expense_category__name').annotate(
-            total=Sum('amount')
-        ).order_by('-total')
-
-        income_by_category = period_transactions.filter(
-            transaction_type='INCOME'
-        ).values('income_category__name').annotate(
-            total=Sum('amount')
-        ).order_by('-total')
+        # Category-wise breakdown, each top-level category with its whole subtree
+        expense_by_category = top_level_totals(
+            period_transactions.filter(transaction_type='EXPENSE'), 'expense_category'
+        )
+        income_by_category = top_level_totals(
+            period_transactions.filter(transaction_type='INCOME'), 'income_category'
+        )
 
         return Response({
             'period': {
@@ -179,6 +480,74 @@ class TransactionViewSet(viewsets.ModelViewSet):
         })
 
     @action(detail=False, methods=['post'])
+    @idempotent
+    def batch(self, request):
+        """Create a list of transactions in one request, e.g. when replaying an offline queue"""
+        rows = request.data
+
+        if not isinstance(rows, list) or not rows:
+            return Response(
+                {'error': 'A non-empty list of transactions is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if len(rows) > self.BATCH_SIZE_LIMIT:
+            return Response(
+                {'error': f'At most {self.BATCH_SIZE_LIMIT} transactions can be created per batch'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Prefetch everything a row can reference, once for the whole batch
+        context = {
+            'request': request,
+            'accounts': {
+                account.pk: account
+                for account in FinanceAccount.objects.filter(farmer=request.user)
+            },
+            'expense_categories': {
+                category.pk: category for category in ExpenseCategory.objects.all()
+            },
+            'income_categories': {
+                category.pk: category for category in IncomeCategory.objects.all()
+            },
+            'crop_finances': {
+                crop_finance.pk: crop_finance
+                for crop_finance in CropFinance.objects.filter(farmer=request.user)
+            },
+        }
+
+        results = [None] * len(rows)
+        pending = []
+        pending_indexes = []
+
+        for index, row in enumerate(rows):
+            serializer = TransactionBatchSerializer(data=row, context=context)
+            if serializer.is_valid():
+                pending.append(Transaction(farmer=request.user, **serializer.validated_data))
+                pending_indexes.append(index)
+            else:
+                results[index] = {'index': index, 'status': 'error', 'errors': serializer.errors}
+
+        created = bulk_create_transactions(pending)
+
+        for index, created_transaction in zip(pending_indexes, created):
+            results[index] = {'index': index, 'status': 'created', 'id': created_transaction.id}
+
+        if not created:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif len(created) < len(rows):
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+
+        return Response({
+            'created_count': len(created),
+            'error_count': len(rows) - len(created),
+            'results': results
+        }, status=response_status)
+
+    @action(detail=False, methods=['post'])
+    @idempotent
     def transfer(self, request):
         """Transfer money between accounts"""
         from_account_id = request.data.get('from_account')
@@ -193,58 +562,115 @@ class TransactionViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            from_account = FinanceAccount.objects.get(
-                id=from_account_id, farmer=request.user
-            )
-            to_account = FinanceAccount.objects.get(
-                id=to_account_id, farmer=request.user
+            transfer = (int(from_account_id), int(to_account_id), Decimal(str(amount)), description)
+        except (InvalidOperation, ValueError, TypeError):
+            return Response(
+                {'error': 'Invalid amount'}, 
+                status=status.HTTP_400_BAD_REQUEST
             )
-            amount = Decimal(str(amount))
 
-            if amount <= 0:
-                return Response(
-                    {'error': 'Amount must be positive'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            if from_account.current_balance < amount:
-                return Response(
-                    {'error': 'Insufficient balance'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        try:
+            created, balances = transfer_funds(request.user, [transfer])
+        except TransferError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Create transfer transaction
-            with transaction.atomic():
-                transfer_transaction = Transaction.objects.create(
-                    farmer=request.user,
-                    account=from_account,
-                    to_account=to_account,
-                    transaction_type='TRANSFER',
-                    amount=amount,
-                    description=description,
-                    transaction_date=timezone.now()
-                )
+        return Response({
+            'message': 'Transfer completed successfully',
+            'transaction_id': created[0].id,
+            'from_account_balance': balances[transfer[0]],
+            'to_account_balance': balances[transfer[1]]
+        })
 
-            return Response({
-                'message': 'Transfer completed successfully',
-                'transaction_id': transfer_transaction.id,
-                'from_account_balance': from_account.current_balance,
-                'to_account_balance': to_account.current_balance
-            })
+    @action(detail=False, methods=['post'], url_path='transfer-batch')
+    @idempotent
+    def transfer_batch(self, request):
+        """Apply several transfers across accounts as one all-or-nothing operation"""
+        rows = request.data
 
-        except FinanceAccount.DoesNotExist:
+        if not isinstance(rows, list) or not rows:
             return Response(
-                {'error': 'Invalid account'}, 
+                {'error': 'A non-empty list of transfers is required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        except (ValueError, TypeError):
+
+        if len(rows) > self.BATCH_SIZE_LIMIT:
             return Response(
-                {'error': 'Invalid amount'}, 
+                {'error': f'At most {self.BATCH_SIZE_LIMIT} transfers can be made per batch'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        transfers = []
+        for index, row in enumerate(rows):
+            try:
+                transfers.append((
+                    int(row['from_account']),
+                    int(row['to_account']),
+                    Decimal(str(row['amount'])),
+                    row.get('description') or 'Account transfer'
+                ))
+            except (KeyError, InvalidOperation, ValueError, TypeError, AttributeError):
+                return Response(
+                    {'error': f'Transfer {index} needs from_account, to_account and a numeric amount'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        try:
+            created, balances = transfer_funds(request.user, transfers)
+        except TransferError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
-class ExpenseCategoryViewSet(viewsets.ModelViewSet):
+        return Response({
+            'message': 'Transfers completed successfully',
+            'transaction_ids': [created_transaction.id for created_transaction in created],
+            'balances': balances
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'])
+    def archived(self, request):
+        """Transactions of past years that were moved to the archive, newest first"""
+        try:
+            rows = self.archived_rows(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(rows[0:len(rows)])
+
+
+class RecurringTransactionViewSet(SparseFieldsetViewSetMixin, viewsets.ModelViewSet):
+    """ViewSet for recurring transaction rules"""
+    serializer_class = RecurringTransactionSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return RecurringTransaction.objects.filter(farmer=self.request.user).select_related('account')
+
+    def perform_create(self, serializer):
+        serializer.save(farmer=self.request.user, next_run_date=serializer.validated_data['start_date'])
+
+    def perform_update(self, serializer):
+        # A rule that has not run yet starts over from its (new) start date
+        if serializer.instance.last_run_date is None and 'start_date' in serializer.validated_data:
+            serializer.save(next_run_date=serializer.validated_data['start_date'])
+        else:
+            serializer.save()
+
+
+class TransactionTagViewSet(SparseFieldsetViewSetMixin, viewsets.ModelViewSet):
+    """ViewSet for managing transaction tags"""
+    serializer_class = TransactionTagSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return TransactionTag.objects.filter(farmer=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(farmer=self.request.user)
+
+
+class ExpenseCategoryViewSet(SparseFieldsetViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for expense categories"""
     serializer_class = ExpenseCategorySerializer
     permission_classes = [IsAuthenticated]
@@ -253,7 +679,7 @@ class ExpenseCategoryViewSet(viewsets.ModelViewSet):
         return ExpenseCategory.objects.filter(is_active=True)
 
 
-class IncomeCategoryViewSet(viewsets.ModelViewSet):
+class IncomeCategoryViewSet(SparseFieldsetViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for income categories"""
     serializer_class = IncomeCategorySerializer
     permission_classes = [IsAuthenticated]
@@ -262,7 +688,7 @@ class IncomeCategoryViewSet(viewsets.ModelViewSet):
         return IncomeCategory.objects.filter(is_active=True)
 
 
-class BudgetViewSet(viewsets.ModelViewSet):
+class BudgetViewSet(SparseFieldsetViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for managing budgets"""
     permission_classes = [IsAuthenticated]
 
@@ -280,26 +706,10 @@ class BudgetViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def current(self, request):
         """Get current active budgets"""
-        current_date = timezone.now().date()
-        current_budgets = self.get_queryset().filter(
-            start_date__lte=current_date,
-            end_date__gte=current_date
-        )
-
-        # Update spent amounts
-        for budget in current_budgets:
-            spent = Transaction.objects.filter(
-                farmer=request.user,
-                transaction_type='EXPENSE',
-                expense_category=budget.category,
-                transaction_date__date__range=[budget.start_date, budget.end_date]
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-
-            budget.spent_amount = spent
-            budget.save()
-
-        serializer = self.get_serializer(current_budgets, many=True)
-        return Response(serializer.data)
+        context = DashboardContext(request.user, serializer_context=self.get_serializer_context())
+        # Recompute spent amounts with one UPDATE before they are read
+        refresh_budget_spent_amounts(context.today, farmer=request.user)
+        return Response(current_budgets_section(context))
 
     @action(detail=True, methods=['get'])
     def spending_analysis(self, request, pk=None):
@@ -309,15 +719,13 @@ class BudgetViewSet(viewsets.ModelViewSet):
         transactions = Transaction.objects.filter(
             farmer=request.user,
             transaction_type='EXPENSE',
-            expense_category=budget.category,
-            transaction_date__date__range=[budget.start_date, budget.end_date]
+            expense_category__ancestor_links__ancestor=budget.category,
+            transaction_day__range=[budget.start_date, budget.end_date]
         ).order_by('-transaction_date')
 
-        serializer = TransactionSerializer(transactions, many=True)
-
         return Response({
             'budget': BudgetSerializer(budget).data,
-            'transactions': serializer.data,
+            'transactions': serialize_queryset(TransactionSerializer(), transactions),
             'analysis': {
                 'daily_average': budget.spent_amount / max((timezone.now().date() - budget.start_date).days, 1),
                 'remaining_days': max((budget.end_date - timezone.now().date()).days, 0),
@@ -326,7 +734,7 @@ class BudgetViewSet(viewsets.ModelViewSet):
         })
 
 
-class CropFinanceViewSet(viewsets.ModelViewSet):
+class CropFinanceViewSet(SparseFieldsetViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for managing crop finances"""
     serializer_class = CropFinanceSerializer
     permission_classes = [IsAuthenticated]
@@ -434,7 +842,45 @@ class CropFinanceViewSet(viewsets.ModelViewSet):
             'crop_wise_summary': crop_summary
         })
 
+    @action(detail=True, methods=['get'])
+    def simulate(self, request, pk=None):
+        """Simulate the profit distribution of this crop season"""
+        from .simulation import SimulationError, simulate_crop_finance
+
+        crop_finance = self.get_object()
+
+        try:
+            price = request.query_params.get('price')
+            cost = request.query_params.get('cost')
+            price = Decimal(price) if price else None
+            cost = Decimal(cost) if cost else None
+        except InvalidOperation:
+            price = cost = None
+            valid = False
+        else:
+            # nan and inf parse as Decimals but cannot be simulated or rendered as JSON
+            valid = all(value is None or value.is_finite() for value in (price, cost))
+
+        if not valid:
+            return Response(
+                {'error': 'Invalid price or cost'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if price is not None and price <= 0:
+            return Response(
+                {'error': 'price must be positive'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            result = simulate_crop_finance(crop_finance, price=price, cost=cost)
+        except SimulationError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(result)
+
     @action(detail=True, methods=['post'])
+    @idempotent
     def add_sale(self, request, pk=None):
         """Add a sale transaction for this crop"""
         crop_finance = self.get_object()
@@ -452,54 +898,59 @@ class CropFinanceViewSet(viewsets.ModelViewSet):
 
         try:
             amount = Decimal(str(amount))
-
-            # Update crop revenue
-            crop_finance.total_revenue += amount
-            if quantity:
-                crop_finance.actual_yield = Decimal(str(quantity))
-            crop_finance.save()
-
-            # Create income transaction if account is specified
-            account_id = request.data.get('account_id')
-            if account_id:
-                try:
-                    account = FinanceAccount.objects.get(
-                        id=account_id, farmer=request.user
-                    )
-
-                    # Get or create crop sales income category
-                    income_category, _ = IncomeCategory.objects.get_or_create(
-                        name='Crop Sales',
-                        defaults={'description': 'Income from crop sales'}
-                    )
-
-                    Transaction.objects.create(
-                        farmer=request.user,
-                        account=account,
-                        transaction_type='INCOME',
-                        amount=amount,
-                        description=description,
-                        income_category=income_category,
-                        transaction_date=timezone.now()
-                    )
-
-                except FinanceAccount.DoesNotExist:
-                    pass
-
-            return Response({
-                'message': 'Sale recorded successfully',
-                'new_revenue': crop_finance.total_revenue,
-                'profit_loss': crop_finance.profit_loss
-            })
-
-        except (ValueError, TypeError):
+            quantity = Decimal(str(quantity)) if quantity else None
+        except (InvalidOperation, ValueError, TypeError):
             return Response(
                 {'error': 'Invalid amount'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        # Create income transaction if account is specified; it rolls up into total_revenue
+        account = None
+        account_id = request.data.get('account_id')
+        if account_id:
+            account = FinanceAccount.objects.filter(
+                id=account_id, farmer=request.user
+            ).first()
+
+        with transaction.atomic():
+            crop_updates = {}
+            if quantity is not None:
+                crop_updates['actual_yield'] = quantity
+
+            if account:
+                # Get or create crop sales income category
+                income_category, _ = IncomeCategory.objects.get_or_create(
+                    name='Crop Sales',
+                    defaults={'description': 'Income from crop sales'}
+                )
+
+                bulk_create_transactions([Transaction(
+                    farmer=request.user,
+                    account=account,
+                    transaction_type='INCOME',
+                    amount=amount,
+                    description=description,
+                    income_category=income_category,
+                    crop_finance=crop_finance,
+                    transaction_date=timezone.now()
+                )])
+            else:
+                # Update crop revenue
+                crop_updates['total_revenue'] = F('total_revenue') + amount
+
+            if crop_updates:
+                CropFinance.objects.filter(pk=crop_finance.pk).update(updated_at=timezone.now(), **crop_updates)
+            crop_finance.refresh_from_db()
+
+        return Response({
+            'message': 'Sale recorded successfully',
+            'new_revenue': crop_finance.total_revenue,
+            'profit_loss': crop_finance.profit_loss
+        })
+
 
-class FinancialGoalViewSet(viewsets.ModelViewSet):
+class FinancialGoalViewSet(SparseFieldsetViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for managing financial goals"""
     serializer_class = FinancialGoalSerializer
     permission_classes = [IsAuthenticated]
@@ -511,6 +962,7 @@ class FinancialGoalViewSet(viewsets.ModelViewSet):
         serializer.save(farmer=self.request.user)
 
     @action(detail=True, methods=['post'])
+    @idempotent
     def add_contribution(self, request, pk=None):
         """Add contribution towards a goal"""
         goal = self.get_object()
@@ -531,13 +983,17 @@ class FinancialGoalViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            goal.current_amount += amount
-
-            # Check if goal is achieved
-            if goal.current_amount >= goal.target_amount:
-                goal.is_achieved = True
-
-            goal.save()
+            # One UPDATE adds the amount and flags the goal once the new total reaches its target
+            with transaction.atomic():
+                self.get_queryset().filter(pk=goal.pk).update(
+                    current_amount=F('current_amount') + amount,
+                    is_achieved=Case(
+                        When(GreaterThanOrEqual(F('current_amount') + amount, F('target_amount')), then=Value(True)),
+                        default=F('is_achieved')
+                    ),
+                    updated_at=timezone.now()
+                )
+                goal.refresh_from_db(fields=['current_amount', 'target_amount', 'is_achieved', 'updated_at'])
 
             return Response({
                 'message': 'Contribution added successfully',
@@ -547,7 +1003,7 @@ class FinancialGoalViewSet(viewsets.ModelViewSet):
                 'is_achieved': goal.is_achieved
             })
 
-        except (ValueError, TypeError):
+        except (InvalidOperation, ValueError, TypeError):
             return Response(
                 {'error': 'Invalid amount'}, 
                 status=status.HTTP_400_BAD_REQUEST
@@ -556,47 +1012,36 @@ class FinancialGoalViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def progress_summary(self, request):
         """Get progress summary for all goals"""
-        goals = self.get_queryset()
-
-        total_goals = goals.count()
-        achieved_goals = goals.filter(is_achieved=True).count()
-
-        # Goals by type
-        goals_by_type = {}
-        for goal in goals:
-            goal_type = goal.get_goal_type_display()
-            if goal_type not in goals_by_type:
-                goals_by_type[goal_type] = {
-                    'count': 0,
-                    'total_target': Decimal('0.00'),
-                    'total_achieved': Decimal('0.00')
-                }
+        context = DashboardContext(request.user, serializer_context=self.get_serializer_context())
+        return Response(goal_progress_section(context))
 
-            goals_by_type[goal_type]['count'] += 1
-            goals_by_type[goal_type]['total_target'] += goal.target_amount
-            goals_by_type[goal_type]['total_achieved'] += goal.current_amount
+class FinanceAlertViewSet(SparseFieldsetViewSetMixin, viewsets.ReadOnlyModelViewSet):
+    """ViewSet for budget and goal alerts produced by the nightly evaluation"""
+    serializer_class = FinanceAlertSerializer
+    permission_classes = [IsAuthenticated]
 
-        # Upcoming deadlines
-        upcoming_goals = goals.filter(
-            is_achieved=False,
-            target_date__gte=timezone.now().date(),
-            target_date__lte=timezone.now().date() + timedelta(days=90)
-        ).order_by('target_date')
+    def get_queryset(self):
+        queryset = FinanceAlert.objects.filter(farmer=self.request.user)
 
-        return Response({
-            'summary': {
-                'total_goals': total_goals,
-                'achieved_goals': achieved_goals,
-                'achievement_rate': (achieved_goals / total_goals * 100) if total_goals > 0 else 0
-            },
-            'goals_by_type': goals_by_type,
-            'upcoming_deadlines': FinancialGoalSerializer(upcoming_goals[:5], many=True).data
-        })
+        # Dismissed alerts are hidden unless explicitly requested
+        if self.request.query_params.get('include_dismissed', '').lower() != 'true':
+            queryset = queryset.filter(is_dismissed=False)
+
+        return queryset
+
+    @action(detail=True, methods=['post'])
+    def dismiss(self, request, pk=None):
+        """Dismiss an alert"""
+        alert = self.get_object()
+        alert.is_dismissed = True
+        alert.save(update_fields=['is_dismissed', 'updated_at'])
+
+        return Response({'message': 'Alert dismissed'})
 
 
 # Dashboard Views
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from django.db.models import Sum, Count, Avg
 from django.utils import timezone
@@ -611,141 +1056,122 @@ from .serializers import DashboardSummarySerializer
 @permission_classes([IsAuthenticated])
 def dashboard_summary(request):
     """Get finance dashboard summary for the authenticated farmer"""
-    farmer = request.user
-    current_date = timezone.now().date()
-    current_month_start = current_date.replace(day=1)
-
-    # Account balances
-    accounts = FinanceAccount.objects.filter(farmer=farmer, is_active=True)
-    total_balance = accounts.aggregate(total=Sum('current_balance'))['total'] or Decimal('0.00')
-
-    # Monthly income and expenses
-    monthly_transactions = Transaction.objects.filter(
-        farmer=farmer,
-        transaction_date__date__gte=current_month_start
-    )
-
-    monthly_income = monthly_transactions.filter(
-        transaction_type='INCOME'
-    ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-
-    monthly_expense = monthly_transactions.filter(
-        transaction_type='EXPENSE'
-    ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-
-    net_cash_flow = monthly_income - monthly_expense
-
-    # Budget summary
-    active_budgets = Budget.objects.filter(
-        farmer=farmer,
-        is_active=True,
-        start_date__lte=current_date,
-        end_date__gte=current_date
-    )
-
-    overbudget_count = 0
-    for budget in active_budgets:
-        if budget.spent_amount > budget.budgeted_amount:
-            overbudget_count += 1
-
-    # Goals summary
-    active_goals = FinancialGoal.objects.filter(farmer=farmer, is_achieved=False)
-    achieved_goals = FinancialGoal.objects.filter(farmer=farmer, is_achieved=True)
-
-    # Recent transactions
-    recent_transactions = Transaction.objects.filter(
-        farmer=farmer
-    ).order_by('-transaction_date')[:5]
-
-    from .serializers import TransactionSerializer
-
-    dashboard_data = {
-        'total_balance': total_balance,
-        'monthly_income': monthly_income,
-        'monthly_expense': monthly_expense,
-        'net_cash_flow': net_cash_flow,
-        'active_budgets_count': active_budgets.count(),
-        'overbudget_count': overbudget_count,
-        'active_goals_count': active_goals.count(),
-        'achieved_goals_count': achieved_goals.count(),
-        'recent_transactions': TransactionSerializer(recent_transactions, many=True).data
-    }
-
-    return Response(dashboard_data)
-
+    return Response(summary_section(DashboardContext(request.user)))
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def monthly_trends(request):
     """Get monthly income/expense trends for the last 12 months"""
-    farmer = request.user
-    current_date = timezone.now().date()
-
-    # Get last 12 months data
-    trends = []
-    for i in range(12):
-        month_date = current_date - timedelta(days=30*i)
-        month_start = month_date.replace(day=1)
-
-        # Get next month's start date
-        if month_start.month == 12:
-            next_month = month_start.replace(year=month_start.year + 1, month=1)
-        else:
-            next_month = month_start.replace(month=month_start.month + 1)
+    return Response(trends_section(DashboardContext(request.user)))
+
+def _breakdown_parent_id(request):
+    """``?parent=`` of the expense breakdown as a category id; ValueError if it is not one"""
+    parent_id = request.query_params.get('parent')
+    return int(parent_id) if parent_id else None
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def expense_categories_breakdown(request):
+    """Get expense breakdown by categories for the current month (``?parent=`` breaks one category down)"""
+    try:
+        parent_id = _breakdown_parent_id(request)
+    except ValueError:
+        return Response({'error': 'parent must be a category id'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(expense_breakdown_section(DashboardContext(request.user), parent_id))
+
 
-        month_transactions = Transaction.objects.filter(
-            farmer=farmer,
-            transaction_date__date__gte=month_start,
-            transaction_date__date__lt=next_month
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dashboard_bundle(request):
+    """Get several dashboard sections in one response, sharing the data they have in common.
+
+    ``?sections=`` lists the sections wanted (all by default); they are
+    built in one database transaction from one DashboardContext.
+    """
+    names = [name.strip() for name in request.query_params.get('sections', '').split(',') if name.strip()]
+    unknown = [name for name in names if name not in DASHBOARD_SECTIONS]
+    if unknown:
+        return Response(
+            {'error': f'Unknown sections: {", ".join(unknown)}; choose from {", ".join(DASHBOARD_SECTIONS)}'},
+            status=status.HTTP_400_BAD_REQUEST
         )
+    try:
+        parent_id = _breakdown_parent_id(request)
+    except ValueError:
+        return Response({'error': 'parent must be a category id'}, status=status.HTTP_400_BAD_REQUEST)
+
+    context = DashboardContext(request.user, serializer_context={'request': request})
+    bundle = {}
+    with transaction.atomic():
+        for name in names or DASHBOARD_SECTIONS:
+            if name == 'expense_breakdown':
+                bundle[name] = expense_breakdown_section(context, parent_id)
+            else:
+                bundle[name] = DASHBOARD_SECTIONS[name](context)
 
-        income = month_transactions.filter(
-            transaction_type='INCOME'
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+    return Response(bundle)
 
-        expense = month_transactions.filter(
-            transaction_type='EXPENSE'
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def finance_analytics(request):
+    """Get transaction totals grouped by any dimensions and time granularity over a date range"""
+    from .analytics import AnalyticsError, farmer_analytics, parse_analytics_query
 
-        trends.append({
-            'month': month_start.strftime('%b %Y'),
-            'income': income,
-            'expense': expense,
-            'net_flow': income - expense
-        })
+    try:
+        query = parse_analytics_query(request.query_params)
+    except AnalyticsError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
-    return Response(trends)
+    return Response(farmer_analytics(request.user, query))
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def expense_categories_breakdown(request):
-    """Get expense breakdown by categories for the current month"""
-    farmer = request.user
-    current_date = timezone.now().date()
-    current_month_start = current_date.replace(day=1)
-
-    category_expenses = Transaction.objects.filter(
-        farmer=farmer,
-        transaction_type='EXPENSE',
-        transaction_date__date__gte=current_month_start,
-        expense_category__isnull=False
-    ).values('expense_category__name').annotate(
-        total_amount=Sum('amount'),
-        transaction_count=Count('id')
-    ).order_by('-total_amount')
-
-    # Calculate percentages
-    total_expense = sum(item['total_amount'] for item in category_expenses)
-
-    breakdown = []
-    for item in category_expenses:
-        percentage = (item['total_amount'] / total_expense * 100) if total_expense > 0 else 0
-        breakdown.append({
-            'category_name': item['expense_category__name'],
-            'amount': item['total_amount'],
-            'percentage': round(percentage, 2),
-            'transaction_count': item['transaction_count']
-        })
+def sync_changes(request):
+    """Get rows created, updated or deleted since a sync cursor"""
+    try:
+        page_size = min(int(request.query_params.get('page_size', 200)), 1000)
+    except ValueError:
+        page_size = 200
+    page_size = max(page_size, 1)
+
+    try:
+        data = collect_changes(
+            request.user,
+            request.query_params.get('since'),
+            page_size,
+            context={'request': request}
+        )
+    except InvalidCursor as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cohort_crop_stats(request):
+    """Get ROI and per-acre costs by crop and season across a cohort of farmers (staff only)"""
+    from .cohorts import CohortError, crop_stats, parse_cohort
+
+    try:
+        cohort = parse_cohort(request.query_params)
+    except CohortError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(crop_stats(cohort))
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cohort_expense_mix(request):
+    """Get the expense category mix across a cohort of farmers (staff only)"""
+    from .cohorts import CohortError, expense_mix, parse_cohort
+
+    try:
+        cohort = parse_cohort(request.query_params)
+    except CohortError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
-    return Response(breakdown)
+    return Response(expense_mix(cohort))
@@ -88,6 +88,25 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Set REDIS_URL in production: forecast priming (forecast_balances) and the data versions that
+# expire cached forecasts and analytics only reach every worker through a shared cache.
+# Without it each process keeps its own in-memory cache.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -103,9 +122,20 @@ REST_FRAMEWORK = {
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
-    ]
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+# Offer MessagePack responses to low-bandwidth clients when msgpack is installed
+try:
+    import msgpack  # noqa: F401
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('finance.renderers.MessagePackRenderer')
+except ImportError:
+    pass
+
 # CORS settings for React Native app
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",